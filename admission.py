@@ -0,0 +1,99 @@
+# admission.py
+# Admission control for /chat_api: a concurrency limiter with a bounded, priority-aware wait queue and
+# per-user token-bucket rate limiting. Requests that can't be admitted are shed quickly with a Retry-After hint
+# instead of queueing without bound.
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucketRateLimiter:
+    def __init__(self, rate_per_second, burst, max_tracked_users=100000):
+        self.rate = float(rate_per_second)
+        self.burst = float(burst)
+        self.max_tracked_users = max_tracked_users
+        self._buckets = OrderedDict() # user_id -> (tokens, last_refill); LRU order so idle users are evicted first
+        self._lock = threading.Lock()
+
+    def allow(self, user_id):
+        """Returns (allowed, retry_after_seconds)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(user_id, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1.0
+            if allowed:
+                tokens -= 1.0
+            self._buckets[user_id] = (tokens, now)
+            if len(self._buckets) > self.max_tracked_users:
+                self._buckets.popitem(last=False)
+        retry_after = 0 if allowed else math.ceil((1.0 - tokens) / self.rate)
+        return allowed, retry_after
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent, max_queue, queue_timeout_seconds):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout_seconds
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = {True: 0, False: 0} # priority -> number of waiters
+        self._avg_service_seconds = 0.05 # EWMA, used for the Retry-After hint
+        self.stats = {'admitted': 0, 'queued': 0, 'shed_queue_full': 0, 'shed_timeout': 0}
+
+    def _can_enter(self, priority):
+        # Priority (in-progress conversation) waiters go first; new conversations only take a free slot
+        # when no priority request is waiting for it.
+        return self._active < self.max_concurrent and (priority or self._waiting[True] == 0)
+
+    def acquire(self, priority=False):
+        """Admit the caller, waiting up to queue_timeout in the bounded queue. Returns False if the request is shed."""
+        with self._cond:
+            if self._can_enter(priority):
+                self._active += 1
+                self.stats['admitted'] += 1
+                return True
+            # Priority requests may use the whole queue; new conversations only half of it.
+            queue_limit = self.max_queue if priority else self.max_queue // 2
+            if self._waiting[True] + self._waiting[False] >= queue_limit:
+                self.stats['shed_queue_full'] += 1
+                return False
+            self._waiting[priority] += 1
+            self.stats['queued'] += 1
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while not self._can_enter(priority):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats['shed_timeout'] += 1
+                        self._cond.notify_all() # A priority waiter giving up may unblock new conversations
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting[priority] -= 1
+            self._active += 1
+            self.stats['admitted'] += 1
+            return True
+
+    def release(self, service_seconds=None):
+        with self._cond:
+            self._active -= 1
+            if service_seconds is not None:
+                self._avg_service_seconds = 0.9 * self._avg_service_seconds + 0.1 * service_seconds
+            self._cond.notify_all()
+
+    @property
+    def active(self):
+        return self._active
+
+    def retry_after_hint(self):
+        with self._cond:
+            backlog = self._waiting[True] + self._waiting[False] + 1
+            return max(1, math.ceil(self._avg_service_seconds * backlog / max(1, self.max_concurrent)))
+
+    def snapshot(self):
+        with self._cond:
+            return dict(self.stats, active=self._active, waiting=self._waiting[True] + self._waiting[False],
+                        avg_service_ms=round(self._avg_service_seconds * 1000, 2))
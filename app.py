@@ -1,285 +1,818 @@
 # app.py
-from flask import Flask, request, jsonify, render_template
-from flask_cors import CORS # Import CORS
-import pickle
-import pandas as pd
-import numpy as np
+import time
+_IMPORT_START = time.perf_counter()
+import datetime
+import importlib
+import importlib.util
 import os
+import pickle
 import re
-from fuzzywuzzy import process, fuzz
+import sqlite3
+import atexit
+import functools
+import hmac
+import html
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+from flask import Flask, Response, request, jsonify, render_template, g, has_request_context
+from flask_cors import CORS # Import CORS
+
+# --- Startup mode ---
+# Lazy startup defers pandas/numpy/fuzzywuzzy imports and all data loading (model, CSVs, symptom map) until the
+# first request or an explicit warmup_app() call, so spawning a worker (or importing app in a test) is cheap.
+LAZY_STARTUP = os.environ.get('AROGYABOT_LAZY_STARTUP', '0') == '1'
+STARTUP_TIMINGS = {} # stage -> seconds; see startup_report()
+
+def _import_heavy(name):
+    if LAZY_STARTUP:
+        # Standard importlib recipe: the module body only executes on first attribute access.
+        if name in sys.modules:
+            return sys.modules[name]
+        spec = importlib.util.find_spec(name)
+        loader = importlib.util.LazyLoader(spec.loader)
+        spec.loader = loader
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        loader.exec_module(module)
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    STARTUP_TIMINGS[f'import {name}'] = time.perf_counter() - start
+    return module
+
+pd = _import_heavy('pandas')
+np = _import_heavy('numpy')
+process = _import_heavy('fuzzywuzzy.process')
+fuzz = _import_heavy('fuzzywuzzy.fuzz')
+fuzz_utils = _import_heavy('fuzzywuzzy.utils')
+# The project modules below import numpy at the top, so they are loaded the same way.
+bitvector_forest = _import_heavy('bitvector_forest')
+doctor_directory = _import_heavy('doctor_directory')
+doctor_views = _import_heavy('doctor_views')
+forest_compression = _import_heavy('forest_compression')
+model_registry = _import_heavy('model_registry')
+shadow_model = _import_heavy('shadow_model')
+symptom_posterior = _import_heavy('symptom_posterior')
+from admission import AdmissionController, TokenBucketRateLimiter
+from profiler import RequestProfiler
+from recorder import NAME_PLACEHOLDER, ConversationRecorder, redact_name, response_digest
+from session_locks import StripedLocks
+from session_snapshot import SessionSnapshotStore
+from session_token import SessionTokenCodec, SessionTokenError
+from symptom_suggest import SymptomSuggester
+from visiting_hours import VisitingHoursIndex
+from symptom_map import (SYMPTOM_MAP as RAW_SYMPTOM_MAP, COMPILED_SYMPTOM_MAP_PATH, compile_symptom_map,
+                         compute_model_version, load_compiled_symptom_map, normalize_model_key)
 
 app = Flask(__name__)
 CORS(app) # Enable CORS for all routes, or specify origins: CORS(app, resources={r"/chat_api": {"origins": "http://localhost:3000"}})
 app.secret_key = os.urandom(24)
+STARTUP_TIMINGS['imports'] = time.perf_counter() - _IMPORT_START
 
 # --- Configuration & Paths ---
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 MODEL_DIR = os.path.join(BASE_DIR, 'models')
 MODEL_PATH = os.path.join(MODEL_DIR, 'disease_prediction_model.pkl')
 SYMPTOM_COLUMNS_PATH = os.path.join(MODEL_DIR, 'symptom_columns.pkl')
-
-DOCTORS_CSV_PATH = os.path.join(BASE_DIR, 'doctors_bd_detailed.csv')
+# Written by `python forest_compression.py` (and by model_training.py). With MODEL_FORMAT 'compact' or 'auto' the compact
+# forest is served whenever it was built from the current model files, and the sklearn pickle is then never loaded.
+COMPACT_MODEL_PATH = os.path.join(MODEL_DIR, 'disease_prediction_model_compact.pkl')
+# 'bitvector' serves the sklearn pickle through bitvector_forest.py: the same probabilities as sklearn, bit for bit,
+# without its per-call overhead.
+MODEL_FORMAT = os.environ.get('AROGYABOT_MODEL_FORMAT', 'sklearn') # 'sklearn', 'compact', 'auto' or 'bitvector'
+# Adds an `explanation` (the confirmed symptoms that pushed hardest towards the predicted disease) to the prediction
+# turn's response. Needs the compact model: attributions are summed along the decision paths it already traverses.
+EXPLAIN_PREDICTIONS = os.environ.get('AROGYABOT_EXPLANATIONS', '0') == '1'
+EXPLANATION_TOP_SYMPTOMS = 3
+
+DOCTORS_SOURCE_CSV_PATH = os.path.join(BASE_DIR, 'doctors_bd_detailed.csv')
+# Written by `python geocode_doctors.py`: the same rows, with missing/0,0 coordinates filled in from a local gazetteer.
+DOCTORS_ENRICHED_CSV_PATH = os.path.join(BASE_DIR, 'doctors_bd_enriched.csv')
+DOCTORS_CSV_PATH = DOCTORS_ENRICHED_CSV_PATH if os.path.exists(DOCTORS_ENRICHED_CSV_PATH) else DOCTORS_SOURCE_CSV_PATH
+# Indexed doctor store built by `python import_doctors.py`. With DOCTOR_STORE 'auto' it is used whenever the file exists,
+# and the CSV is then never loaded into pandas in the worker.
+DOCTORS_DB_PATH = os.path.join(BASE_DIR, 'doctors_bd.sqlite')
+DOCTOR_STORE = os.environ.get('AROGYABOT_DOCTOR_STORE', 'auto') # 'auto', 'sqlite' or 'pandas'
+# Doctor search through the region-sharded directory service (see doctor_directory.py): '' searches the doctor store
+# directly, 'sharded' keeps region shards in this process, 'multiprocess' runs one process per region shard. With a
+# shard mode, a chat request carrying the user's `location` gets the nearest matching doctors first.
+DOCTOR_DIRECTORY_MODE = os.environ.get('AROGYABOT_DOCTOR_DIRECTORY', '')
+# Precomputed doctor recommendations per predictable disease (see doctor_views.py): 'disease' ranks them in directory
+# order, 'region' also keeps one list per region with the doctors in the user's region first. The views are rebuilt
+# in the background when the doctor store file or the served diseases change; the store is then reloaded too.
+DOCTOR_VIEWS_MODE = os.environ.get('AROGYABOT_DOCTOR_VIEWS', '') # '', 'disease' or 'region'
+DOCTOR_VIEWS_REFRESH_SECONDS = float(os.environ.get('AROGYABOT_DOCTOR_VIEWS_REFRESH', 30)) # Store change check interval
+# Rank doctor search results by visiting hours: open now, then later today, then other days, then unknown hours.
+RANK_DOCTORS_BY_AVAILABILITY = os.environ.get('AROGYABOT_RANK_BY_AVAILABILITY', '0') == '1'
+LOCAL_UTC_OFFSET_HOURS = float(os.environ.get('AROGYABOT_UTC_OFFSET_HOURS', 6)) # Bangladesh Standard Time
+# 'json' sends found doctors as compact records (`doctors`) that chat.html renders into cards and map markers;
+# 'html' keeps the older response shape (one pre-rendered card HTML part per doctor plus `map_data`).
+DOCTOR_CARDS_FORMAT = os.environ.get('AROGYABOT_DOCTOR_CARDS', 'json')
+DOCTOR_CARD_CACHE_SIZE = int(os.environ.get('AROGYABOT_DOCTOR_CARD_CACHE', 4096)) # Doctors whose card is kept built
+# A search keeps its ranked result ids in the session so "more" / POST /doctors/next pages through them without searching again.
+DOCTOR_PAGE_SIZE = int(os.environ.get('AROGYABOT_DOCTOR_PAGE_SIZE', 3))
+DOCTOR_RESULTS_MAX = int(os.environ.get('AROGYABOT_DOCTOR_RESULTS_MAX', 30)) # Ids kept per session (<= 255)
+DOCTOR_RESULTS_TTL_SECONDS = int(os.environ.get('AROGYABOT_DOCTOR_RESULTS_TTL', 1800))
+SUGGEST_MAX_LIMIT = 20 # Most completions /symptoms/suggest returns
 DISEASE_DESC_CSV_PATH = os.path.join(BASE_DIR, 'symptom_Description.csv')
+TRAINING_CSV_PATH = os.path.join(BASE_DIR, 'datasets', 'Training.csv')
 DISEASE_PRECAUTION_CSV_PATH = os.path.join(BASE_DIR, 'symptom_precaution.csv')
 
+# --- Stateless (signed-token) session mode ---
+# When enabled, the whole conversation state travels with each request/response as `session_token`
+# and nothing is kept in `user_sessions` between turns. Every worker/host must share the same secret.
+STATELESS_SESSIONS = os.environ.get('AROGYABOT_STATELESS_SESSIONS', '0') == '1'
+SESSION_TOKEN_SECRET = os.environ.get('AROGYABOT_SESSION_SECRET')
+SESSION_TOKEN_TTL_SECONDS = int(os.environ.get('AROGYABOT_SESSION_TOKEN_TTL', 24 * 3600))
+
+# --- Session snapshots (in-memory session mode only) ---
+# Live conversations are written to this file in the background and restored lazily after a restart, when each
+# user_id first shows up again. Saved sessions expire after AROGYABOT_SESSION_TOKEN_TTL.
+SESSION_SNAPSHOT_PATH = os.environ.get('AROGYABOT_SESSION_SNAPSHOT') # Unset disables snapshots
+SESSION_SNAPSHOT_INTERVAL = float(os.environ.get('AROGYABOT_SESSION_SNAPSHOT_INTERVAL', 5)) # Seconds between writes
+# user_ids come from the client and key sessions, snapshot records, rate limits and locks; longer ones get a 400.
+MAX_USER_ID_LENGTH = 256
+
+# --- Admission control & load shedding for /chat_api (0 disables each limit) ---
+ADMISSION_MAX_CONCURRENT = int(os.environ.get('AROGYABOT_MAX_CONCURRENT', 0)) # Requests processed at once
+ADMISSION_MAX_QUEUE = int(os.environ.get('AROGYABOT_MAX_QUEUE', 32)) # Requests allowed to wait for a slot
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('AROGYABOT_QUEUE_TIMEOUT', 2.0)) # Seconds before a waiter is shed
+RATE_LIMIT_PER_SECOND = float(os.environ.get('AROGYABOT_RATE_LIMIT', 0)) # Sustained messages/second per user_id
+RATE_LIMIT_BURST = int(os.environ.get('AROGYABOT_RATE_LIMIT_BURST', 10))
+
+# --- Per-user session locking (threaded workers; see session_locks.py) ---
+# /chat_api and /doctors/next turns of the same user_id run one at a time; 0 stripes disables the locking.
+SESSION_LOCK_STRIPES = int(os.environ.get('AROGYABOT_SESSION_LOCK_STRIPES', 256))
+SESSION_LOCK_TIMEOUT = float(os.environ.get('AROGYABOT_SESSION_LOCK_TIMEOUT', 10)) # Seconds a turn waits for the user's previous one
+
+# --- Conversation recording (replay with replay_conversations.py) ---
+RECORD_PATH = os.environ.get('AROGYABOT_RECORD_PATH') # Unset disables recording
+RECORD_MAX_BYTES = int(float(os.environ.get('AROGYABOT_RECORD_MAX_MB', 50)) * 1024 * 1024)
+RECORD_BACKUPS = int(os.environ.get('AROGYABOT_RECORD_BACKUPS', 5))
+RECORD_SALT = os.environ.get('AROGYABOT_RECORD_SALT') # Fixed salt keeps anonymized ids stable across restarts
+# Follow-up questions are shuffled at random; '1' seeds the shuffle from the confirmed symptoms instead, so the same
+# answers always lead to the same questions and recordings replay with matching output.
+SEEDED_QUESTIONS = os.environ.get('AROGYABOT_SEEDED_QUESTIONS') == '1'
+
+# --- Request profiling (admin endpoint: /admin/profile) ---
+ADMIN_TOKEN = os.environ.get('AROGYABOT_ADMIN_TOKEN') # Required by /admin/* and the X-Arogyabot-Profile header
+PROFILE_SAMPLE_RATE = float(os.environ.get('AROGYABOT_PROFILE_SAMPLE_RATE', 0)) # Fraction of requests profiled
+PROFILER_MODE = os.environ.get('AROGYABOT_PROFILER', 'sample') # 'sample' (stack sampler) or 'cprofile'
+PROFILE_INTERVAL_MS = float(os.environ.get('AROGYABOT_PROFILE_INTERVAL_MS', 5)) # Stack sampling interval
+
+# --- Shadow model evaluation (admin endpoint: /admin/shadow) ---
+# A candidate model scores the same symptom vectors as the served one, off the request path, and /admin/shadow
+# reports agreement, probability divergence and latency. Shadow work is dropped whenever the worker is busy.
+SHADOW_MODEL_PATH = os.environ.get('AROGYABOT_SHADOW_MODEL') # sklearn pickle or compact artifact; unset disables
+SHADOW_MAX_QUEUE = int(os.environ.get('AROGYABOT_SHADOW_MAX_QUEUE', 64)) # Predictions waiting to be shadow-scored
+SHADOW_MAX_LOAD = float(os.environ.get('AROGYABOT_SHADOW_MAX_LOAD', 0.8)) # 1-minute load average per CPU
+SHADOW_LATENCY_BUDGET_MS = float(os.environ.get('AROGYABOT_SHADOW_LATENCY_BUDGET_MS', 50))
+
+# --- Cohort models (admin endpoint: /admin/models) ---
+# A registry file (see model_registry.py) adds models for cohorts, e.g. children by the collected age or a region by
+# the user's location, served from this process alongside the main model, which remains the fallback.
+MODEL_REGISTRY_PATH = os.environ.get('AROGYABOT_MODEL_REGISTRY') # Unset serves the one model
+
+# --- Confidence-based early stopping ---
+# When EARLY_STOP_MARGIN is set (e.g. 0.9), questioning stops -- including the age/sex questions -- as soon as the
+# leading disease's posterior probability beats the runner-up by that margin, or no single further answer could
+# change the leading disease. Unset/0 keeps the fixed MIN_SYMPTOMS_FOR_PREDICTION flow.
+EARLY_STOP_MARGIN = float(os.environ.get('AROGYABOT_EARLY_STOP_MARGIN', 0) or 0)
+EARLY_STOP_MIN_SYMPTOMS = int(os.environ.get('AROGYABOT_EARLY_STOP_MIN_SYMPTOMS', 2))
+
 # --- Global Variables for Loaded Data ---
 model = None
 MODEL_SYMPTOM_KEYS = []
-doctors_df = pd.DataFrame()
-disease_desc_df = pd.DataFrame()
-disease_precaution_df = pd.DataFrame()
-
-# --- SYMPTOM MAP (CRITICAL: Populate this thoroughly!) ---
-SYMPTOM_MAP = {
-    # ... (your existing SYMPTOM_MAP - keep it as is, I'll omit for brevity) ...
-    # ... (your existing SYMPTOM_MAP - keep it as is) ...
-"itching": {"model_key": "itching", "ask_phrase": "Are you experiencing any itching?"},
-"skin rash": {"model_key": "skin_rash", "ask_phrase": "Do you have a skin rash or any rashes on your skin?"},
-"nodal skin eruptions": {"model_key": "nodal_skin_eruptions", "ask_phrase": "Have you noticed any nodal skin eruptions, like bumps under the skin?"},
-"continuous sneezing": {"model_key": "continuous_sneezing", "ask_phrase": "Are you sneezing continuously or very frequently?"},
-"shivering": {"model_key": "shivering", "ask_phrase": "Are you shivering, perhaps feeling cold even when it's not?"},
-"chills": {"model_key": "chills", "ask_phrase": "Do you have chills, possibly with a fever?"},
-"joint pain": {"model_key": "joint_pain", "ask_phrase": "Are you experiencing pain in your joints?"},
-"stomach pain": {"model_key": "stomach_pain", "ask_phrase": "Do you have stomach pain or an ache in your abdomen?"},
-"acidity": {"model_key": "acidity", "ask_phrase": "Are you suffering from acidity or heartburn?"},
-"ulcers on tongue": {"model_key": "ulcers_on_tongue", "ask_phrase": "Do you have any ulcers or sores on your tongue?"},
-"muscle wasting": {"model_key": "muscle_wasting", "ask_phrase": "Have you noticed any muscle wasting or a decrease in muscle mass?"},
-"vomiting": {"model_key": "vomiting", "ask_phrase": "Have you been vomiting or throwing up?"},
-"burning micturition": {"model_key": "burning_micturition", "ask_phrase": "Do you feel a burning sensation when you urinate?"},
-# "spotting urination": {"model_key": "spotting_ urination", "ask_phrase": "Have you noticed any spotting or unusual discharge during urination?"}, # Assuming space converted to underscore for model_key
-"fatigue": {"model_key": "fatigue", "ask_phrase": "Are you feeling fatigued, very tired, or lacking energy?"},
-"weight gain": {"model_key": "weight_gain", "ask_phrase": "Have you experienced unexplained weight gain recently?"},
-"anxiety": {"model_key": "anxiety", "ask_phrase": "Are you feeling anxious, worried, or uneasy?"},
-"cold hands and feet": {"model_key": "cold_hands_and_feets", "ask_phrase": "Do your hands and feet often feel cold?"}, # Original key 'feets'
-"mood swings": {"model_key": "mood_swings", "ask_phrase": "Are you experiencing frequent mood swings or changes in your emotional state?"},
-"weight loss": {"model_key": "weight_loss", "ask_phrase": "Have you had unexplained weight loss recently?"},
-"restlessness": {"model_key": "restlessness", "ask_phrase": "Are you feeling restless or unable to relax?"},
-"lethargy": {"model_key": "lethargy", "ask_phrase": "Are you experiencing lethargy or a lack of energy and enthusiasm?"},
-"patches in throat": {"model_key": "patches_in_throat", "ask_phrase": "Have you noticed any patches or unusual spots in your throat?"},
-"irregular sugar level": {"model_key": "irregular_sugar_level", "ask_phrase": "Have you had irregular blood sugar levels?"},
-"cough": {"model_key": "cough", "ask_phrase": "Do you have a cough?"},
-"high fever": {"model_key": "high_fever", "ask_phrase": "Do you have a high fever?"},
-"sunken eyes": {"model_key": "sunken_eyes", "ask_phrase": "Do your eyes appear sunken or hollow?"},
-"breathlessness": {"model_key": "breathlessness", "ask_phrase": "Are you experiencing breathlessness or shortness of breath?"},
-"sweating": {"model_key": "sweating", "ask_phrase": "Are you sweating more than usual, or having night sweats?"},
-"dehydration": {"model_key": "dehydration", "ask_phrase": "Do you feel dehydrated, thirsty, or have a dry mouth?"},
-"indigestion": {"model_key": "indigestion", "ask_phrase": "Are you suffering from indigestion or an upset stomach after eating?"},
-"headache": {"model_key": "headache", "ask_phrase": "Do you have a headache?"},
-"yellowish skin": {"model_key": "yellowish_skin", "ask_phrase": "Has your skin taken on a yellowish tint?"},
-"dark urine": {"model_key": "dark_urine", "ask_phrase": "Is your urine darker than usual?"},
-"nausea": {"model_key": "nausea", "ask_phrase": "Are you feeling nauseous or like you might vomit?"},
-"loss of appetite": {"model_key": "loss_of_appetite", "ask_phrase": "Have you experienced a loss of appetite?"},
-"pain behind the eyes": {"model_key": "pain_behind_the_eyes", "ask_phrase": "Do you have pain behind your eyes?"},
-"back pain": {"model_key": "back_pain", "ask_phrase": "Are you experiencing back pain?"},
-"constipation": {"model_key": "constipation", "ask_phrase": "Are you suffering from constipation?"},
-"abdominal pain": {"model_key": "abdominal_pain", "ask_phrase": "Do you have pain in your abdomen (belly area)?"},
-"diarrhoea": {"model_key": "diarrhoea", "ask_phrase": "Are you experiencing diarrhoea or loose stools?"},
-"mild fever": {"model_key": "mild_fever", "ask_phrase": "Do you have a mild fever?"},
-"yellow urine": {"model_key": "yellow_urine", "ask_phrase": "Is your urine distinctly yellow?"}, # Note: dark_urine already exists, this might be redundant or different context
-"yellowing of eyes": {"model_key": "yellowing_of_eyes", "ask_phrase": "Have the whites of your eyes turned yellow?"},
-"acute liver failure": {"model_key": "acute_liver_failure", "ask_phrase": "Are there signs or a diagnosis of acute liver failure?"}, # This is serious, bot should emphasize doctor visit
-"fluid overload": {"model_key": "fluid_overload", "ask_phrase": "Are you experiencing symptoms of fluid overload, like swelling?"}, # If another "fluid_overload" exists, ensure distinct model_keys
-"swelling of stomach": {"model_key": "swelling_of_stomach", "ask_phrase": "Is your stomach swollen or distended?"},
-"swelled lymph nodes": {"model_key": "swelled_lymph_nodes", "ask_phrase": "Do you have any swelled lymph nodes, for example, in your neck, armpits, or groin?"},
-"malaise": {"model_key": "malaise", "ask_phrase": "Are you feeling a general sense of malaise, discomfort, or illness?"},
-"blurred and distorted vision": {"model_key": "blurred_and_distorted_vision", "ask_phrase": "Is your vision blurred or distorted?"},
-"phlegm": {"model_key": "phlegm", "ask_phrase": "Are you coughing up phlegm or mucus?"},
-"throat irritation": {"model_key": "throat_irritation", "ask_phrase": "Do you have throat irritation or a scratchy throat?"},
-"redness of eyes": {"model_key": "redness_of_eyes", "ask_phrase": "Are your eyes red or bloodshot?"},
-"sinus pressure": {"model_key": "sinus_pressure", "ask_phrase": "Do you feel pressure in your sinuses?"},
-"runny nose": {"model_key": "runny_nose", "ask_phrase": "Do you have a runny nose?"},
-"congestion": {"model_key": "congestion", "ask_phrase": "Are you experiencing nasal congestion or a stuffy nose?"},
-"chest pain": {"model_key": "chest_pain", "ask_phrase": "Are you experiencing any chest pain?"}, # Critical, emphasize doctor
-"weakness in limbs": {"model_key": "weakness_in_limbs", "ask_phrase": "Do you have weakness in your arms or legs?"},
-"fast heart rate": {"model_key": "fast_heart_rate", "ask_phrase": "Is your heart beating faster than usual, or do you have palpitations?"},
-"pain during bowel movements": {"model_key": "pain_during_bowel_movements", "ask_phrase": "Do you experience pain during bowel movements?"},
-"pain in anal region": {"model_key": "pain_in_anal_region", "ask_phrase": "Do you have pain in your anal region?"},
-"bloody stool": {"model_key": "bloody_stool", "ask_phrase": "Have you noticed any blood in your stool?"},
-"irritation in anus": {"model_key": "irritation_in_anus", "ask_phrase": "Do you have irritation in your anus?"},
-"neck pain": {"model_key": "neck_pain", "ask_phrase": "Are you experiencing neck pain?"},
-"dizziness": {"model_key": "dizziness", "ask_phrase": "Are you feeling dizzy or lightheaded?"},
-"cramps": {"model_key": "cramps", "ask_phrase": "Are you experiencing cramps (e.g., muscle or abdominal)?"},
-"bruising": {"model_key": "bruising", "ask_phrase": "Are you bruising more easily than usual?"},
-"obesity": {"model_key": "obesity", "ask_phrase": "Are you concerned about obesity or significant overweight?"}, # This is a condition, not a typical acute symptom
-"swollen legs": {"model_key": "swollen_legs", "ask_phrase": "Are your legs swollen?"},
-"swollen blood vessels": {"model_key": "swollen_blood_vessels", "ask_phrase": "Have you noticed any swollen blood vessels?"},
-"puffy face and eyes": {"model_key": "puffy_face_and_eyes", "ask_phrase": "Is your face or around your eyes puffy?"},
-"enlarged thyroid": {"model_key": "enlarged_thyroid", "ask_phrase": "Do you have an enlarged thyroid or a noticeable swelling in the front of your neck?"},
-"brittle nails": {"model_key": "brittle_nails", "ask_phrase": "Are your nails brittle or breaking easily?"},
-"swollen extremeties": {"model_key": "swollen_extremeties", "ask_phrase": "Are your extremeties (hands, feet, arms, legs) swollen?"}, # Note: extremities
-"excessive hunger": {"model_key": "excessive_hunger", "ask_phrase": "Are you experiencing excessive hunger?"},
-"extra marital contacts": {"model_key": "extra_marital_contacts", "ask_phrase": "Have you had extra-marital contacts? (This information is confidential and helps assess certain risks.)"}, # Sensitive, handle with care
-"drying and tingling lips": {"model_key": "drying_and_tingling_lips", "ask_phrase": "Are your lips dry or do they have a tingling sensation?"},
-"slurred speech": {"model_key": "slurred_speech", "ask_phrase": "Is your speech slurred or difficult to understand?"}, # Critical
-"knee pain": {"model_key": "knee_pain", "ask_phrase": "Are you experiencing knee pain?"},
-"hip joint pain": {"model_key": "hip_joint_pain", "ask_phrase": "Do you have pain in your hip joint?"},
-"muscle weakness": {"model_key": "muscle_weakness", "ask_phrase": "Are you experiencing muscle weakness?"},
-"stiff neck": {"model_key": "stiff_neck", "ask_phrase": "Do you have a stiff neck?"},
-"swelling joints": {"model_key": "swelling_joints", "ask_phrase": "Are any of your joints swollen?"},
-"movement stiffness": {"model_key": "movement_stiffness", "ask_phrase": "Do you feel stiffness when trying to move?"},
-"spinning movements": {"model_key": "spinning_movements", "ask_phrase": "Are you experiencing spinning sensations or vertigo?"},
-"loss of balance": {"model_key": "loss_of_balance", "ask_phrase": "Have you had any loss of balance or unsteadiness?"},
-"unsteadiness": {"model_key": "unsteadiness", "ask_phrase": "Do you feel unsteady on your feet?"},
-"weakness of one body side": {"model_key": "weakness_of_one_body_side", "ask_phrase": "Do you have weakness on one side of your body?"}, # Critical
-"loss of smell": {"model_key": "loss_of_smell", "ask_phrase": "Have you experienced a loss of smell?"},
-"bladder discomfort": {"model_key": "bladder_discomfort", "ask_phrase": "Are you feeling any discomfort in your bladder area?"},
-# "foul smell of urine": {"model_key": "foul_smell_of urine", "ask_phrase": "Does your urine have a foul or unusual smell?"}, # Assuming space to underscore
-"continuous feel of urine": {"model_key": "continuous_feel_of_urine", "ask_phrase": "Do you have a continuous feeling of needing to urinate?"},
-"passage of gases": {"model_key": "passage_of_gases", "ask_phrase": "Are you passing more gas than usual?"},
-"internal itching": {"model_key": "internal_itching", "ask_phrase": "Are you experiencing internal itching (e.g., vaginal or anal)?"},
-"toxic look (typhos)": {"model_key": "toxic_look_(typhos)", "ask_phrase": "Do you appear very ill, perhaps with a 'toxic look' or typhos-like state?"}, # TYPHOS is a severe state
-"depression": {"model_key": "depression", "ask_phrase": "Are you feeling depressed, sad, or hopeless?"},
-"irritability": {"model_key": "irritability", "ask_phrase": "Are you feeling more irritable than usual?"},
-"muscle pain": {"model_key": "muscle_pain", "ask_phrase": "Are you experiencing muscle pain or aches?"},
-"altered sensorium": {"model_key": "altered_sensorium", "ask_phrase": "Have you experienced any altered sensorium, confusion, or changes in consciousness?"}, # Critical
-"red spots over body": {"model_key": "red_spots_over_body", "ask_phrase": "Have you noticed red spots appearing over your body?"},
-"belly pain": {"model_key": "belly_pain", "ask_phrase": "Do you have pain in your belly area?"}, # Note: 'stomach_pain' and 'abdominal_pain' exist. Ensure model keys are distinct if these are truly different symptoms in model.
-"abnormal menstruation": {"model_key": "abnormal_menstruation", "ask_phrase": "Are you experiencing abnormal menstruation (e.g., irregular, heavy, or missed periods)?"},
-# "dischromic patches": {"model_key": "dischromic _patches", "ask_phrase": "Do you have dischromic patches (discolored skin patches)?"}, # Assuming dischromic__patches -> dischromic_patches
-"watering from eyes": {"model_key": "watering_from_eyes", "ask_phrase": "Are your eyes watering excessively?"},
-"increased appetite": {"model_key": "increased_appetite", "ask_phrase": "Has your appetite increased significantly?"},
-"polyuria": {"model_key": "polyuria", "ask_phrase": "Are you experiencing polyuria (urinating large volumes frequently)?"},
-"family history": {"model_key": "family_history", "ask_phrase": "Is there a family history of similar conditions or specific diseases?"}, # This is a risk factor, not a direct symptom usually
-"mucoid sputum": {"model_key": "mucoid_sputum", "ask_phrase": "Are you coughing up mucoid (clear or white) sputum?"},
-"rusty sputum": {"model_key": "rusty_sputum", "ask_phrase": "Are you coughing up rusty-colored sputum?"},
-"lack of concentration": {"model_key": "lack_of_concentration", "ask_phrase": "Are you having difficulty concentrating?"},
-"visual disturbances": {"model_key": "visual_disturbances", "ask_phrase": "Are you experiencing any visual disturbances other than blurred vision?"},
-"receiving blood transfusion": {"model_key": "receiving_blood_transfusion", "ask_phrase": "Have you recently received a blood transfusion?"}, # Risk factor
-"receiving unsterile injections": {"model_key": "receiving_unsterile_injections", "ask_phrase": "Have you recently received any unsterile injections?"}, # Risk factor
-"coma": {"model_key": "coma", "ask_phrase": "Has there been any instance of coma or unresponsiveness?"}, # Critical
-"stomach bleeding": {"model_key": "stomach_bleeding", "ask_phrase": "Are there any signs of stomach bleeding (e.g., vomiting blood, black tarry stools)?"}, # Critical
-"distention of abdomen": {"model_key": "distention_of_abdomen", "ask_phrase": "Is your abdomen distended or significantly bloated?"},
-"history of alcohol consumption": {"model_key": "history_of_alcohol_consumption", "ask_phrase": "Do you have a history of significant alcohol consumption?"}, # Risk factor
-# "fluid_overload" is listed twice in your input. Assuming it maps to the same model_key. If they are different symptoms in the model, they need different keys.
-# Assuming the second one is the same or a typo.
-"blood in sputum": {"model_key": "blood_in_sputum", "ask_phrase": "Are you coughing up blood in your sputum?"},
-"prominent veins on calf": {"model_key": "prominent_veins_on_calf", "ask_phrase": "Are the veins on your calf prominent or bulging?"},
-"palpitations": {"model_key": "palpitations", "ask_phrase": "Are you experiencing palpitations or a fluttering sensation in your chest?"}, # Similar to fast_heart_rate, check model diff.
-"painful walking": {"model_key": "painful_walking", "ask_phrase": "Is it painful for you to walk?"},
-"pus filled pimples": {"model_key": "pus_filled_pimples", "ask_phrase": "Do you have pus-filled pimples?"},
-"blackheads": {"model_key": "blackheads", "ask_phrase": "Are you experiencing blackheads?"},
-"scurring": {"model_key": "scurring", "ask_phrase": "Do you have scurring (scarring or scabbing) on your skin?"}, # Spelling "scurring" as in dataset
-"skin peeling": {"model_key": "skin_peeling", "ask_phrase": "Is your skin peeling?"},
-"silver like dusting": {"model_key": "silver_like_dusting", "ask_phrase": "Do you have a silver-like dusting or scales on your skin?"},
-"small dents in nails": {"model_key": "small_dents_in_nails", "ask_phrase": "Are there small dents or pits in your nails?"},
-"inflammatory nails": {"model_key": "inflammatory_nails", "ask_phrase": "Are your nails inflamed, red, or swollen around the edges?"},
-"blister": {"model_key": "blister", "ask_phrase": "Have you developed any blisters on your skin?"},
-"red sore around nose": {"model_key": "red_sore_around_nose", "ask_phrase": "Do you have a red sore or irritation around your nose?"},
-"yellow crust ooze": {"model_key": "yellow_crust_ooze", "ask_phrase": "Is there any yellow crust or ooze from skin lesions?"},
-# --- Synonyms (Add more as you think of them) ---
-"sore throat": {"model_key": "throat_irritation", "ask_phrase": "Do you have a sore throat?"}, # Or 'patches_in_throat' depending on context
-"tiredness": {"model_key": "fatigue", "ask_phrase": "Are you feeling extremely tired?"},
-"throwing up": {"model_key": "vomiting", "ask_phrase": "Have you been throwing up?"},
-"painful urination": {"model_key": "burning_micturition", "ask_phrase": "Is it painful when you urinate?"},
-"loose stools": {"model_key": "diarrhoea", "ask_phrase": "Are you having loose stools or diarrhoea?"},
-"shortness of breath": {"model_key": "breathlessness", "ask_phrase": "Are you experiencing shortness of breath?"},
-"upset stomach": {"model_key": "indigestion", "ask_phrase": "Do you have an upset stomach?"}, # Or nausea/vomiting depending on detail
-"feeling sick": {"model_key": "nausea", "ask_phrase": "Are you feeling sick to your stomach?"},
-"stuffy nose": {"model_key": "congestion", "ask_phrase": "Do you have a stuffy nose?"},
-"vertigo": {"model_key": "spinning_movements", "ask_phrase": "Are you experiencing vertigo or a spinning sensation?"},
-"passing gas": {"model_key": "passage_of_gases", "ask_phrase": "Are you passing more gas than usual?"},
-"feeling down": {"model_key": "depression", "ask_phrase": "Are you feeling down or depressed?"},
-"peeing a lot": {"model_key": "polyuria", "ask_phrase": "Are you urinating much more frequently or in larger amounts?"},
-}
-
-
+doctors_df = None # DataFrames are created by initialize_app_data() so importing app never touches pandas
+USE_DOCTORS_DB = False
+VISITING_HOURS_INDEX = None # Parsed visiting_hours by doctor id, see visiting_hours.py
+DOCTOR_DIRECTORY = None # Region-sharded search service when AROGYABOT_DOCTOR_DIRECTORY is set
+DOCTOR_VIEWS = None # DoctorViews when AROGYABOT_DOCTOR_VIEWS is set; replaced whole on rebuild
+DOCTOR_VIEW_REFRESHER = None
+DOCTORS_DB_GENERATION = 0 # Bumped when the store file is replaced; each thread then reopens it
+disease_desc_df = None
+disease_precaution_df = None
+APP_DATA_READY = False
+_app_data_lock = threading.Lock()
+SESSION_TOKEN_CODEC = None
+SESSION_SNAPSHOTS = None # SessionSnapshotStore when AROGYABOT_SESSION_SNAPSHOT is set
+SHADOW_EVALUATOR = None # ShadowEvaluator when AROGYABOT_SHADOW_MODEL is set
+MODEL_REGISTRY = None # ModelRegistry when AROGYABOT_MODEL_REGISTRY is set
+MODEL_VERSION = None
+SYMPTOM_POSTERIOR = None
+EARLY_STOP_STATS = {'conversations_stopped_early': 0, 'turns_saved': 0} # Real traffic only; reported by /readyz
+_early_stop_stats_lock = threading.Lock()
+
+# Validated symptom lookups, filled by initialize_app_data() from the compiled artifact (see symptom_map.py)
+SYMPTOM_MAP = {}
 MODEL_KEY_TO_ASK_PHRASE = {}
 NATURAL_SYMPTOM_PHRASES_FOR_FUZZY = []
-
-def initialize_app_data():
-    # ... (your existing initialize_app_data function - no changes needed here for this step)
-    # I will omit for brevity, assume it's the same as your provided code.
-    global model, MODEL_SYMPTOM_KEYS, doctors_df, disease_desc_df, disease_precaution_df
-    global MODEL_KEY_TO_ASK_PHRASE, NATURAL_SYMPTOM_PHRASES_FOR_FUZZY
-
-    app.logger.info("Initializing application data...")
-    try:
-        with open(MODEL_PATH, 'rb') as f:
-            model = pickle.load(f)
-        with open(SYMPTOM_COLUMNS_PATH, 'rb') as f:
-            MODEL_SYMPTOM_KEYS = pickle.load(f)
-        MODEL_SYMPTOM_KEYS = [key.strip().lower().replace(' ', '_') for key in MODEL_SYMPTOM_KEYS]
-        app.logger.info(f"Model and {len(MODEL_SYMPTOM_KEYS)} symptom keys loaded.")
-
-        app.logger.info(f"Verifying SYMPTOM_MAP against {len(MODEL_SYMPTOM_KEYS)} model keys...")
-        validated_symptom_map_temp = {}
-        
-        for natural_phrase, details in SYMPTOM_MAP.items():
-            model_key_in_map = details.get("model_key")
-            if not isinstance(model_key_in_map, str):
-                 app.logger.warning(f"SymptomMap Integrity Issue: Entry for '{natural_phrase}' has no 'model_key' or it's not a string. Skipping.")
-                 continue
-            normalized_model_key_in_map = model_key_in_map.strip().lower().replace(' ', '_')
-            if normalized_model_key_in_map not in MODEL_SYMPTOM_KEYS:
-                # Try to find a match for keys that might have typos like 'spotting_ urination' vs 'spotting_urination'
-                # This is a simple fix, more robust matching might be needed for complex cases
-                corrected_key = normalized_model_key_in_map.replace(" _", "_") 
-                if corrected_key in MODEL_SYMPTOM_KEYS:
-                    app.logger.info(f"Corrected model_key '{normalized_model_key_in_map}' to '{corrected_key}' for phrase '{natural_phrase}'.")
-                    normalized_model_key_in_map = corrected_key
-                else:
-                    app.logger.warning(f"SymptomMap Error: model_key '{normalized_model_key_in_map}' (from phrase '{natural_phrase}') not found in loaded MODEL_SYMPTOM_KEYS. Skipping this entry.")
-                    continue # Skip this entry
-            
-            details["model_key"] = normalized_model_key_in_map
-            validated_symptom_map_temp[natural_phrase] = details
-        
-        SYMPTOM_MAP.clear()
-        SYMPTOM_MAP.update(validated_symptom_map_temp)
-
-        MODEL_KEY_TO_ASK_PHRASE = {details["model_key"]: details["ask_phrase"]
-                                   for details in SYMPTOM_MAP.values() if details["model_key"] in MODEL_SYMPTOM_KEYS}
-        NATURAL_SYMPTOM_PHRASES_FOR_FUZZY = list(SYMPTOM_MAP.keys())
-        app.logger.info(f"SYMPTOM_MAP processed: {len(SYMPTOM_MAP)} natural phrases, {len(MODEL_KEY_TO_ASK_PHRASE)} model key ask phrases.")
-        app.logger.info(f"Sample model keys in MODEL_KEY_TO_ASK_PHRASE: {list(MODEL_KEY_TO_ASK_PHRASE.keys())[:5]}")
-        app.logger.info(f"MODEL_SYMPTOM_KEYS sample: {MODEL_SYMPTOM_KEYS[:5]}")
-
-
-    except FileNotFoundError:
-        app.logger.error(f"CRITICAL: Model or symptom_columns.pkl not found in {MODEL_DIR}.")
-        model = None
-    except Exception as e:
-        app.logger.error(f"CRITICAL Error initializing model/symptom keys: {e}")
-        model = None
-
+SYMPTOM_FUZZY_CHOICES = [] # NATURAL_SYMPTOM_PHRASES_FOR_FUZZY pre-processed for the fuzzy scorer
+SYMPTOM_SUGGESTER = None # Prefix index behind /symptoms/suggest
+
+# --- Turn recording ---
+RECORDER = ConversationRecorder(RECORD_PATH, RECORD_MAX_BYTES, RECORD_BACKUPS, RECORD_SALT) if RECORD_PATH else None
+if RECORDER:
+    atexit.register(RECORDER.close)
+
+def timed_stage(stage):
+    # Adds the wrapped call's duration to the current turn's timing breakdown when recording is on.
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if RECORDER is None or not has_request_context():
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stages = g.setdefault('turn_stages', {})
+                stages[stage] = stages.get(stage, 0.0) + (time.perf_counter() - start) * 1000
+        return wrapper
+    return decorator
+
+@app.before_request
+def _start_turn_recording():
+    if RECORDER and request.endpoint == 'chat_api':
+        g.turn_start = time.perf_counter()
+
+@app.after_request
+def _record_turn(response):
+    start = g.get('turn_start')
+    if start is None or getattr(_warmup_context, 'active', False):
+        return response
+    data = request.get_json(silent=True) or {}
+    body = response.get_json(silent=True) or {}
+    user_name = g.get('turn_user_name')
+    stages = {name: round(ms, 3) for name, ms in g.get('turn_stages', {}).items()}
+    if g.get('admission_start') is not None:
+        stages['queue_wait'] = round((g.admission_start - start) * 1000, 3)
+    RECORDER.record({
+        'ts': time.time(),
+        'conversation': RECORDER.anonymize(data.get('user_id')),
+        'state': g.get('turn_state'), 'end_state': g.get('turn_end_state'),
+        # A turn answering the name question is the name itself, so it is always replaced.
+        'message': NAME_PLACEHOLDER if g.get('turn_state') == 'AWAITING_NAME' and user_name else redact_name(data.get('message', ''), user_name),
+        'status': response.status_code,
+        'latency_ms': round((time.perf_counter() - start) * 1000, 3),
+        'stages': stages,
+        'response_parts': len(body.get('bot_response_parts', [])),
+        'response_digest': response_digest(body.get('bot_response_parts'), user_name),
+    })
+    return response
+
+# Repeated short strings become categoricals; `image_source` is display-only and lives in a side store that is read
+# from the CSV on demand, so every worker doesn't carry it in doctors_df. `about` is never shown and is dropped.
+DOCTOR_CATEGORICAL_COLUMNS = ('speciality', 'hospital_name', 'degree', 'address', 'visiting_hours', 'geo_source', 'geo_match')
+DOCTOR_SIDE_TEXT_COLUMNS = ('image_source',)
+DOCTOR_UNUSED_COLUMNS = ('about',)
+NO_IMAGE_URL = 'https://via.placeholder.com/100?text=No+Image'
+doctor_side_text_df = None
+_doctor_side_text_lock = threading.Lock()
+
+def compact_doctors_df(df):
+    df = df.drop(columns=[col for col in DOCTOR_SIDE_TEXT_COLUMNS + DOCTOR_UNUSED_COLUMNS if col in df.columns])
+    for col in DOCTOR_CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    for col in ('latitude', 'longitude'):
+        df[col] = df[col].astype(np.float32)
+    return df
+
+def get_doctor_side_text():
+    global doctor_side_text_df
+    if doctor_side_text_df is None:
+        with _doctor_side_text_lock:
+            if doctor_side_text_df is None:
+                side_df = pd.read_csv(DOCTORS_CSV_PATH, dtype=str,
+                                      usecols=lambda col: col.strip().lower() in DOCTOR_SIDE_TEXT_COLUMNS)
+                side_df.columns = side_df.columns.str.strip().str.lower()
+                side_df['image_source'] = side_df['image_source'].fillna(NO_IMAGE_URL).astype('category')
+                app.logger.info(f"Doctor side text loaded on demand: {side_df.memory_usage(deep=True).sum() / 1024:.0f} KiB.")
+                doctor_side_text_df = side_df
+    return doctor_side_text_df
+
+def load_doctors_csv():
+    # The frame is built in a local and swapped in whole, since the view refresher reloads it while requests read
+    # it. A failed reload keeps the previous frame.
+    global doctors_df, doctor_side_text_df
     try:
-        doctors_df = pd.read_csv(DOCTORS_CSV_PATH, dtype={'number': str})
-        doctors_df.columns = doctors_df.columns.str.strip().str.lower().str.replace(' ', '_')
+        df = pd.read_csv(DOCTORS_CSV_PATH, dtype={'number': str})
+        df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_')
         
         lat_col_name = 'latitude' 
         lon_col_name = 'longitude'
 
-        if lat_col_name in doctors_df.columns:
-            doctors_df[lat_col_name] = pd.to_numeric(doctors_df[lat_col_name], errors='coerce')
+        if lat_col_name in df.columns:
+            df[lat_col_name] = pd.to_numeric(df[lat_col_name], errors='coerce')
         else:
             app.logger.warning(f"Latitude column '{lat_col_name}' not found in doctors CSV.")
-            doctors_df[lat_col_name] = np.nan 
+            df[lat_col_name] = np.nan 
 
-        if lon_col_name in doctors_df.columns:
-            doctors_df[lon_col_name] = pd.to_numeric(doctors_df[lon_col_name], errors='coerce')
+        if lon_col_name in df.columns:
+            df[lon_col_name] = pd.to_numeric(df[lon_col_name], errors='coerce')
         else:
             app.logger.warning(f"Longitude column '{lon_col_name}' not found in doctors CSV.")
-            doctors_df[lon_col_name] = np.nan 
+            df[lon_col_name] = np.nan 
 
-        doctors_df['about'] = doctors_df['about'].fillna('N/A')
-        doctors_df['image_source'] = doctors_df['image_source'].fillna('https://via.placeholder.com/100?text=No+Image')
-        app.logger.info(f"Doctors data loaded from {DOCTORS_CSV_PATH}. Shape: {doctors_df.shape}")
+        memory_before = df.memory_usage(deep=True).sum()
+        df = compact_doctors_df(df)
+        memory_after = df.memory_usage(deep=True).sum()
+        app.logger.info(f"Doctors data loaded from {DOCTORS_CSV_PATH}. Shape: {df.shape}. "
+                        f"Memory (deep): {memory_before / 1024:.0f} KiB -> {memory_after / 1024:.0f} KiB after compaction.")
         
         # Correct column name reference for logging if `doc_name_col` wasn't defined in this scope.
         # Assuming the name column after cleaning is 'name'.
         doc_name_actual_col = 'name' # This should be the actual column name after cleaning
-        if doc_name_actual_col not in doctors_df.columns:
+        if doc_name_actual_col not in df.columns:
             app.logger.warning(f"Doctor name column '{doc_name_actual_col}' not found for logging head.")
             # Fallback or log error, here we just proceed without it in the log
-            app.logger.info(doctors_df[[lat_col_name, lon_col_name]].head())
+            app.logger.info(df[[lat_col_name, lon_col_name]].head())
         else:
-            app.logger.info(doctors_df[[doc_name_actual_col, lat_col_name, lon_col_name]].head())
+            app.logger.info(df[[doc_name_actual_col, lat_col_name, lon_col_name]].head())
 
 
     except Exception as e:
         app.logger.error(f"Error loading doctors data {DOCTORS_CSV_PATH}: {e}")
-        doctors_df = pd.DataFrame() 
+        if doctors_df is None:
+            doctors_df = pd.DataFrame() 
+        return
+    doctors_df = df
+    doctor_side_text_df = None # Row ids may change with the reload
+    clear_doctor_card_cache()
+
+
+# --- Doctor directory access (indexed SQLite store or in-memory DataFrame) ---
+DOCTOR_RECORD_FIELDS = ('id', 'name', 'speciality', 'hospital_name', 'address', 'number', 'latitude', 'longitude')
+_doctors_db_local = threading.local()
+
+def get_doctors_db():
+    # sqlite3 connections can't be shared across threads, so each worker thread opens its own read-only one.
+    conn = getattr(_doctors_db_local, 'conn', None)
+    if conn is not None and _doctors_db_local.generation != DOCTORS_DB_GENERATION:
+        conn.close() # Still reading the replaced file
+        conn = None
+    if conn is None:
+        conn = sqlite3.connect(f"file:{DOCTORS_DB_PATH}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        _doctors_db_local.conn, _doctors_db_local.generation = conn, DOCTORS_DB_GENERATION
+    return conn
+
+def doctors_available():
+    return USE_DOCTORS_DB or (doctors_df is not None and not doctors_df.empty)
+
+def build_visiting_hours_index():
+    global VISITING_HOURS_INDEX
+    if USE_DOCTORS_DB:
+        rows = get_doctors_db().execute("SELECT id, visiting_hours FROM doctor_details").fetchall()
+    elif doctors_df is not None and 'visiting_hours' in doctors_df.columns:
+        rows = zip(doctors_df.index, doctors_df['visiting_hours'].astype(object))
+    else:
+        rows = []
+    VISITING_HOURS_INDEX = VisitingHoursIndex.build(rows)
+    report = VISITING_HOURS_INDEX.report(top=5)
+    app.logger.info(f"Visiting hours parsed for {report['rows']} doctors: {report['statuses']}.")
+    if report['distinct_failures']:
+        app.logger.warning(f"{report['distinct_failures']} distinct visiting_hours strings could not be fully parsed "
+                           f"(run `python visiting_hours.py` for the list), e.g. {[text for text, _ in report['top_failures']]}")
+
+AVAILABILITY_LABELS = {'open_now': 'Open now', 'later_today': 'Available later today'}
+
+def local_now():
+    return datetime.datetime.now(datetime.timezone(datetime.timedelta(hours=LOCAL_UTC_OFFSET_HOURS)))
+
+def build_doctor_directory():
+    # Shards are built from the rows the doctor cards are read from, so every id they return has a card with the
+    # same coordinates. A rebuild swaps the new directory in before the old one's shards are stopped.
+    global DOCTOR_DIRECTORY
+    previous = DOCTOR_DIRECTORY
+    source_path = DOCTORS_DB_PATH if USE_DOCTORS_DB else DOCTORS_CSV_PATH
+    directory = None
+    try:
+        directory = doctor_directory.build_directory(DOCTOR_DIRECTORY_MODE, source_path)
+        atexit.register(directory.close) # Stops the shard processes in 'multiprocess' mode
+        shards = directory.stats()['shards']
+        app.logger.info(f"Doctor directory service ({DOCTOR_DIRECTORY_MODE}, {os.path.basename(source_path)}): "
+                        f"{len(shards)} region shards, {sum(shard['doctors'] for shard in shards.values())} searchable doctors.")
+    except Exception as e:
+        app.logger.error(f"Could not start the {DOCTOR_DIRECTORY_MODE} doctor directory: {e}. Searching the doctor store directly.")
+    DOCTOR_DIRECTORY = directory
+    if previous is not None:
+        atexit.unregister(previous.close)
+        previous.close()
+
+def parse_user_location(value):
+    # (lat, lng) from a request's {"lat": .., "lng": ..}, or None when missing or out of range.
+    try:
+        lat, lng = float(value['lat']), float(value['lng'])
+    except (TypeError, KeyError, ValueError):
+        return None
+    return (lat, lng) if -90 <= lat <= 90 and -180 <= lng <= 180 and (lat, lng) != (0, 0) else None
+
+def _matching_doctor_ids(target_spec, limit=None, near=None):
+    """Directory ids of doctors whose speciality contains `target_spec` and who have map coordinates: in directory
+    order, or nearest first when `near` is given and the directory service is on."""
+    if DOCTOR_DIRECTORY is not None:
+        return [doc_id for _, doc_id in DOCTOR_DIRECTORY.search(target_spec, limit, near)]
+    return _store_matching_doctor_ids(target_spec, limit)
+
+def _store_matching_doctor_ids(target_spec, limit=None):
+    # The same search against the doctor store itself, in directory order.
+    if USE_DOCTORS_DB:
+        conn = get_doctors_db()
+        # The distinct-speciality table is small, so the substring match scans it and the doctors lookup stays indexed.
+        spec_ids = [row[0] for row in conn.execute(
+            "SELECT id FROM specialities WHERE instr(speciality_norm, ?) > 0", (target_spec.strip().lower(),))]
+        if not spec_ids:
+            return []
+        placeholders = ','.join('?' * len(spec_ids))
+        return [row[0] for row in conn.execute(
+            f"SELECT id FROM doctors WHERE speciality_id IN ({placeholders}) AND grid_cell IS NOT NULL ORDER BY id LIMIT ?",
+            (*spec_ids, -1 if limit is None else limit))]
+
+    lat_col, lon_col = 'latitude', 'longitude'
+    cond1 = doctors_df['speciality'].str.contains(target_spec, case=False, na=False)
+    cond2 = doctors_df[lat_col].notna()
+    cond3 = (doctors_df[lat_col] != 0)
+    cond4 = doctors_df[lon_col].notna()
+    cond5 = (doctors_df[lon_col] != 0)
+    return [int(row_id) for row_id in doctors_df.index[cond1 & cond2 & cond3 & cond4 & cond5][:limit]]
+
+def _doctor_records(ids):
+    """Plain dicts with DOCTOR_RECORD_FIELDS plus 'image_source' for `ids`, in the given order."""
+    if not ids:
+        return []
+    if USE_DOCTORS_DB:
+        conn = get_doctors_db()
+        placeholders = ','.join('?' * len(ids))
+        rows = conn.execute(
+            f"SELECT d.id, d.name, s.speciality, d.hospital_name, d.address, d.number, d.latitude, d.longitude, "
+            f"x.image_source FROM doctors d JOIN specialities s ON s.id = d.speciality_id "
+            f"JOIN doctor_details x ON x.id = d.id WHERE d.id IN ({placeholders})", ids).fetchall()
+        by_id = {row['id']: dict(row) for row in rows}
+        return [by_id[doc_id] for doc_id in ids if doc_id in by_id]
+
+    images = get_doctor_side_text()['image_source']
+    docs = []
+    for row_id, doc in doctors_df.loc[ids].iterrows():
+        record = {field: doc.get(field) for field in DOCTOR_RECORD_FIELDS[1:]}
+        record['id'] = int(row_id)
+        # Coordinates are stored as float32; plain floats keep the JSON response serializable.
+        record['latitude'], record['longitude'] = float(record['latitude']), float(record['longitude'])
+        record['image_source'] = images.iloc[row_id]
+        docs.append(record)
+    return docs
+
+@timed_stage('doctor_search')
+def find_doctor_ids_for_specialty(target_spec, limit=3, available_at=None, open_only=False, near=None):
+    """Ids of up to `limit` doctors whose speciality contains `target_spec` (case-insensitive) and who have map
+    coordinates, in directory order (nearest to `near` first with the directory service). Given an `available_at`
+    datetime they are instead ordered by visiting hours (open then, later that day, other days, unknown), keeping that
+    order within each group; `open_only` keeps only doctors open then."""
+    by_availability = available_at is not None and VISITING_HOURS_INDEX is not None
+    ids = _matching_doctor_ids(target_spec, None if by_availability else limit, near)
+    if by_availability:
+        if open_only:
+            ids = VISITING_HOURS_INDEX.open_now(ids, available_at)
+        ids = VISITING_HOURS_INDEX.rank(ids, available_at)[:limit]
+    return ids
+
+def find_doctors_for_specialty(target_spec, limit=3, available_at=None, open_only=False):
+    """Directory records for find_doctor_ids_for_specialty(); ranked results also carry an 'availability' field."""
+    by_availability = available_at is not None and VISITING_HOURS_INDEX is not None
+    docs = _doctor_records(find_doctor_ids_for_specialty(target_spec, limit, available_at, open_only))
+    if by_availability:
+        for doc in docs:
+            doc['availability'] = VISITING_HOURS_INDEX.availability(doc['id'], available_at)
+    return docs
+
+# --- Materialized doctor recommendations ---
+def served_disease_classes():
+    # Every disease a prediction can name: the main model's classes and any cohort model's.
+    classes = list(model.classes_) if model is not None else []
+    for entry in (MODEL_REGISTRY.entries if MODEL_REGISTRY is not None else []):
+        classes.extend(c for c in entry.model.classes_ if c not in classes)
+    return classes
+
+def doctor_store_signature():
+    return doctor_views.file_signature(DOCTORS_DB_PATH if USE_DOCTORS_DB else DOCTORS_CSV_PATH)
+
+def doctor_views_signature():
+    return doctor_store_signature(), MODEL_VERSION, tuple(served_disease_classes())
+
+def _doctor_coordinates(ids):
+    records = {doc['id']: doc for doc in _doctor_records([int(doc_id) for doc_id in ids])}
+    return ([float(records[doc_id]['latitude']) for doc_id in ids], [float(records[doc_id]['longitude']) for doc_id in ids])
+
+def build_doctor_views(by_region=None):
+    by_region = DOCTOR_VIEWS_MODE == 'region' if by_region is None else by_region
+    return doctor_views.build_views(sorted({normalize_text(c) for c in served_disease_classes()}),
+                                    disease_to_specialization_map.get, _store_matching_doctor_ids,
+                                    _doctor_coordinates if by_region else None, doctor_views_signature())
+
+def reload_doctor_data():
+    # Picks up a replaced doctor store: SQLite connections are reopened, the CSV is re-read, and what was derived
+    # from the old rows (cards, visiting hours, the directory service's shards) is rebuilt.
+    global DOCTORS_DB_GENERATION
+    if USE_DOCTORS_DB:
+        DOCTORS_DB_GENERATION += 1
+    else:
+        load_doctors_csv()
+    clear_doctor_card_cache()
+    build_visiting_hours_index()
+    if DOCTOR_DIRECTORY_MODE:
+        build_doctor_directory()
+
+def _rebuild_doctor_views(previous, current):
+    global DOCTOR_VIEWS
+    if previous[0] != current[0]:
+        app.logger.info("Doctor store changed on disk; reloading it.")
+        reload_doctor_data()
+    DOCTOR_VIEWS = build_doctor_views()
+    app.logger.info(f"Doctor views rebuilt: {DOCTOR_VIEWS.summary()}")
+
+def start_doctor_views():
+    global DOCTOR_VIEWS, DOCTOR_VIEW_REFRESHER
+    try:
+        DOCTOR_VIEWS = build_doctor_views()
+        app.logger.info(f"Doctor views built: {DOCTOR_VIEWS.summary()}")
+    except Exception as e:
+        app.logger.error(f"Could not build doctor views: {e}. Searching per request.")
+        DOCTOR_VIEWS = None
+        return
+    if DOCTOR_VIEW_REFRESHER is None and DOCTOR_VIEWS_REFRESH_SECONDS > 0:
+        DOCTOR_VIEW_REFRESHER = doctor_views.ViewRefresher(doctor_views_signature, _rebuild_doctor_views,
+                                                           DOCTOR_VIEWS_REFRESH_SECONDS, app.logger).start()
+
+def recommended_doctor_ids(disease_raw, target_spec, limit, available_at=None, near=None):
+    """find_doctor_ids_for_specialty() for the predicted disease, served from the materialized views when they cover
+    it. Nearest-first results from the directory service depend on the exact location, so those are still searched."""
+    views = DOCTOR_VIEWS
+    if views is not None and not (DOCTOR_DIRECTORY is not None and near is not None):
+        ids = views.lookup(normalize_text(disease_raw), doctor_directory.region_for(*near) if near is not None else None)
+        if ids is not None:
+            if available_at is not None and VISITING_HOURS_INDEX is not None:
+                return VISITING_HOURS_INDEX.rank(ids.tolist(), available_at)[:limit]
+            return ids[:limit].tolist()
+    return find_doctor_ids_for_specialty(target_spec, limit=limit, available_at=available_at, near=near)
+
+# --- Doctor cards ---
+# A doctor's display record (and, for the 'html' card format, its card markup) is built once, on first use, and
+# cached by directory id, so a search response only costs an id lookup per doctor. Cleared when the directory reloads.
+_doctor_card_cache = OrderedDict() # doctor id -> [card dict, card HTML pieces or None], least recently used first
+_doctor_card_cache_lock = threading.Lock()
+
+def clear_doctor_card_cache():
+    with _doctor_card_cache_lock:
+        _doctor_card_cache.clear()
+
+def _display_text(value):
+    if value is None or pd.isna(value):
+        return None
+    text = str(value).strip()
+    return text if text and text.lower() != 'nan' else None
+
+def make_doctor_card(doc):
+    """Compact display record of a directory row: missing fields and the placeholder image are left out."""
+    card = {
+        'id': int(doc['id']),
+        'name': _display_text(doc.get('name')) or 'N/A',
+        'speciality': _display_text(doc.get('speciality')) or 'N/A',
+        'hospital': _display_text(doc.get('hospital_name')),
+        'address': _display_text(doc.get('address')),
+        'contact': _display_text(doc.get('number')),
+        'lat': round(float(doc['latitude']), 5), # ~1 m
+        'lng': round(float(doc['longitude']), 5),
+    }
+    image = _display_text(doc.get('image_source'))
+    if image and image != NO_IMAGE_URL:
+        card['image'] = image
+    return {key: value for key, value in card.items() if value is not None}
+
+def _cached_doctor_cards(ids):
+    """Cache entries for `ids`, in the given order, building the missing ones with one directory lookup."""
+    with _doctor_card_cache_lock:
+        entries = {doc_id: _doctor_card_cache[doc_id] for doc_id in ids if doc_id in _doctor_card_cache}
+        for doc_id in entries:
+            _doctor_card_cache.move_to_end(doc_id)
+    missing = [doc_id for doc_id in ids if doc_id not in entries]
+    if missing:
+        built = {doc['id']: [make_doctor_card(doc), None] for doc in _doctor_records(missing)}
+        with _doctor_card_cache_lock:
+            for doc_id, entry in built.items():
+                entries[doc_id] = _doctor_card_cache.setdefault(doc_id, entry)
+            while len(_doctor_card_cache) > DOCTOR_CARD_CACHE_SIZE:
+                _doctor_card_cache.popitem(last=False)
+    return [entries[doc_id] for doc_id in ids if doc_id in entries]
+
+@timed_stage('doctor_cards')
+def get_doctor_cards(ids, available_at=None):
+    """Display records for `ids`; with `available_at` each also carries its 'availability' at that time."""
+    cards = []
+    for card, _ in _cached_doctor_cards(ids):
+        card = dict(card)
+        if available_at is not None and VISITING_HOURS_INDEX is not None:
+            card['availability'] = VISITING_HOURS_INDEX.availability(card['id'], available_at)
+        cards.append(card)
+    return cards
+
+def _doctor_card_html_pieces(card):
+    e = lambda value: html.escape(value or 'N/A', quote=True)
+    image = html.escape(card.get('image', 'https://via.placeholder.com/80?text=Doc'), quote=True)
+    head = (f"<div class='doctor-card' style='border:1px solid #eee; padding:10px; margin-bottom:10px; border-radius:5px; overflow:hidden;'>"
+            f"<img src='{image}' alt='{e(card['name'])}' style='width:60px; height:60px; border-radius:50%; float:left; margin-right:10px; object-fit:cover;'>"
+            f"<div><strong>")
+    body = (f"{e(card['name'])}</strong><br>"
+            f"<em>{e(card['speciality'])}</em><br>"
+            f"🏥 {e(card.get('hospital'))}<br>"
+            f"📍 <small>{e(card.get('address'))}</small><br>"
+            f"{'📞 ' + e(card['contact']) if card.get('contact') else ''}")
+    return head, body, "</div><div style='clear:both;'></div></div>"
+
+@timed_stage('doctor_cards')
+def get_doctor_card_html(ids, available_at=None, offset=0):
+    """Card HTML parts, numbered from offset + 1, and map_data records for `ids` (the 'html' card format)."""
+    parts, map_doctors = [], []
+    for i, entry in enumerate(_cached_doctor_cards(ids), start=offset):
+        card = entry[0]
+        if entry[1] is None:
+            entry[1] = _doctor_card_html_pieces(card)
+        head, body, foot = entry[1]
+        availability = (VISITING_HOURS_INDEX.availability(card['id'], available_at)
+                        if available_at is not None and VISITING_HOURS_INDEX is not None else None)
+        parts.append(f"{head}{i+1}. {body}"
+                     f"{'<br>🕒 ' + AVAILABILITY_LABELS[availability] if availability in AVAILABILITY_LABELS else ''}{foot}")
+        map_doctors.append({
+            "name": card['name'], "speciality": card['speciality'], "hospital": card.get('hospital'),
+            "address": card.get('address'), "contact": card.get('contact', 'N/A'),
+            "lat": card['lat'], "lng": card['lng'], "image": card.get('image', 'https://via.placeholder.com/80?text=Doc'),
+        })
+    return parts, map_doctors
+
+def load_serving_model():
+    # The compact forest when it was built from the current model files (see MODEL_FORMAT), else the sklearn pickle.
+    if MODEL_FORMAT not in ('sklearn', 'bitvector') and os.path.exists(COMPACT_MODEL_PATH):
+        try:
+            artifact = forest_compression.load_compact_model(COMPACT_MODEL_PATH)
+            if artifact['model_version'] == MODEL_VERSION:
+                forest = artifact['forest']
+                app.logger.info(f"Serving compact forest {COMPACT_MODEL_PATH}: {forest.n_trees} trees, {forest.n_nodes} nodes, "
+                                f"{forest.nbytes() / 1024:.0f} KiB.")
+                return forest
+            app.logger.warning(f"Compact model {COMPACT_MODEL_PATH} was built for model {artifact['model_version']}, "
+                               f"current is {MODEL_VERSION}; rebuild it with `python forest_compression.py`.")
+        except Exception as e:
+            app.logger.warning(f"Could not load compact model {COMPACT_MODEL_PATH}: {e}")
+    if MODEL_FORMAT == 'compact':
+        app.logger.warning("AROGYABOT_MODEL_FORMAT=compact but no usable compact model; falling back to the sklearn model.")
+    with open(MODEL_PATH, 'rb') as f:
+        sklearn_model = pickle.load(f)
+    if MODEL_FORMAT == 'bitvector':
+        try:
+            forest = bitvector_forest.BitvectorForest.from_sklearn(sklearn_model)
+            app.logger.info(f"Serving {MODEL_PATH} through bitvector scoring: {forest.n_trees} trees, "
+                            f"{forest.nbytes() / 1024:.0f} KiB of masks and leaf values.")
+            return forest
+        except ValueError as e:
+            app.logger.warning(f"Bitvector scoring unavailable ({e}); serving the sklearn model.")
+    return sklearn_model
+
+def initialize_app_data():
+    global model, MODEL_SYMPTOM_KEYS, disease_desc_df, disease_precaution_df, USE_DOCTORS_DB
+    global SYMPTOM_MAP, MODEL_KEY_TO_ASK_PHRASE, NATURAL_SYMPTOM_PHRASES_FOR_FUZZY, SYMPTOM_FUZZY_CHOICES, SYMPTOM_SUGGESTER
+    global MODEL_VERSION, SESSION_TOKEN_CODEC, SYMPTOM_POSTERIOR, SESSION_SNAPSHOTS, SHADOW_EVALUATOR, MODEL_REGISTRY
 
+    app.logger.info("Initializing application data...")
+    init_start = time.perf_counter()
+    disease_desc_df, disease_precaution_df = pd.DataFrame(), pd.DataFrame()
+    try:
+        stage_start = time.perf_counter()
+        MODEL_VERSION = compute_model_version(MODEL_PATH, SYMPTOM_COLUMNS_PATH)
+        model = load_serving_model()
+        with open(SYMPTOM_COLUMNS_PATH, 'rb') as f:
+            MODEL_SYMPTOM_KEYS = pickle.load(f)
+        MODEL_SYMPTOM_KEYS = [normalize_model_key(key) for key in MODEL_SYMPTOM_KEYS]
+        app.logger.info(f"Model and {len(MODEL_SYMPTOM_KEYS)} symptom keys loaded.")
+        if EXPLAIN_PREDICTIONS and getattr(model, 'node_value', None) is None:
+            app.logger.warning("AROGYABOT_EXPLANATIONS=1 needs a compact model built with node values; predictions will have no explanation.")
+        if SHADOW_MODEL_PATH:
+            try:
+                candidate = shadow_model.load_candidate_model(SHADOW_MODEL_PATH)
+                if getattr(candidate, 'n_features_in_', len(MODEL_SYMPTOM_KEYS)) != len(MODEL_SYMPTOM_KEYS):
+                    raise ValueError(f"it expects {candidate.n_features_in_} symptoms, the served model {len(MODEL_SYMPTOM_KEYS)}")
+                SHADOW_EVALUATOR = shadow_model.ShadowEvaluator(candidate, SHADOW_MAX_QUEUE, max_load_per_cpu=SHADOW_MAX_LOAD,
+                                                                latency_budget_ms=SHADOW_LATENCY_BUDGET_MS, is_busy=shadow_host_busy,
+                                                                name=os.path.basename(SHADOW_MODEL_PATH)).start()
+                app.logger.info(f"Shadow-evaluating candidate model {SHADOW_MODEL_PATH} ({type(candidate).__name__}).")
+            except Exception as e:
+                app.logger.warning(f"Shadow evaluation disabled: could not use candidate model {SHADOW_MODEL_PATH}: {e}")
+        if MODEL_REGISTRY_PATH:
+            try:
+                MODEL_REGISTRY = model_registry.load_registry(MODEL_REGISTRY_PATH, MODEL_SYMPTOM_KEYS, model, normalize_key=normalize_model_key)
+                for entry in MODEL_REGISTRY.entries:
+                    unknown = sorted(set(entry.model.classes_) - set(model.classes_)) # No description/precaution records
+                    app.logger.info(f"Cohort model {entry.name} ({type(entry.model).__name__}, {entry.nbytes / 1024:.0f} KiB"
+                                    f"{', shared' if entry.shared else ''}) for {entry.route}.")
+                    if unknown:
+                        app.logger.warning(f"Cohort model {entry.name} predicts {len(unknown)} diseases the main model doesn't, e.g. {unknown[:3]}.")
+            except Exception as e:
+                app.logger.error(f"Could not load model registry {MODEL_REGISTRY_PATH}: {e}. Serving the main model only.")
+                MODEL_REGISTRY = None
+        STARTUP_TIMINGS['model_load'] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        compiled = None
+        try:
+            compiled = load_compiled_symptom_map(COMPILED_SYMPTOM_MAP_PATH)
+            if compiled['model_version'] != MODEL_VERSION or compiled['model_symptom_keys'] != MODEL_SYMPTOM_KEYS:
+                app.logger.warning(f"Compiled symptom map {COMPILED_SYMPTOM_MAP_PATH} was built for model {compiled['model_version']}, "
+                                   f"but model {MODEL_VERSION} is loaded. Rebuild it with `python symptom_map.py`.")
+                compiled = None
+        except FileNotFoundError:
+            app.logger.info(f"No compiled symptom map at {COMPILED_SYMPTOM_MAP_PATH}; validating SYMPTOM_MAP at startup.")
+        except Exception as e:
+            app.logger.warning(f"Could not load compiled symptom map {COMPILED_SYMPTOM_MAP_PATH}: {e}")
+
+        if compiled is None:
+            app.logger.info(f"Verifying SYMPTOM_MAP against {len(MODEL_SYMPTOM_KEYS)} model keys...")
+            compiled, issues = compile_symptom_map(RAW_SYMPTOM_MAP, MODEL_SYMPTOM_KEYS, MODEL_VERSION)
+            for level, message in issues:
+                app.logger.info(message) if level == 'info' else app.logger.warning(message)
+        else:
+            app.logger.info(f"Loaded compiled symptom map for model {MODEL_VERSION}.")
+
+        SYMPTOM_MAP = compiled['symptom_map']
+        MODEL_KEY_TO_ASK_PHRASE = compiled['ask_phrases']
+        NATURAL_SYMPTOM_PHRASES_FOR_FUZZY = compiled['natural_phrases']
+        SYMPTOM_FUZZY_CHOICES = compiled['fuzzy_choices']
+        SYMPTOM_SUGGESTER = SymptomSuggester(SYMPTOM_MAP, MODEL_SYMPTOM_KEYS)
+        STARTUP_TIMINGS['symptom_map'] = time.perf_counter() - stage_start
+        app.logger.info(f"SYMPTOM_MAP processed: {len(SYMPTOM_MAP)} natural phrases, {len(MODEL_KEY_TO_ASK_PHRASE)} model key ask phrases.")
+        app.logger.info(f"Sample model keys in MODEL_KEY_TO_ASK_PHRASE: {list(MODEL_KEY_TO_ASK_PHRASE.keys())[:5]}")
+        app.logger.info(f"MODEL_SYMPTOM_KEYS sample: {MODEL_SYMPTOM_KEYS[:5]}")
+
+        if EARLY_STOP_MARGIN > 0:
+            stage_start = time.perf_counter()
+            SYMPTOM_POSTERIOR = symptom_posterior.SymptomPosterior.from_training_csv(TRAINING_CSV_PATH, MODEL_SYMPTOM_KEYS)
+            STARTUP_TIMINGS['posterior_tracker'] = time.perf_counter() - stage_start
+            app.logger.info(f"Early stopping enabled (margin {EARLY_STOP_MARGIN}); likelihoods for {len(SYMPTOM_POSTERIOR.classes)} diseases loaded.")
+
+        if STATELESS_SESSIONS:
+            if not SESSION_TOKEN_SECRET:
+                app.logger.warning("Stateless sessions enabled without AROGYABOT_SESSION_SECRET; tokens will only be valid on this worker.")
+            SESSION_TOKEN_CODEC = SessionTokenCodec(SESSION_TOKEN_SECRET or app.secret_key, MODEL_SYMPTOM_KEYS,
+                                                    ttl_seconds=SESSION_TOKEN_TTL_SECONDS)
+            app.logger.info("Stateless signed-token session mode enabled.")
+
+        if SESSION_SNAPSHOT_PATH and STATELESS_SESSIONS:
+            app.logger.warning("AROGYABOT_SESSION_SNAPSHOT is ignored in stateless session mode (no sessions are kept).")
+        elif SESSION_SNAPSHOT_PATH:
+            stage_start = time.perf_counter()
+            codec = SessionTokenCodec(SESSION_TOKEN_SECRET or app.secret_key, MODEL_SYMPTOM_KEYS, ttl_seconds=SESSION_TOKEN_TTL_SECONDS)
+            SESSION_SNAPSHOTS = SessionSnapshotStore(SESSION_SNAPSHOT_PATH, codec, SESSION_SNAPSHOT_INTERVAL,
+                                                     logger=app.logger).start()
+            atexit.register(SESSION_SNAPSHOTS.stop)
+            STARTUP_TIMINGS['session_snapshot'] = time.perf_counter() - stage_start
+            app.logger.info(f"Session snapshots -> {SESSION_SNAPSHOT_PATH}: {SESSION_SNAPSHOTS.available} saved sessions restorable on demand.")
+
+    except FileNotFoundError:
+        app.logger.error(f"CRITICAL: Model or symptom_columns.pkl not found in {MODEL_DIR}.")
+        model = None
+    except Exception as e:
+        app.logger.error(f"CRITICAL Error initializing model/symptom keys: {e}")
+        model = None
+
+    stage_start = time.perf_counter()
+    USE_DOCTORS_DB = DOCTOR_STORE == 'sqlite' or (DOCTOR_STORE == 'auto' and os.path.exists(DOCTORS_DB_PATH))
+    if USE_DOCTORS_DB:
+        try:
+            n_doctors = get_doctors_db().execute("SELECT COUNT(*) FROM doctors").fetchone()[0]
+            app.logger.info(f"Doctors served from indexed store {DOCTORS_DB_PATH} ({n_doctors} doctors); CSV not loaded.")
+        except sqlite3.Error as e:
+            app.logger.error(f"Could not open doctors store {DOCTORS_DB_PATH}: {e}. Falling back to {DOCTORS_CSV_PATH}.")
+            USE_DOCTORS_DB = False
+    if not USE_DOCTORS_DB:
+        load_doctors_csv()
+    clear_doctor_card_cache()
+    STARTUP_TIMINGS['doctors_load'] = time.perf_counter() - stage_start
+
+    if DOCTOR_DIRECTORY_MODE:
+        stage_start = time.perf_counter()
+        build_doctor_directory()
+        STARTUP_TIMINGS['doctor_directory'] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    build_visiting_hours_index()
+    STARTUP_TIMINGS['visiting_hours_index'] = time.perf_counter() - stage_start
+
+    if DOCTOR_VIEWS_MODE and doctors_available():
+        stage_start = time.perf_counter()
+        start_doctor_views()
+        STARTUP_TIMINGS['doctor_views'] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
     for path, df_name, global_var_name in [
         (DISEASE_DESC_CSV_PATH, "Disease Descriptions", "disease_desc_df"),
         (DISEASE_PRECAUTION_CSV_PATH, "Disease Precautions", "disease_precaution_df")
@@ -296,8 +829,38 @@ def initialize_app_data():
         except Exception as e:
             app.logger.warning(f"Could not load {df_name} from {path}: {e}")
             globals()[global_var_name] = pd.DataFrame()
+    STARTUP_TIMINGS['knowledge_csvs'] = time.perf_counter() - stage_start
+    STARTUP_TIMINGS['initialize_total'] = time.perf_counter() - init_start
+    app.logger.info(format_startup_report())
+
+
+def ensure_app_data():
+    # Loads everything exactly once; with LAZY_STARTUP this runs on the first request or warmup_app().
+    global APP_DATA_READY
+    if APP_DATA_READY:
+        return
+    with _app_data_lock:
+        if not APP_DATA_READY:
+            initialize_app_data()
+            APP_DATA_READY = True
+
+def startup_report():
+    return dict(STARTUP_TIMINGS, lazy_startup=LAZY_STARTUP)
+
+def format_startup_report():
+    lines = [f"Startup report ({'lazy' if LAZY_STARTUP else 'eager'} mode):"]
+    for stage, seconds in STARTUP_TIMINGS.items():
+        lines.append(f"  {stage:<28}{seconds * 1000:>10.1f} ms")
+    return "\n".join(lines)
+
+# Probe endpoints must answer instantly, so they never trigger data loading themselves.
+PROBE_ENDPOINTS = {'healthz', 'readyz'}
+
+@app.before_request
+def _load_app_data_before_request():
+    if request.endpoint not in PROBE_ENDPOINTS:
+        ensure_app_data()
 
-initialize_app_data()
 
 # --- Disease to Specialization Map ---
 disease_to_specialization_map = {
@@ -373,9 +936,24 @@ def normalize_text(text):
     return str(text).strip().lower() if pd.notna(text) else ""
 
 # --- NLP Symptom Extraction Helper ---
+def match_symptom_phrase(phrase, scorer=None):
+    # Same result as process.extractOne(phrase, NATURAL_SYMPTOM_PHRASES_FOR_FUZZY, scorer=scorer), but exact phrases
+    # short-circuit and the choices were pre-processed at build time instead of on every call.
+    scorer = scorer or fuzz.WRatio
+    if phrase in SYMPTOM_MAP:
+        return phrase, 100
+    processed_query = fuzz_utils.full_process(phrase, force_ascii=True)
+    best_index, best_score = 0, -1
+    for i, choice in enumerate(SYMPTOM_FUZZY_CHOICES):
+        score = scorer(processed_query, choice, full_process=False)
+        if score > best_score:
+            best_index, best_score = i, score
+    return NATURAL_SYMPTOM_PHRASES_FOR_FUZZY[best_index], best_score
+
+@timed_stage('symptom_extraction')
 def extract_initial_symptoms_nlp(user_text, symptom_map_config_dict, natural_phrases_list_for_fuzzy, threshold=80):
     # ... (your existing function - keep as is, omit for brevity) ...
-    identified_model_symptoms = set()
+    identified_model_symptoms = {} # Used as an ordered set: first-mention order, stable across processes
     user_text_lower = user_text.lower()
     if not user_text_lower: return []
 
@@ -399,7 +977,10 @@ def extract_initial_symptoms_nlp(user_text, symptom_map_config_dict, natural_phr
             app.logger.warning("NLP: natural_phrases_list_for_fuzzy is empty. Cannot perform matching.")
             continue
 
-        best_match_tuple = process.extractOne(phrase, natural_phrases_list_for_fuzzy, scorer=scorer_to_use)
+        if natural_phrases_list_for_fuzzy is NATURAL_SYMPTOM_PHRASES_FOR_FUZZY and SYMPTOM_FUZZY_CHOICES:
+            best_match_tuple = match_symptom_phrase(phrase, scorer=scorer_to_use)
+        else:
+            best_match_tuple = process.extractOne(phrase, natural_phrases_list_for_fuzzy, scorer=scorer_to_use)
         
         if best_match_tuple:
             best_match, score = best_match_tuple
@@ -408,7 +989,7 @@ def extract_initial_symptoms_nlp(user_text, symptom_map_config_dict, natural_phr
                 if best_match in symptom_map_config_dict:
                     model_symptom_key = symptom_map_config_dict[best_match]["model_key"]
                     if model_symptom_key in MODEL_SYMPTOM_KEYS: # Final check
-                        identified_model_symptoms.add(model_symptom_key)
+                        identified_model_symptoms.setdefault(model_symptom_key)
                     else:
                         app.logger.warning(f"NLP: Matched natural phrase '{best_match}' but its model_key '{model_symptom_key}' is NOT in MODEL_SYMPTOM_KEYS.")
                 else:
@@ -426,6 +1007,7 @@ def extract_initial_symptoms_nlp(user_text, symptom_map_config_dict, natural_phr
 MIN_SYMPTOMS_FOR_PREDICTION = 3 # Reduced for easier testing
 MAX_QUESTIONS_PER_ROUND = 2
 
+@timed_stage('question_selection')
 def determine_next_symptoms_to_ask(symptoms_vector_dict, all_model_symptom_keys, ml_model, symptom_map_config_dict, count=MAX_QUESTIONS_PER_ROUND):
     # ... (your existing function - keep as is, omit for brevity) ...
     # This function's logic depends on how the ML model might guide symptom questioning.
@@ -479,7 +1061,12 @@ def determine_next_symptoms_to_ask(symptoms_vector_dict, all_model_symptom_keys,
         return []
 
     import random
-    random.shuffle(truly_unasked_or_denied_keys) # Shuffle to vary questions
+    # Shuffle to vary questions
+    if SEEDED_QUESTIONS: # Same confirmed symptoms, same questions (replayable recordings, see replay_conversations.py)
+        seed = zlib.crc32('\n'.join(sorted(confirmed_positive_keys)).encode('utf-8'))
+        random.Random(seed).shuffle(truly_unasked_or_denied_keys)
+    else:
+        random.shuffle(truly_unasked_or_denied_keys)
     
     # A more advanced strategy might involve looking at co-occurrence with confirmed symptoms,
     # or using model probabilities if partial symptoms are fed in.
@@ -490,12 +1077,220 @@ def determine_next_symptoms_to_ask(symptoms_vector_dict, all_model_symptom_keys,
     return selected_to_ask
 
 
+# --- Disease Prediction ---
+@timed_stage('prediction')
+def predict_disease(symptoms_vector, explain=False, age=None, region=None):
+    # Returns (raw disease name, confidence in %, explanation) for a session symptoms_vector dict. The explanation is
+    # None unless `explain` is set and the compact model (with its per-node values) is being served. With a model
+    # registry, age and region pick the cohort model; each model reads its own symptom columns from the vector.
+    explanation = None
+    served = MODEL_REGISTRY.route(age, region) if MODEL_REGISTRY is not None else None
+    serving_model, symptom_keys = (served.model, served.symptom_keys) if served is not None else (model, MODEL_SYMPTOM_KEYS)
+    start = time.perf_counter()
+    row = np.array([[symptoms_vector.get(key, 0) for key in symptom_keys]], dtype=np.float32)
+    if isinstance(serving_model, (forest_compression.CompactForest, bitvector_forest.BitvectorForest)): # Plain arrays in, no DataFrame needed
+        if explain and getattr(serving_model, 'node_value', None) is not None:
+            pred_proba, bias, contributions = serving_model.predict_proba_explained(row)
+            pred_proba = pred_proba[0]
+            explanation = explain_prediction(row[0], bias[0], contributions[0], symptom_keys)
+        else:
+            pred_proba = serving_model.predict_proba(row)[0]
+    else:
+        current_symptom_vector_for_model = {key: symptoms_vector.get(key, 0) for key in symptom_keys}
+        input_df = pd.DataFrame([current_symptom_vector_for_model])
+        input_df = input_df[symptom_keys] # Ensure correct column order and all columns
+        pred_proba = serving_model.predict_proba(input_df)[0]
+    pred_idx = np.argmax(pred_proba)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if served is not None and not getattr(_warmup_context, 'active', False):
+        MODEL_REGISTRY.record(served, elapsed_ms)
+    # The shadow candidate is compared with the main model only.
+    if SHADOW_EVALUATOR is not None and serving_model is model and not getattr(_warmup_context, 'active', False):
+        SHADOW_EVALUATOR.submit(row[0], model.classes_, pred_proba, elapsed_ms)
+    if explanation is not None:
+        explanation['disease'] = serving_model.classes_[pred_idx].strip().title()
+    return serving_model.classes_[pred_idx], pred_proba[pred_idx] * 100, explanation
+
+
+def explain_prediction(row, bias, contributions, symptom_keys=None, top=EXPLANATION_TOP_SYMPTOMS):
+    # Top confirmed symptoms by how many percentage points their splits added to the predicted disease's probability.
+    symptom_keys = MODEL_SYMPTOM_KEYS if symptom_keys is None else symptom_keys
+    confirmed = np.flatnonzero((row == 1) & (contributions > 0))
+    ranked = confirmed[np.argsort(-contributions[confirmed], kind='stable')][:top]
+    return {
+        'baseline_pct': round(float(bias) * 100, 2),
+        'symptoms': [{'symptom': symptom_keys[i], 'label': symptom_keys[i].replace('_', ' ').strip(),
+                      'contribution_pct': round(float(contributions[i]) * 100, 2)} for i in ranked],
+    }
+
+
+# --- Confidence-based Early Stopping ---
+def track_symptom_answer(session, symptom_key, present):
+    # Keeps the running posterior in step with each confirmed/denied symptom (one vector add per answer).
+    if present and symptom_key in session['symptoms_denied']:
+        session['symptoms_denied'].remove(symptom_key)
+        session['posterior_log'] = None # Changed answer: rebuild from scratch below
+    elif not present and symptom_key not in session['symptoms_denied']:
+        session['symptoms_denied'].append(symptom_key)
+    if SYMPTOM_POSTERIOR is None:
+        return
+    if session.get('posterior_log') is None:
+        confirmed = [k for k, v in session['symptoms_vector'].items() if v == 1]
+        session['posterior_log'] = SYMPTOM_POSTERIOR.from_answers(confirmed, session['symptoms_denied'])
+    else:
+        session['posterior_log'] = SYMPTOM_POSTERIOR.update(session['posterior_log'], symptom_key, present)
+
+def early_stop_check(session):
+    # Returns the (estimated) number of turns that stopping now saves, or None to keep asking.
+    if SYMPTOM_POSTERIOR is None or session['symptoms_confirmed_count'] < EARLY_STOP_MIN_SYMPTOMS:
+        return None
+    confirmed = [k for k, v in session['symptoms_vector'].items() if v == 1]
+    if session.get('posterior_log') is None: # e.g. session restored from a token
+        session['posterior_log'] = SYMPTOM_POSTERIOR.from_answers(confirmed, session['symptoms_denied'])
+    log_post = session['posterior_log']
+    top_disease, top_prob, margin = SYMPTOM_POSTERIOR.top_margin(log_post)
+    answered = set(confirmed) | set(session['symptoms_denied'])
+    unanswered = [k for k in MODEL_KEY_TO_ASK_PHRASE if k not in answered]
+    if margin < EARLY_STOP_MARGIN and SYMPTOM_POSTERIOR.answer_can_change_top(log_post, unanswered):
+        return None
+    questions_left = max(len(session['symptoms_pending_clarification']) + len(session['symptoms_targeted_questions_q']),
+                         MIN_SYMPTOMS_FOR_PREDICTION - session['symptoms_confirmed_count'])
+    turns_saved = max(0, questions_left) + (session['age'] is None) + (session['sex'] is None)
+    app.logger.info(f"Early stop: '{top_disease}' p={top_prob:.3f} margin={margin:.3f}; ~{turns_saved} turns saved.")
+    return turns_saved
+
+def stop_questioning_early(session, turns_saved):
+    session['symptoms_pending_clarification'] = []
+    session['symptoms_targeted_questions_q'] = []
+    session['current_clarifying_symptom_key'] = None
+    session['current_targeted_symptom_key'] = None
+    session['early_stopped'] = True
+    session['state'] = 'READY_TO_PREDICT'
+    if getattr(_warmup_context, 'active', False):
+        return
+    with _early_stop_stats_lock:
+        EARLY_STOP_STATS['conversations_stopped_early'] += 1
+        EARLY_STOP_STATS['turns_saved'] += turns_saved
+
+
+# --- Admission Control ---
+ADMISSION_CONTROLLER = AdmissionController(ADMISSION_MAX_CONCURRENT, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT) if ADMISSION_MAX_CONCURRENT > 0 else None
+RATE_LIMITER = TokenBucketRateLimiter(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST) if RATE_LIMIT_PER_SECOND > 0 else None
+# Turns in these states finish a conversation that already cost several round-trips, so they are admitted first.
+IN_PROGRESS_STATES = {'CLARIFYING_SYMPTOMS', 'TARGETED_QUESTIONING', 'AWAITING_AGE', 'AWAITING_SEX',
+                      'READY_TO_PREDICT', 'AWAITING_DOCTOR_CONFIRMATION'}
+_warmup_context = threading.local() # Synthetic warmup traffic is never rate limited or shed
+
+@app.before_request
+def _reject_long_user_id():
+    # Registered before admission control, so an oversized id never reaches the rate limiter, locks or snapshots.
+    if request.endpoint not in ('chat_api', 'doctors_next'):
+        return None
+    user_id = (request.get_json(silent=True) or {}).get('user_id')
+    if user_id is not None and len(str(user_id)) > MAX_USER_ID_LENGTH:
+        return jsonify({'error': f'user_id is longer than {MAX_USER_ID_LENGTH} characters'}), 400
+    return None
+
+def conversation_in_progress(user_id, data):
+    session = restore_session(user_id)
+    if session is None and SESSION_TOKEN_CODEC and data.get('session_token'):
+        try:
+            session = SESSION_TOKEN_CODEC.decode(data['session_token'], user_id)
+        except SessionTokenError:
+            return False
+    return bool(session) and session.get('state') in IN_PROGRESS_STATES
+
+def busy_response(status, retry_after, data=None):
+    # Echoes the request's user_id and (unchanged) session_token, so a client that reads them from every response
+    # keeps its conversation when a turn is shed.
+    data = data or {}
+    body = {'bot_response_parts': ["I'm helping a lot of people right now. Please send your message again in a few seconds."],
+            'busy': True, 'retry_after': retry_after, 'user_id': data.get('user_id')}
+    if data.get('session_token'):
+        body['session_token'] = data['session_token']
+    response = jsonify(body)
+    response.status_code = status
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+@app.before_request
+def _admit_chat_request():
+    if request.endpoint != 'chat_api' or getattr(_warmup_context, 'active', False):
+        return None
+    data = request.get_json(silent=True) or {}
+    user_id = data.get('user_id')
+    if RATE_LIMITER and user_id:
+        allowed, retry_after = RATE_LIMITER.allow(user_id)
+        if not allowed:
+            app.logger.warning(f"Rate limited user_id {user_id}; retry after {retry_after}s.")
+            return busy_response(429, retry_after, data)
+    if ADMISSION_CONTROLLER:
+        if not ADMISSION_CONTROLLER.acquire(priority=conversation_in_progress(user_id, data)):
+            retry_after = ADMISSION_CONTROLLER.retry_after_hint()
+            app.logger.warning(f"Shedding /chat_api request (admission: {ADMISSION_CONTROLLER.snapshot()}).")
+            return busy_response(503, retry_after, data)
+        g.admission_start = time.perf_counter()
+    return None
+
+@app.teardown_request
+def _release_chat_admission(exc=None):
+    start = g.pop('admission_start', None)
+    if start is not None:
+        ADMISSION_CONTROLLER.release(time.perf_counter() - start)
+
+# --- Per-user Session Locking ---
+SESSION_LOCKS = StripedLocks(SESSION_LOCK_STRIPES) if SESSION_LOCK_STRIPES > 0 else None
+SESSION_LOCKED_ENDPOINTS = {'chat_api', 'doctors_next'}
+
+@app.before_request
+def _lock_user_session():
+    # Runs after admission control, so a turn only waits for the user's previous turn once it has a slot.
+    if SESSION_LOCKS is None or request.endpoint not in SESSION_LOCKED_ENDPOINTS:
+        return None
+    data = request.get_json(silent=True) or {}
+    user_id = data.get('user_id')
+    if not user_id:
+        return None
+    lock = SESSION_LOCKS.acquire(user_id, SESSION_LOCK_TIMEOUT)
+    if lock is None:
+        app.logger.warning(f"Turn for user_id {user_id} timed out waiting for the previous one ({SESSION_LOCKS.snapshot()}).")
+        return busy_response(429, 1, data)
+    g.session_lock = lock
+    return None
+
+@app.teardown_request
+def _unlock_user_session(exc=None):
+    lock = g.pop('session_lock', None)
+    if lock is not None:
+        lock.release()
+
+
 # --- In-memory Session Store ---
 user_sessions = {} # This will store session data per user_id
 
+def restore_session(user_id):
+    # The in-memory session, else one saved before a restart (hydrated into user_sessions on first use), else None.
+    if user_id in user_sessions or SESSION_SNAPSHOTS is None:
+        return user_sessions.get(user_id)
+    restored = SESSION_SNAPSHOTS.restore(user_id)
+    if restored is not None:
+        # Admission control peeks at sessions before the user's lock is taken: keep whichever copy got in first.
+        restored = user_sessions.setdefault(user_id, restored)
+        app.logger.info(f"Restored session for user_id {user_id} from snapshot (state {restored['state']}).")
+    return restored
+
+def save_session(user_id):
+    # Queues the user's current session for the next snapshot write.
+    if SESSION_SNAPSHOTS is None or getattr(_warmup_context, 'active', False):
+        return
+    if user_id in user_sessions:
+        SESSION_SNAPSHOTS.record(user_id, user_sessions[user_id])
+    else:
+        SESSION_SNAPSHOTS.forget(user_id)
+
 def get_session(user_id):
     # ... (your existing function - keep as is, omit for brevity) ...
-    if user_id not in user_sessions:
+    if user_id not in user_sessions and restore_session(user_id) is None:
         app.logger.info(f"New session for user_id: {user_id}")
         # Ensure MODEL_SYMPTOM_KEYS is populated before this is called
         if not MODEL_SYMPTOM_KEYS:
@@ -512,7 +1307,9 @@ def get_session(user_id):
             'symptoms_confirmed_count': 0,
             'symptoms_pending_clarification': [], 'current_clarifying_symptom_key': None,
             'symptoms_targeted_questions_q': [], 'current_targeted_symptom_key': None,
-            'age': None, 'sex': None, 'predicted_disease_context': None
+            'age': None, 'sex': None, 'predicted_disease_context': None,
+            'symptoms_denied': [], 'posterior_log': None, 'early_stopped': False,
+            'doctor_results': None
         }
     return user_sessions[user_id]
 
@@ -531,12 +1328,49 @@ def reset_session_for_new_query(user_id, existing_name=None):
         'symptoms_confirmed_count': 0,
         'symptoms_pending_clarification': [], 'current_clarifying_symptom_key': None,
         'symptoms_targeted_questions_q': [], 'current_targeted_symptom_key': None,
-        'age': None, 'sex': None, 'predicted_disease_context': None
+        'age': None, 'sex': None, 'predicted_disease_context': None,
+        'symptoms_denied': [], 'posterior_log': None, 'early_stopped': False,
+        'doctor_results': None
     }
     app.logger.info(f"Session reset for user_id: {user_id}. New state: {user_sessions[user_id]['state']}")
     return user_sessions[user_id]
 
 
+# --- Paged doctor search results ---
+# session['doctor_results'] = {'ids': ranked directory ids, 'cursor': ids already shown, 'speciality', 'expires_at'}.
+# It outlives the reset that follows a doctor search, and goes with the session (or its token).
+MORE_DOCTORS_COMMANDS = {'more', 'more doctors', 'show more', 'show more doctors', 'next'}
+
+def remember_doctor_results(session, ids, speciality, shown):
+    session['doctor_results'] = {
+        'ids': list(ids[:DOCTOR_RESULTS_MAX]), 'cursor': shown, 'speciality': speciality,
+        'expires_at': int(time.time()) + DOCTOR_RESULTS_TTL_SECONDS,
+    } if len(ids) > shown else None
+
+def next_doctor_page(session):
+    """(offset, ids) of the next page of the session's cached results, advancing the cursor. An empty page means the
+    results are used up or expired; they are then dropped from the session."""
+    results = session.get('doctor_results')
+    if not results or time.time() > results['expires_at'] or results['cursor'] >= len(results['ids']):
+        session['doctor_results'] = None
+        return 0, []
+    offset = results['cursor']
+    ids = results['ids'][offset:offset + DOCTOR_PAGE_SIZE]
+    results['cursor'] += len(ids)
+    return offset, ids
+
+def has_more_doctors(session):
+    results = session.get('doctor_results')
+    return bool(results) and results['cursor'] < len(results['ids'])
+
+def render_doctor_page(ids, available_at, offset=0):
+    """(card HTML parts, doctor records, map_data) for a page of results in the configured DOCTOR_CARDS_FORMAT."""
+    if DOCTOR_CARDS_FORMAT == 'html':
+        card_parts, map_doctors = get_doctor_card_html(ids, available_at, offset)
+        return card_parts, None, {"doctors": map_doctors}
+    return [], get_doctor_cards(ids, available_at), None
+
+
 # --- Flask Routes ---
 @app.route('/')
 def chat_home():
@@ -571,6 +1405,16 @@ def chat_api():
         # If it does, the bot cannot function.
         return jsonify({'bot_response_parts': ["Critical system error: Symptom data not loaded. Please contact support."]})
 
+    if SESSION_TOKEN_CODEC:
+        # Stateless mode: rebuild the session from the client's token instead of server memory.
+        session_token = data.get('session_token')
+        user_sessions.pop(user_id, None)
+        if session_token:
+            try:
+                user_sessions[user_id] = SESSION_TOKEN_CODEC.decode(session_token, user_id)
+            except SessionTokenError as e:
+                app.logger.warning(f"Rejected session token for {user_id}: {e}. Starting a new session.")
+
     session = get_session(user_id) # get_session will initialize if MODEL_SYMPTOM_KEYS is ready
     
     # Check if symptoms_vector was initialized correctly (it might be empty if MODEL_SYMPTOM_KEYS was empty during init)
@@ -581,7 +1425,11 @@ def chat_api():
 
     bot_responses = []
     map_data_for_frontend = None 
+    doctors_for_frontend, doctors_after_part, doctors_offset = None, None, 0
+    explanation = None
+    early_stop_turns_saved = None
     current_state = session['state']
+    g.turn_state = current_state
     user_name_greet = f"{session['user_name']}, " if session['user_name'] else ""
 
     app.logger.info(f"Flask API - ID:{user_id}, Name:{session.get('user_name')}, State:{current_state}, Msg:'{user_message}'")
@@ -599,6 +1447,20 @@ def chat_api():
             bot_responses.append("Okay, let's start fresh! What's your name?")
         current_state = session['state'] # Update current_state after reset
     
+    elif user_message in MORE_DOCTORS_COMMANDS and current_state == 'AWAITING_INITIAL_SYMPTOMS' and session.get('doctor_results'):
+        speciality = session['doctor_results']['speciality']
+        doctors_offset, page_ids = next_doctor_page(session)
+        if page_ids:
+            bot_responses.append(f"Here are more doctors listed as **{speciality}**:")
+            card_parts, doctors_for_frontend, map_data_for_frontend = render_doctor_page(
+                page_ids, local_now() if RANK_DOCTORS_BY_AVAILABILITY else None, doctors_offset)
+            doctors_after_part = 0
+            bot_responses.extend(card_parts)
+            bot_responses.append("Say 'more' to see more doctors." if has_more_doctors(session)
+                                 else "That's all the doctors I found. You can tell me new symptoms or say 'reset'.")
+        else:
+            bot_responses.append("I don't have any more doctors from your last search. Please describe your symptoms to start a new one.")
+
     elif "help symptoms" in user_message or user_message == "help":
         s_list_display = sorted([s.title() for s in NATURAL_SYMPTOM_PHRASES_FOR_FUZZY if s not in ["tiredness", "feeling sick"]]) # Example filter
         response_text = "I can understand symptoms like: " + ", ".join(s_list_display[:15])
@@ -631,6 +1493,17 @@ def chat_api():
                     k != session.get('current_clarifying_symptom_key') and \
                     k != session.get('current_targeted_symptom_key')
                 ]
+                # Symptoms the user picked from the /symptoms/suggest completions (and that this message really names)
+                # need no yes/no clarification.
+                picked_keys = set(data.get('picked_symptoms') or [])
+                picked_now = [k for k in newly_identified_keys if k in picked_keys]
+                for symptom_key in picked_now:
+                    session['symptoms_vector'][symptom_key] = 1
+                    session['symptoms_confirmed_count'] += 1
+                    track_symptom_answer(session, symptom_key, True)
+                if picked_now:
+                    bot_responses.append("Noted: " + ", ".join(k.replace('_', ' ') for k in picked_now) + ".")
+                    newly_identified_keys = [k for k in newly_identified_keys if k not in picked_keys]
                 
                 if newly_identified_keys:
                     session['symptoms_pending_clarification'].extend(newly_identified_keys)
@@ -676,6 +1549,7 @@ def chat_api():
                 if symptom_key and symptom_key in session['symptoms_vector']:
                     session['symptoms_vector'][symptom_key] = 1
                     session['symptoms_confirmed_count'] += 1
+                    track_symptom_answer(session, symptom_key, True)
                     bot_responses.append(f"Noted: {symptom_key.replace('_',' ')}.")
                 else:
                     app.logger.error(f"CLARIFYING: symptom_key '{symptom_key}' is invalid or not in symptoms_vector.")
@@ -685,6 +1559,7 @@ def chat_api():
             elif "no" in user_message:
                 if symptom_key and symptom_key in session['symptoms_vector']:
                     session['symptoms_vector'][symptom_key] = 0 
+                    track_symptom_answer(session, symptom_key, False)
                     bot_responses.append(f"Okay, no {symptom_key.replace('_',' ')}.")
                 else:
                     app.logger.error(f"CLARIFYING: symptom_key '{symptom_key}' is invalid or not in symptoms_vector for NO response.")
@@ -693,7 +1568,12 @@ def chat_api():
             
             if responded:
                 session['current_clarifying_symptom_key'] = None # Clear current clarification
-                if session['symptoms_pending_clarification']: # More from initial NLP
+                turns_saved = early_stop_check(session)
+                if turns_saved is not None: # Confident enough already; skip the remaining questions
+                    stop_questioning_early(session, turns_saved)
+                    early_stop_turns_saved = turns_saved
+                    bot_responses.append(user_name_greet + "That gives me enough to go on, so I'll skip the remaining questions.")
+                elif session['symptoms_pending_clarification']: # More from initial NLP
                     session['current_clarifying_symptom_key'] = session['symptoms_pending_clarification'].pop(0)
                     ask_phrase = MODEL_KEY_TO_ASK_PHRASE.get(session['current_clarifying_symptom_key'], f"What about {session['current_clarifying_symptom_key'].replace('_',' ')}?")
                     bot_responses.append(ask_phrase + " (yes/no)")
@@ -725,6 +1605,7 @@ def chat_api():
                 if symptom_key and symptom_key in session['symptoms_vector']:
                     session['symptoms_vector'][symptom_key] = 1
                     session['symptoms_confirmed_count'] += 1
+                    track_symptom_answer(session, symptom_key, True)
                     bot_responses.append(f"Understood: {symptom_key.replace('_',' ')}.")
                 else:
                      app.logger.error(f"TARGETED: symptom_key '{symptom_key}' is invalid or not in symptoms_vector.")
@@ -732,6 +1613,7 @@ def chat_api():
             elif "no" in user_message:
                 if symptom_key and symptom_key in session['symptoms_vector']:
                     session['symptoms_vector'][symptom_key] = 0
+                    track_symptom_answer(session, symptom_key, False)
                     bot_responses.append(f"Okay, no {symptom_key.replace('_',' ')}.")
                 else:
                     app.logger.error(f"TARGETED: symptom_key '{symptom_key}' is invalid or not in symptoms_vector for NO.")
@@ -739,8 +1621,13 @@ def chat_api():
 
             if responded:
                 session['current_targeted_symptom_key'] = None
+                turns_saved = early_stop_check(session)
+                if turns_saved is not None: # Confident enough already; skip the remaining questions
+                    stop_questioning_early(session, turns_saved)
+                    early_stop_turns_saved = turns_saved
+                    bot_responses.append(user_name_greet + "That gives me enough to go on, so I'll skip the remaining questions.")
                 # Ask one more targeted if available & still below min_symptoms + buffer, or if queue has items
-                if session['symptoms_targeted_questions_q'] and session['symptoms_confirmed_count'] < (MIN_SYMPTOMS_FOR_PREDICTION + 1): 
+                elif session['symptoms_targeted_questions_q'] and session['symptoms_confirmed_count'] < (MIN_SYMPTOMS_FOR_PREDICTION + 1): 
                     session['current_targeted_symptom_key'] = session['symptoms_targeted_questions_q'].pop(0)
                     ask_phrase = MODEL_KEY_TO_ASK_PHRASE.get(session['current_targeted_symptom_key'], f"And how about {session['current_targeted_symptom_key'].replace('_',' ')}?")
                     bot_responses.append(ask_phrase + " (yes/no)")
@@ -786,7 +1673,7 @@ def chat_api():
             if session['symptoms_confirmed_count'] < 1 : # MIN_SYMPTOMS_FOR_PREDICTION already checked usually
                 bot_responses.append(user_name_greet + "I don't seem to have enough symptom information to make an analysis. Could we start over by you telling me your main symptoms?")
                 session['state'] = 'AWAITING_INITIAL_SYMPTOMS'
-            elif session['age'] is None or session['sex'] is None: 
+            elif (session['age'] is None or session['sex'] is None) and not session.get('early_stopped'):
                 # This case implies a direct jump or logic error, guide back
                 if session['age'] is None:
                     bot_responses.append(user_name_greet + "Before I proceed, what is your age?")
@@ -798,15 +1685,11 @@ def chat_api():
                 app.logger.info(f"Predicting for user {user_id} vector: {{k: v for k, v in session['symptoms_vector'].items() if v == 1}}")
                 
                 # Ensure all MODEL_SYMPTOM_KEYS are present in the vector for the model
-                current_symptom_vector_for_model = {key: session['symptoms_vector'].get(key, 0) for key in MODEL_SYMPTOM_KEYS}
-                input_df = pd.DataFrame([current_symptom_vector_for_model])
-                input_df = input_df[MODEL_SYMPTOM_KEYS] # Ensure correct column order and all columns
-                
                 try:
-                    pred_proba = model.predict_proba(input_df)[0]
-                    pred_idx = np.argmax(pred_proba)
-                    disease_raw = model.classes_[pred_idx]
-                    confidence = pred_proba[pred_idx] * 100
+                    location = parse_user_location(data.get('location'))
+                    disease_raw, confidence, explanation = predict_disease(
+                        session['symptoms_vector'], explain=EXPLAIN_PREDICTIONS,
+                        age=session['age'], region=doctor_directory.region_for(*location) if location else None)
                     session['predicted_disease_context'] = disease_raw # Store raw name for lookups
                     disease_clean = disease_raw.strip().title() # For display
 
@@ -954,7 +1837,7 @@ def chat_api():
             app.logger.info(f"Disease context from session: '{disease_context_raw}'")
 
             responded_to_doc_q = False
-            doctors_for_map_list = [] 
+            doctor_results = None
 
             # More robust check for affirmative response
             is_affirmative = user_message == "yes" or "yeah" in user_message or "sure" in user_message or "ok" in user_message
@@ -972,72 +1855,35 @@ def chat_api():
                     default_no_docs_msg = f"I'm sorry, {session.get('user_name', 'there')}, I couldn't immediately find doctors specifically listed for '{disease_display_name}' or its related specialty ('{target_spec_from_map if target_spec_from_map else 'N/A'}') in my current database with location data."
                     found_docs_messages = [default_no_docs_msg] # Initialize with default
                     
-                    if target_spec_from_map and not doctors_df.empty:
-                        lat_col = 'latitude'
-                        lon_col = 'longitude'
-
-                        app.logger.info(f"DOCTOR SEARCH: Filtering doctors_df for speciality containing '{target_spec_from_map}'")
-                        
-                        cond1 = doctors_df['speciality'].str.contains(target_spec_from_map, case=False, na=False)
-                        cond2 = doctors_df[lat_col].notna()
-                        cond3 = (doctors_df[lat_col] != 0)
-                        cond4 = doctors_df[lon_col].notna()
-                        cond5 = (doctors_df[lon_col] != 0)
-                        combined_conditions = cond1 & cond2 & cond3 & cond4 & cond5
-                        relevant_docs_df = doctors_df[combined_conditions]
-
-                        app.logger.info(f"DOCTOR SEARCH: Found {len(relevant_docs_df)} relevant doctors after all filters.")
+                    if target_spec_from_map and doctors_available():
+                        app.logger.info(f"DOCTOR SEARCH: Searching doctors for speciality containing '{target_spec_from_map}'")
+                        available_at = local_now() if RANK_DOCTORS_BY_AVAILABILITY else None
+                        relevant_ids = recommended_doctor_ids(disease_context_raw, target_spec_from_map, DOCTOR_RESULTS_MAX, available_at,
+                                                              near=parse_user_location(data.get('location')))
+                        app.logger.info(f"DOCTOR SEARCH: Found {len(relevant_ids)} relevant doctors (showing up to {DOCTOR_PAGE_SIZE}) after all filters.")
                         
-                        if not relevant_docs_df.empty:
-                            app.logger.info(f"DOCTOR SEARCH: Head of relevant_docs_df: \n{relevant_docs_df.head().to_string()}")
+                        if relevant_ids:
                             found_docs_messages = [f"For a condition like **{disease_display_name}**, you would typically consult a **{target_spec_from_map}**. Here are a few doctors listed with that or a similar specialty in Bangladesh. I can also show them on a map."]
-                            
-                            name_col, spec_col, hosp_col, addr_col, num_col, img_col = 'name', 'speciality', 'hospital_name', 'address', 'number', 'image_source'
-
-                            for i, (_, doc) in enumerate(relevant_docs_df.head(3).iterrows()):
-                                doc_name = doc.get(name_col, 'N/A')
-                                doc_spec = doc.get(spec_col, 'N/A')
-                                doc_hosp = doc.get(hosp_col, 'N/A')
-                                doc_addr = doc.get(addr_col, 'N/A')
-                                doc_contact = doc.get(num_col, 'N/A')
-                                doc_img = doc.get(img_col, 'https://via.placeholder.com/80?text=Doc')
-                                doc_lat_val = doc.get(lat_col) 
-                                doc_lon_val = doc.get(lon_col) 
-
-                                doc_info_html = (f"<div class='doctor-card' style='border:1px solid #eee; padding:10px; margin-bottom:10px; border-radius:5px; overflow:hidden;'>"
-                                            f"<img src='{doc_img}' alt='{doc_name}' style='width:60px; height:60px; border-radius:50%; float:left; margin-right:10px; object-fit:cover;'>"
-                                            f"<div><strong>{i+1}. {doc_name}</strong><br>"
-                                            f"<em>{doc_spec}</em><br>"
-                                            f"🏥 {doc_hosp if pd.notna(doc_hosp) else 'N/A'}<br>"
-                                            f"📍 <small>{doc_addr if pd.notna(doc_addr) else 'N/A'}</small><br>"
-                                            f"{'📞 '+str(doc_contact) if pd.notna(doc_contact) and str(doc_contact).strip().lower() not in ['nan', ''] else ''}"
-                                            f"</div><div style='clear:both;'></div></div>")
-                                found_docs_messages.append(doc_info_html)
-
-                                if pd.notna(doc_lat_val) and pd.notna(doc_lon_val) and doc_lat_val != 0 and doc_lon_val != 0:
-                                    doctors_for_map_list.append({
-                                        "name": doc_name, "speciality": doc_spec, "hospital": doc_hosp,
-                                        "address": doc_addr, 
-                                        "contact": str(doc_contact) if pd.notna(doc_contact) and str(doc_contact).strip().lower() not in ['nan', ''] else 'N/A',
-                                        "lat": doc_lat_val, "lng": doc_lon_val, "image": doc_img
-                                    })
-                            
-                            if doctors_for_map_list:
-                                 map_data_for_frontend = {"doctors": doctors_for_map_list} 
-                                 found_docs_messages.append("Check the map display for their locations (if available).")
-                            else:
-                                found_docs_messages.append("I found some doctors based on specialty, but unfortunately, none had valid location data to display on a map.")
+                            # Search results always have coordinates, so every found doctor is also shown on the map.
+                            card_parts, doctors_for_frontend, map_data_for_frontend = render_doctor_page(relevant_ids[:DOCTOR_PAGE_SIZE], available_at)
+                            found_docs_messages.extend(card_parts)
+                            doctor_results = (relevant_ids, target_spec_from_map)
+                            found_docs_messages.append("Check the map display for their locations (if available).")
+                            if len(relevant_ids) > DOCTOR_PAGE_SIZE:
+                                found_docs_messages.append("Say 'more' to see more doctors.")
                             found_docs_messages.append("It's always best to call ahead to confirm availability and suitability for your specific needs.")
-                        # else: relevant_docs_df is empty, default_no_docs_msg (already in found_docs_messages) will be used.
+                        # else: relevant_docs is empty, default_no_docs_msg (already in found_docs_messages) will be used.
                     
-                    elif doctors_df.empty:
-                         app.logger.warning("DOCTOR SEARCH: doctors_df is empty!")
+                    elif not doctors_available():
+                         app.logger.warning("DOCTOR SEARCH: doctor directory is empty!")
                          # default_no_docs_msg will be used
                     elif not target_spec_from_map: # target_spec_from_map was None
                          app.logger.warning("DOCTOR SEARCH: target_spec_from_map is None, no speciality to search for.")
                          # Overwrite found_docs_messages because default_no_docs_msg would be confusing
                          found_docs_messages = [f"I don't have a specific doctor specialization mapped for '{disease_display_name}'. You might want to consult a General Physician for a referral or search for specialists based on your symptoms."]
 
+                    if doctors_for_frontend:
+                        doctors_after_part = len(bot_responses) # Cards follow the intro part
                     bot_responses.extend(found_docs_messages)
                     responded_to_doc_q = True
 
@@ -1067,6 +1913,8 @@ def chat_api():
                 # Reset session for a new query, keeping user name
                 existing_name = session.get('user_name')
                 session = reset_session_for_new_query(user_id, existing_name) # This will change session['state']
+                if doctor_results:
+                    remember_doctor_results(session, *doctor_results, shown=DOCTOR_PAGE_SIZE)
                 # current_state = session['state'] # Update current_state if needed for logic *after* this block
                                                 # But since this is the end of this turn, it's less critical here.
             else:
@@ -1086,7 +1934,24 @@ def chat_api():
 
     app.logger.info(f"Flask BOT for {user_id} (Name: {session.get('user_name')}, EndState: {session['state']}): Response parts: {len(bot_responses)}")
     
+    g.turn_end_state, g.turn_user_name = session['state'], session.get('user_name')
     json_response = {'bot_response_parts': bot_responses, 'user_id': user_id} # user_id is returned for context if needed
+    if session['state'] == 'AWAITING_INITIAL_SYMPTOMS':
+        json_response['input_hint'] = 'symptoms' # chat.html offers /symptoms/suggest completions for the next message
+    if early_stop_turns_saved is not None:
+        json_response['turns_saved'] = early_stop_turns_saved
+    if explanation:
+        json_response['explanation'] = explanation
+    if SESSION_TOKEN_CODEC:
+        # `session` may have been replaced by a reset, so always encode what is in the store, then drop it.
+        json_response['session_token'] = SESSION_TOKEN_CODEC.encode(user_sessions.pop(user_id, session), user_id)
+    else:
+        save_session(user_id)
+    if doctors_for_frontend:
+        json_response['doctors'] = doctors_for_frontend
+        json_response['doctors_after_part'] = doctors_after_part
+        json_response['doctors_offset'] = doctors_offset
+        json_response['has_more_doctors'] = has_more_doctors(session)
     if map_data_for_frontend:
         json_response['map_data'] = map_data_for_frontend
         app.logger.info(f"Flask Sending map data for {user_id}: {map_data_for_frontend['doctors'][0] if map_data_for_frontend['doctors'] else 'empty'}")
@@ -1094,8 +1959,229 @@ def chat_api():
 
     return jsonify(json_response)
 
+@app.route('/symptoms/suggest')
+def symptoms_suggest():
+    # Typeahead for the symptom box: canonical SYMPTOM_MAP phrases completing `q`, best first.
+    query = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', 8, type=int), 0), SUGGEST_MAX_LIMIT)
+    suggestions = SYMPTOM_SUGGESTER.suggest(query, limit) if SYMPTOM_SUGGESTER else []
+    response = jsonify({'q': query, 'suggestions': suggestions})
+    if SYMPTOM_SUGGESTER:
+        response.headers['Cache-Control'] = 'public, max-age=300' # The vocabulary only changes with a new model
+    return response
+
+@app.route('/doctors/next', methods=['POST'])
+def doctors_next():
+    # The next page of the caller's last doctor search, from the ids cached in its session (no search is re-run).
+    data = request.get_json(silent=True) or {}
+    user_id = data.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'user_id is required'}), 400
+    if SESSION_TOKEN_CODEC:
+        try:
+            session = SESSION_TOKEN_CODEC.decode(data.get('session_token') or '', user_id)
+        except SessionTokenError as e:
+            app.logger.warning(f"Rejected session token for {user_id} on /doctors/next: {e}")
+            session = {}
+    else:
+        session = restore_session(user_id) or {}
+    doctors_offset, page_ids = next_doctor_page(session)
+    json_response = {
+        'doctors': get_doctor_cards(page_ids, local_now() if RANK_DOCTORS_BY_AVAILABILITY else None),
+        'doctors_offset': doctors_offset, 'has_more_doctors': has_more_doctors(session), 'user_id': user_id,
+    }
+    if SESSION_TOKEN_CODEC and 'state' in session:
+        json_response['session_token'] = SESSION_TOKEN_CODEC.encode(session, user_id)
+    elif 'state' in session:
+        save_session(user_id) # The page cursor moved
+    return jsonify(json_response)
+
+
+# --- Warmup & Readiness ---
+# Synthetic conversations run through the full /chat_api path (NLP, question selection, prediction, doctor search)
+# so first-call costs are paid before /readyz reports the worker as ready to the load balancer. Unset, warmup starts
+# when the app is served (`python app.py`, wsgi.py) but not on a plain import (tests, replay_conversations.py);
+# '1' also starts it on import, '0' never starts it before the first /readyz probe.
+WARMUP_SETTING = os.environ.get('AROGYABOT_WARMUP')
+WARMUP_RETRY_SECONDS = float(os.environ.get('AROGYABOT_WARMUP_RETRY', 10)) # A failed warmup is retried by /readyz after this
+WARMUP_USER_PREFIX = '__warmup_'
+WARMUP_CONVERSATIONS = [
+    ["Warmup", "itching, skin rash and nodal skin eruptions", "yes", "yes", "yes", "30", "male", "yes"],
+    ["Warmup", "high fever, headache and vomiting", "yes", "no", "yes", "45", "female", "yes"],
+]
+READINESS = {'ready': False, 'warming_up': False, 'warmup_seconds': None, 'error': None, 'attempts': 0, 'failed_at': None}
+_readiness_lock = threading.Lock()
+
+def warmup_app():
+    """Explicit warmup hook (e.g. a gunicorn post_fork/when_ready hook): loads data and runs synthetic conversations."""
+    with _readiness_lock:
+        if READINESS['ready'] or READINESS['warming_up']:
+            return
+        READINESS['warming_up'] = True
+        READINESS['attempts'] += 1
+    start = time.perf_counter()
+    _warmup_context.active = True
+    try:
+        ensure_app_data()
+        if not model or not MODEL_SYMPTOM_KEYS:
+            raise RuntimeError("model or symptom keys not loaded")
+        client = app.test_client()
+        for i, script in enumerate(WARMUP_CONVERSATIONS):
+            user_id = f"{WARMUP_USER_PREFIX}{i}"
+            token = None
+            for message in script:
+                payload = {'user_id': user_id, 'message': message, 'session_token': token}
+                for _ in range(6): # Answer "yes" to any extra clarifying/targeted questions before moving on
+                    response = client.post('/chat_api', json=payload)
+                    token = response.get_json().get('session_token')
+                    state = user_sessions.get(user_id, {}).get('state')
+                    if state not in ('CLARIFYING_SYMPTOMS', 'TARGETED_QUESTIONING') or message != 'yes':
+                        break
+                    payload = {'user_id': user_id, 'message': 'yes', 'session_token': token}
+            user_sessions.pop(user_id, None)
+        READINESS.update(ready=True, error=None, failed_at=None)
+    except Exception as e:
+        app.logger.error(f"Warmup attempt {READINESS['attempts']} failed: {e}. The worker stays unready; /readyz "
+                         f"retries the warmup in {WARMUP_RETRY_SECONDS:g}s.", exc_info=True)
+        READINESS.update(error=str(e), failed_at=time.time())
+    finally:
+        _warmup_context.active = False
+        READINESS['warming_up'] = False
+        READINESS['warmup_seconds'] = time.perf_counter() - start
+        STARTUP_TIMINGS['warmup'] = READINESS['warmup_seconds']
+    app.logger.info(f"Warmup finished in {READINESS['warmup_seconds']:.2f}s (ready={READINESS['ready']}).")
+
+def start_background_warmup():
+    threading.Thread(target=warmup_app, name='arogyabot-warmup', daemon=True).start()
+
+def start_warmup_when_served():
+    # Entry points that serve traffic (`python app.py`, wsgi.py) warm up right away unless AROGYABOT_WARMUP=0.
+    # Lazy-startup workers keep waiting for the first /readyz probe.
+    if WARMUP_SETTING != '0' and not LAZY_STARTUP:
+        start_background_warmup()
+
+def warmup_due():
+    # Not ready and not warming up: never tried yet, or the last attempt failed long enough ago to try again.
+    failed_at = READINESS['failed_at']
+    return (not READINESS['ready'] and not READINESS['warming_up']
+            and (failed_at is None or time.time() - failed_at >= WARMUP_RETRY_SECONDS))
+
+@app.route('/healthz')
+def healthz():
+    # Liveness only: the process is up and serving HTTP.
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    # Readiness: data loaded, model version known and caches warmed by the synthetic conversations.
+    if warmup_due():
+        start_background_warmup() # First probe of a worker that didn't warm up on start, or a retry after a failure
+    body = {'ready': READINESS['ready'], 'warming_up': READINESS['warming_up'], 'model_version': MODEL_VERSION,
+            'warmup_seconds': READINESS['warmup_seconds'], 'warmup_attempts': READINESS['attempts'],
+            'error': READINESS['error'], 'startup': startup_report()}
+    if SYMPTOM_POSTERIOR is not None:
+        with _early_stop_stats_lock:
+            body['early_stop'] = dict(EARLY_STOP_STATS)
+    return jsonify(body), (200 if READINESS['ready'] else 503)
+
+# --- Admin: Shadow Model Evaluation ---
+def shadow_host_busy():
+    # Shadow work yields to real traffic: skip it while every admission slot is taken.
+    return ADMISSION_CONTROLLER is not None and ADMISSION_CONTROLLER.active >= ADMISSION_CONTROLLER.max_concurrent
+
+@app.route('/admin/shadow', methods=['GET', 'POST'])
+def admin_shadow():
+    # GET: agreement/divergence/latency of the candidate vs the served model. POST {"reset": true} clears them.
+    if SHADOW_EVALUATOR is None or not is_admin_request():
+        return jsonify({'error': 'not found'}), 404
+    if request.method == 'POST' and (request.get_json(silent=True) or {}).get('reset'):
+        SHADOW_EVALUATOR.reset()
+        app.logger.info("Shadow evaluation stats reset.")
+    return jsonify(SHADOW_EVALUATOR.summary())
+
+# --- Admin: Cohort Models ---
+@app.route('/admin/models')
+def admin_models():
+    # Per-model route, memory, prediction count and latency percentiles of the model registry.
+    if MODEL_REGISTRY is None or not is_admin_request():
+        return jsonify({'error': 'not found'}), 404
+    return jsonify(MODEL_REGISTRY.summary())
+
+# --- Admin: Request Profiling ---
+# Profiles are keyed by the conversation state a /chat_api turn started in (other endpoints by endpoint name).
+# Without an admin token PROFILER is None (its results could not be read) and the hooks below return immediately.
+# A profiler error is logged and never fails the request it was profiling.
+PROFILER = RequestProfiler(PROFILER_MODE, PROFILE_SAMPLE_RATE, PROFILE_INTERVAL_MS / 1000) if ADMIN_TOKEN else None
+
+def is_admin_request():
+    supplied = request.headers.get('X-Arogyabot-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(supplied.encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
+
+@app.before_request
+def _start_request_profile():
+    if PROFILER is None or request.endpoint in (None, 'static') or request.endpoint.startswith('admin_'):
+        return None
+    if getattr(_warmup_context, 'active', False):
+        return None
+    forced = request.headers.get('X-Arogyabot-Profile') == '1' and is_admin_request()
+    if PROFILER.should_profile(forced):
+        try:
+            g.profile_handle = PROFILER.begin()
+        except Exception as e:
+            app.logger.warning(f"Could not start the request profiler: {e}")
+    return None
+
+@app.teardown_request
+def _finish_request_profile(exc=None):
+    handle = g.pop('profile_handle', None)
+    if handle is not None:
+        try:
+            PROFILER.end(handle, g.get('turn_state') or request.endpoint)
+        except Exception as e:
+            app.logger.warning(f"Could not record the request profile: {e}")
+
+@app.route('/admin/profile', methods=['GET', 'POST'])
+def admin_profile():
+    if PROFILER is None or not is_admin_request():
+        return jsonify({'error': 'not found'}), 404
+    if request.method == 'POST':
+        # {"sample_rate": 0.05} changes the sampled fraction at runtime; {"reset": true} clears collected profiles.
+        data = request.get_json(silent=True) or {}
+        if 'sample_rate' in data:
+            PROFILER.sample_rate = max(0.0, min(1.0, float(data['sample_rate'])))
+        if data.get('reset'):
+            PROFILER.reset()
+        app.logger.info(f"Profiler updated: sample_rate={PROFILER.sample_rate}, reset={bool(data.get('reset'))}")
+        return jsonify(PROFILER.summary())
+
+    output_format = request.args.get('format', 'summary')
+    state = request.args.get('state')
+    if output_format == 'summary':
+        return jsonify(PROFILER.summary())
+    if output_format == 'collapsed' and PROFILER.mode == 'sample':
+        return Response(PROFILER.collapsed_stacks(state), mimetype='text/plain')
+    if output_format == 'pstats' and PROFILER.mode == 'cprofile':
+        data = PROFILER.pstats_dump(state)
+        if data is None:
+            return jsonify({'error': 'no profiles collected yet'}), 404
+        return Response(data, mimetype='application/octet-stream',
+                        headers={'Content-Disposition': f"attachment; filename=arogyabot-{state or 'all'}.pstats"})
+    return jsonify({'error': f"format '{output_format}' is not available in '{PROFILER.mode}' mode "
+                             "(sample mode: summary, collapsed; cprofile mode: summary, pstats)"}), 400
+
+if not LAZY_STARTUP:
+    ensure_app_data()
+    if WARMUP_SETTING == '1':
+        start_background_warmup()
+
 
 if __name__ == '__main__':
+    if '--startup-report' in sys.argv:
+        # Print where worker start-up time goes (imports, model load, CSV parsing, symptom map) and exit.
+        ensure_app_data()
+        print(format_startup_report())
+        sys.exit(0)
+    ensure_app_data() # Loading before serving, even in lazy mode, so the check below is meaningful
     if not model or not MODEL_SYMPTOM_KEYS or not NATURAL_SYMPTOM_PHRASES_FOR_FUZZY:
         print("="*80)
         print("ERROR: CRITICAL DATA NOT LOADED (MODEL, SYMPTOM KEYS, or NATURAL PHRASES).")
@@ -1109,6 +2195,7 @@ if __name__ == '__main__':
         print("="*80)
     else:
         app.logger.info("Flask app starting... Model and initial data loaded.")
+        start_warmup_when_served()
     
     # Make sure to run Flask on a specific port, e.g., 5002 as you had.
     # The use_reloader=False might be helpful if initialize_app_data is slow or has side effects
@@ -0,0 +1,170 @@
+# bitvector_forest.py
+# QuickScorer-style scoring of the trained forest, specialised for its 0/1 symptom inputs. Every split in the forest
+# tests one symptom (threshold 0.5), so a present symptom sends every node that tests it to the right. Per symptom
+# and tree, the AND of those nodes' "left subtree unreachable" leaf masks is precomputed; scoring a row is then the
+# AND of the masks of its present symptoms, and each tree's exit leaf is the lowest set bit. No node-by-node
+# traversal, and probabilities are accumulated exactly as sklearn does, so they are bit-for-bit predict_proba's.
+#
+# Usage: python bitvector_forest.py [--sizes 1 10 100 1000 10000 100000]   # vs sklearn predict_proba
+import argparse
+import pickle
+import time
+
+import numpy as np
+
+WORD_BITS = 64
+CHUNK_ROWS = 4096 # Rows scored at once; bounds the (rows, trees, words) bitvector buffer to a few MB
+
+
+def is_binary(X):
+    X = np.asarray(X)
+    return bool(((X == 0) | (X == 1)).all())
+
+
+def _lowest_set_bit(words):
+    """Index of the lowest set bit of each multi-word bitvector (last axis = words, least significant first)."""
+    first = np.argmax(words != 0, axis=-1)
+    word = np.take_along_axis(words, first[..., None], axis=-1)[..., 0]
+    lowest = word & (~word + np.uint64(1)) # Isolates the lowest set bit; a power of two, exact as float64
+    return first * WORD_BITS + np.log2(lowest.astype(np.float64)).astype(np.int64)
+
+
+class BitvectorForest:
+    """Exit-leaf bitvectors for a fitted sklearn RandomForestClassifier on binary features.
+
+    feature_masks[f, t] has a bit per leaf of tree t (leaves numbered left to right), cleared for the leaves a
+    present symptom f makes unreachable; leaf_values[t, leaf] is that leaf's normalised class distribution."""
+
+    def __init__(self, classes_, n_features_in_, feature_masks, leaf_values, n_leaves):
+        self.classes_ = classes_
+        self.n_features_in_ = n_features_in_
+        self.feature_masks = feature_masks # (n_features, n_trees, n_words) uint64
+        self.leaf_values = leaf_values # (n_trees, max_leaves, n_classes) float64
+        self.n_leaves = n_leaves # (n_trees,)
+
+    @property
+    def n_trees(self):
+        return self.feature_masks.shape[1]
+
+    def nbytes(self):
+        return self.feature_masks.nbytes + self.leaf_values.nbytes
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Raises ValueError when a split isn't a 0/1 test (threshold outside [0, 1)), so bitvectors wouldn't be exact."""
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        n_classes = len(model.classes_)
+        max_leaves = max(tree.n_leaves for tree in trees)
+        n_words = (max_leaves + WORD_BITS - 1) // WORD_BITS
+        all_ones = np.iinfo(np.uint64).max
+        feature_masks = np.full((model.n_features_in_, len(trees), n_words), all_ones, dtype=np.uint64)
+        leaf_values = np.zeros((len(trees), max_leaves, n_classes), dtype=np.float64)
+        for t, tree in enumerate(trees):
+            internal = tree.feature >= 0
+            if ((tree.threshold[internal] < 0) | (tree.threshold[internal] >= 1)).any():
+                raise ValueError("The forest has non-binary splits; bitvector scoring needs 0/1 features.")
+            leaf_nodes, left_ranges = [], {} # node -> (first, end) leaf numbers of its left subtree
+            first_leaf = {}
+
+            def number(node): # In-order (left to right) leaf numbering; trees are at most a few dozen levels deep
+                first_leaf[node] = len(leaf_nodes)
+                if tree.children_left[node] < 0:
+                    leaf_nodes.append(node)
+                    return
+                number(tree.children_left[node])
+                left_ranges[node] = (first_leaf[node], len(leaf_nodes))
+                number(tree.children_right[node])
+
+            number(0)
+            for node, (first, end) in left_ranges.items():
+                bits = np.zeros(n_words * WORD_BITS, dtype=bool)
+                bits[first:end] = True
+                cleared = np.packbits(bits, bitorder='little').view(np.uint64)
+                feature_masks[tree.feature[node], t] &= ~cleared
+            # Same operations as DecisionTreeClassifier.predict_proba on a leaf's value row.
+            values = tree.value[leaf_nodes][:, 0, :n_classes].astype(np.float64)
+            normalizer = values.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            leaf_values[t, :len(leaf_nodes)] = values / normalizer
+        return cls(model.classes_, model.n_features_in_, feature_masks, leaf_values,
+                   np.array([tree.n_leaves for tree in trees], dtype=np.int32))
+
+    def _check(self, X):
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected (n_rows, {self.n_features_in_}) input, got {X.shape}.")
+        if not is_binary(X):
+            raise ValueError("Bitvector scoring needs 0/1 inputs.")
+        return X.astype(bool)
+
+    def _exit_leaves(self, X):
+        bits = np.full((len(X),) + self.feature_masks.shape[1:], np.iinfo(np.uint64).max, dtype=np.uint64)
+        for feature in np.flatnonzero(X.any(axis=0)):
+            rows = np.flatnonzero(X[:, feature])
+            bits[rows] &= self.feature_masks[feature]
+        return _lowest_set_bit(bits)
+
+    def apply(self, X):
+        """Exit leaf (left-to-right leaf number) of every tree for every row: (n_rows, n_trees)."""
+        X = self._check(X)
+        return np.vstack([self._exit_leaves(X[i:i + CHUNK_ROWS]) for i in range(0, len(X), CHUNK_ROWS)]) \
+            if len(X) else np.zeros((0, self.n_trees), dtype=np.int64)
+
+    def tree_probabilities(self, X):
+        """Per-tree class probabilities: (n_trees, n_rows, n_classes), as each estimator's predict_proba."""
+        leaves = self.apply(X)
+        return np.stack([self.leaf_values[t, leaves[:, t]] for t in range(self.n_trees)])
+
+    def predict_proba(self, X):
+        X = self._check(X)
+        proba = np.zeros((len(X), len(self.classes_)), dtype=np.float64)
+        trees = np.arange(self.n_trees)
+        for i in range(0, len(X), CHUNK_ROWS):
+            leaves = self._exit_leaves(X[i:i + CHUNK_ROWS])
+            out = proba[i:i + CHUNK_ROWS]
+            for t in trees: # Tree by tree, like RandomForestClassifier, so the float sums match exactly
+                out += self.leaf_values[t, leaves[:, t]]
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+if __name__ == '__main__':
+    import pandas as pd
+
+    from forest_compression import MODEL_PATH, TRAINING_CSV_PATH, masked_rows
+
+    parser = argparse.ArgumentParser(description="Bitvector forest scoring vs sklearn predict_proba by batch size.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 1000, 10000, 100000])
+    args = parser.parse_args()
+
+    with open(MODEL_PATH, 'rb') as f:
+        sklearn_model = pickle.load(f)
+    start = time.perf_counter()
+    forest = BitvectorForest.from_sklearn(sklearn_model)
+    print(f"Built from {forest.n_trees} trees (up to {forest.leaf_values.shape[1]} leaves, "
+          f"{forest.feature_masks.shape[2]} words per bitvector) in {time.perf_counter() - start:.2f}s, "
+          f"{forest.nbytes() / 2 ** 20:.1f} MiB.")
+    train_df = pd.read_csv(TRAINING_CSV_PATH)
+    train_df.columns = train_df.columns.str.strip()
+    X_train = train_df.dropna(axis=1, how='all').drop(columns='prognosis')
+    columns = getattr(sklearn_model, 'feature_names_in_', None)
+
+    def per_call_ms(fn, budget_seconds=1.0):
+        fn()
+        runs, start = 0, time.perf_counter()
+        while runs == 0 or time.perf_counter() - start < budget_seconds:
+            fn()
+            runs += 1
+        return (time.perf_counter() - start) / runs * 1000
+
+    print(f"{'rows':>8}{'sklearn ms':>14}{'bitvector ms':>14}{'speedup':>9}  identical")
+    for size in args.sizes:
+        X = masked_rows(X_train, size, seed=size) # Partial-symptom rows, like the chat flow's
+        frame = pd.DataFrame(X, columns=columns) if columns is not None else X
+        expected, actual = sklearn_model.predict_proba(frame), forest.predict_proba(X)
+        sklearn_ms = per_call_ms(lambda: sklearn_model.predict_proba(frame))
+        bitvector_ms = per_call_ms(lambda: forest.predict_proba(X))
+        print(f"{size:>8}{sklearn_ms:>14.3f}{bitvector_ms:>14.3f}{sklearn_ms / bitvector_ms:>8.1f}x  {np.array_equal(expected, actual)}")
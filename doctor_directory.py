@@ -0,0 +1,328 @@
+# doctor_directory.py
+# Doctor search for the doctor-confirmation turn behind a small service interface, with the directory sharded by
+# region (the nearest division of Bangladesh to a doctor's coordinates, or 'other' for anything beyond them, e.g.
+# neighbouring markets). A query is routed to the shards that can still hold one of the nearest matches and the
+# per-shard results are merged by distance (or by directory order when the user's location is unknown).
+# LocalShardedDirectory keeps the shards in-process; MultiprocessDoctorDirectory runs each shard in its own process,
+# which loads only its region, so a growing directory scales out across processes instead of into every chat worker.
+#
+# Usage: python doctor_directory.py [--source doctors_bd_enriched.csv | doctors_bd.sqlite] [--speciality Cardiologist ...]
+#        # shard sizes, and search latency for a direct scan vs the in-process and multi-process directories
+import argparse
+import heapq
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+from collections import Counter
+from itertools import islice
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+# Division headquarters; a doctor belongs to the nearest one within MAX_REGION_KM.
+REGION_CENTRES = {
+    'dhaka': (23.8103, 90.4125), 'chattogram': (22.3569, 91.7832), 'rajshahi': (24.3745, 88.6042),
+    'khulna': (22.8456, 89.5403), 'barishal': (22.7010, 90.3535), 'sylhet': (24.8949, 91.8687),
+    'rangpur': (25.7439, 89.2752), 'mymensingh': (24.7471, 90.4203),
+}
+OTHER_REGION = 'other'
+MAX_REGION_KM = 250
+SHARD_AUTHKEY_ENV = 'AROGYABOT_DIRECTORY_AUTHKEY' # Hands the connection key to shard processes
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance; works elementwise on NumPy arrays."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def region_for(lat, lon):
+    distance, region = min((float(haversine_km(lat, lon, *centre)), region) for region, centre in REGION_CENTRES.items())
+    return region if distance <= MAX_REGION_KM else OTHER_REGION
+
+
+def bbox_distance_km(bbox, lat, lon):
+    """Lower bound on the distance from (lat, lon) to any point of the (min_lat, min_lon, max_lat, max_lon) box."""
+    min_lat, min_lon, max_lat, max_lon = bbox
+    return float(haversine_km(lat, lon, min(max(lat, min_lat), max_lat), min(max(lon, min_lon), max_lon)))
+
+
+def _store_rows(db_path):
+    # The doctors of an import_doctors.py store that it gave a grid cell, i.e. usable coordinates.
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("SELECT d.id, s.speciality, d.latitude, d.longitude FROM doctors d "
+                            "JOIN specialities s ON s.id = d.speciality_id WHERE d.grid_cell IS NOT NULL ORDER BY d.id").fetchall()
+    finally:
+        conn.close()
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    specialities = np.array([row[1] or '' for row in rows], dtype=object)
+    return ids, specialities, np.array([row[2] for row in rows], dtype=np.float64), np.array([row[3] for row in rows], dtype=np.float64)
+
+
+def load_directory_rows(source_path, region=None):
+    """(ids, specialities, latitudes, longitudes) of the searchable doctors (those with map coordinates), optionally
+    only those in `region`. The source is the doctors CSV or an import_doctors.py SQLite store (`.sqlite`), so the
+    directory is built from the same rows app.py serves cards from. Ids are source CSV row positions in both."""
+    if source_path.endswith('.sqlite'):
+        ids, specialities, lat, lon = _store_rows(source_path)
+    else:
+        import pandas as pd
+
+        df = pd.read_csv(source_path, usecols=lambda col: col.strip().lower() in ('speciality', 'latitude', 'longitude'))
+        df.columns = df.columns.str.strip().str.lower()
+        lat = pd.to_numeric(df['latitude'], errors='coerce').to_numpy(np.float64)
+        lon = pd.to_numeric(df['longitude'], errors='coerce').to_numpy(np.float64)
+        keep = ~np.isnan(lat) & ~np.isnan(lon) & (lat != 0) & (lon != 0)
+        ids = np.flatnonzero(keep)
+        specialities = df['speciality'].fillna('').astype(str).to_numpy()[ids]
+        lat, lon = lat[ids], lon[ids]
+    if region is not None:
+        in_region = np.array([region_for(a, b) == region for a, b in zip(lat, lon)], dtype=bool)
+        ids, specialities, lat, lon = ids[in_region], specialities[in_region], lat[in_region], lon[in_region]
+    return ids, specialities, lat, lon
+
+
+class DirectoryShard:
+    """One region's searchable doctors as parallel arrays, in directory (id) order."""
+
+    def __init__(self, region, ids, specialities, latitudes, longitudes):
+        self.region = region
+        order = np.argsort(ids, kind='stable')
+        self.ids = np.asarray(ids, dtype=np.int64)[order]
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)[order]
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)[order]
+        names, codes = np.unique(np.asarray(specialities, dtype=str)[order], return_inverse=True)
+        self.speciality_names = [name.strip().lower() for name in names] # Distinct values: a few hundred at most
+        self.speciality_codes = codes.astype(np.int32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def info(self):
+        bbox = (float(self.latitudes.min()), float(self.longitudes.min()), float(self.latitudes.max()),
+                float(self.longitudes.max())) if len(self) else None
+        return {'region': self.region, 'count': len(self), 'bbox': bbox}
+
+    def search(self, speciality, limit=None, near=None):
+        """[(distance_km or None, id)] of doctors whose speciality contains `speciality` (case-insensitive): nearest
+        first when `near` is a (lat, lon), else in directory order."""
+        target = speciality.strip().lower()
+        matching = [code for code, name in enumerate(self.speciality_names) if target in name]
+        rows = np.flatnonzero(np.isin(self.speciality_codes, matching))
+        if near is None:
+            return [(None, int(doc_id)) for doc_id in self.ids[rows[:limit]]]
+        distances = haversine_km(near[0], near[1], self.latitudes[rows], self.longitudes[rows])
+        order = np.lexsort((self.ids[rows], distances))[:limit]
+        return [(float(distances[i]), int(self.ids[rows[i]])) for i in order]
+
+
+class ShardedDoctorDirectory:
+    """Routing and merging over region shards; subclasses say where a shard query runs (_query)."""
+
+    def __init__(self, shard_info):
+        self.shard_info = {info['region']: info for info in shard_info if info['count']}
+        self.queries = Counter() # region -> shard queries served
+        self._stats_lock = threading.Lock()
+
+    def _query(self, regions, speciality, limit, near):
+        """One result list per region, in the same order."""
+        raise NotImplementedError
+
+    def _run(self, regions, speciality, limit, near):
+        with self._stats_lock:
+            self.queries.update(regions)
+        return self._query(regions, speciality, limit, near)
+
+    def search(self, speciality, limit=None, near=None):
+        """[(distance_km or None, id)] across all shards, merged like DirectoryShard.search. With `near`, the shard
+        closest to it is asked first, then only the shards whose bounding box is no farther than the limit-th result."""
+        if near is None:
+            parts = self._run(list(self.shard_info), speciality, limit, None)
+            return list(islice(heapq.merge(*parts, key=lambda result: result[1]), limit))
+        by_distance = sorted((bbox_distance_km(info['bbox'], *near), region) for region, info in self.shard_info.items())
+        if not by_distance:
+            return []
+        results = self._run([by_distance[0][1]], speciality, limit, near)[0]
+        if limit is not None and len(results) >= limit:
+            cutoff = results[limit - 1][0]
+            rest = [region for distance, region in by_distance[1:] if distance <= cutoff]
+        else:
+            rest = [region for _, region in by_distance[1:]]
+        if rest:
+            results = list(islice(heapq.merge(results, *self._run(rest, speciality, limit, near)), limit))
+        return results
+
+    def stats(self):
+        with self._stats_lock:
+            return {'shards': {region: {'doctors': info['count'], 'queries': self.queries[region]}
+                               for region, info in self.shard_info.items()}}
+
+    def close(self):
+        pass
+
+
+class LocalShardedDirectory(ShardedDoctorDirectory):
+    def __init__(self, shards):
+        self.shards = {shard.region: shard for shard in shards}
+        super().__init__([shard.info() for shard in shards])
+
+    @classmethod
+    def from_source(cls, source_path):
+        ids, specialities, lat, lon = load_directory_rows(source_path)
+        regions = np.array([region_for(a, b) for a, b in zip(lat, lon)])
+        return cls([DirectoryShard(str(region), ids[regions == region], specialities[regions == region],
+                                   lat[regions == region], lon[regions == region]) for region in np.unique(regions)])
+
+    def _query(self, regions, speciality, limit, near):
+        return [self.shards[region].search(speciality, limit, near) for region in regions]
+
+
+def serve_shard(address, authkey, source_path, region):
+    # Shard process: loads only its region's rows, then answers (speciality, limit, near) requests until None (or
+    # until the directory's end of the connection goes away).
+    conn = Client(address, authkey=authkey)
+    shard = DirectoryShard(region, *load_directory_rows(source_path, region))
+    conn.send(shard.info())
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        try:
+            conn.send(shard.search(*request))
+        except Exception as e:
+            conn.send(e)
+    conn.close()
+
+
+class MultiprocessDoctorDirectory(ShardedDoctorDirectory):
+    """One process per region shard. A query is sent to all routed shards before any reply is read, so the shards
+    search in parallel; a lock per shard keeps each request/reply pair together when several threads search.
+
+    Shards are started as `python doctor_directory.py --serve-shard REGION` rather than with multiprocessing's
+    fork/spawn, so they neither fork a threaded web worker nor re-import app.py; they connect back over an
+    authenticated local socket."""
+
+    def __init__(self, source_path, regions=None, start_timeout=60):
+        regions = list(regions or [*REGION_CENTRES, OTHER_REGION])
+        authkey = os.urandom(16)
+        self._shards = {}
+        with Listener(authkey=authkey) as listener:
+            processes = [subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve-shard', region, '--source', source_path,
+                                           '--address', listener.address], env=dict(os.environ, **{SHARD_AUTHKEY_ENV: authkey.hex()}))
+                         for region in regions]
+            accepted = []
+            acceptor = threading.Thread(target=lambda: accepted.extend(listener.accept() for _ in regions), daemon=True)
+            acceptor.start()
+            acceptor.join(start_timeout)
+            if len(accepted) < len(regions):
+                for process in processes:
+                    process.kill()
+                raise RuntimeError(f"Only {len(accepted)} of {len(regions)} directory shard processes started.")
+        shard_info = []
+        for conn in accepted:
+            info = conn.recv()
+            shard_info.append(info)
+            self._shards[info['region']] = (processes[regions.index(info['region'])], conn, threading.Lock())
+        for info in shard_info:
+            if not info['count']: # Nothing to serve in this region
+                self._stop(info['region'])
+        super().__init__(shard_info)
+
+    def _stop(self, region):
+        process, conn, _ = self._shards.pop(region)
+        try:
+            conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    def _query(self, regions, speciality, limit, near):
+        regions = list(regions)
+        locks = [self._shards[region][2] for region in sorted(regions)] # Fixed order: no lock-order deadlocks
+        for lock in locks:
+            lock.acquire()
+        try:
+            for region in regions:
+                self._shards[region][1].send((speciality, limit, near))
+            replies = [self._shards[region][1].recv() for region in regions]
+        finally:
+            for lock in locks:
+                lock.release()
+        for reply in replies:
+            if isinstance(reply, Exception):
+                raise reply
+        return replies
+
+    def close(self):
+        for region in list(self._shards):
+            self._stop(region)
+
+
+DIRECTORY_MODES = ('sharded', 'multiprocess')
+
+
+def build_directory(mode, source_path):
+    if mode == 'sharded':
+        return LocalShardedDirectory.from_source(source_path)
+    if mode == 'multiprocess':
+        return MultiprocessDoctorDirectory(source_path)
+    raise ValueError(f"Unknown doctor directory mode '{mode}', expected one of {DIRECTORY_MODES}.")
+
+
+if __name__ == '__main__':
+    import time
+
+    base_dir = os.path.abspath(os.path.dirname(__file__))
+    default_csv = os.path.join(base_dir, 'doctors_bd_enriched.csv')
+    if not os.path.exists(default_csv):
+        default_csv = os.path.join(base_dir, 'doctors_bd_detailed.csv')
+    parser = argparse.ArgumentParser(description="Shard sizes and search latency of the region-sharded doctor directory.")
+    parser.add_argument('--source', '--csv', default=default_csv, help="Doctors CSV or SQLite store (.sqlite)")
+    parser.add_argument('--speciality', nargs='+', default=['Medicine', 'Cardiologist', 'Dermatologist', 'Neurologist'])
+    parser.add_argument('--near', type=float, nargs=2, default=REGION_CENTRES['dhaka'], metavar=('LAT', 'LON'))
+    parser.add_argument('--limit', type=int, default=30)
+    parser.add_argument('--serve-shard', metavar='REGION', help=argparse.SUPPRESS) # Started by MultiprocessDoctorDirectory
+    parser.add_argument('--address', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve_shard:
+        serve_shard(args.address, bytes.fromhex(os.environ[SHARD_AUTHKEY_ENV]), args.source, args.serve_shard)
+        sys.exit(0)
+
+    local = LocalShardedDirectory.from_source(args.source)
+    flat = DirectoryShard('all', *load_directory_rows(args.source)) # What every chat worker searches today
+    start = time.perf_counter()
+    remote = MultiprocessDoctorDirectory(args.source)
+    print(f"{sum(len(shard) for shard in local.shards.values())} searchable doctors; "
+          f"{len(remote.shard_info)} shard processes started in {time.perf_counter() - start:.2f}s")
+    for region, shard in sorted(local.shards.items(), key=lambda item: -len(item[1])):
+        print(f"  {region:<12}{len(shard):>7}")
+
+    def per_call_ms(fn, repeat=50):
+        fn()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        return (time.perf_counter() - start) / repeat * 1000
+
+    near = tuple(args.near)
+    print(f"\n{'speciality':<16}{'near':<6}{'scan ms':>10}{'sharded ms':>12}{'process ms':>12}  shards asked (sharded)")
+    for speciality in args.speciality:
+        for where in (None, near):
+            expected = flat.search(speciality, args.limit, where)
+            assert local.search(speciality, args.limit, where) == expected == remote.search(speciality, args.limit, where)
+            before = sum(local.queries.values())
+            timings = [per_call_ms(lambda d=d: d.search(speciality, args.limit, where)) for d in (flat, local, remote)]
+            asked = (sum(local.queries.values()) - before) / 51
+            print(f"{speciality:<16}{'yes' if where else 'no':<6}{timings[0]:>10.3f}{timings[1]:>12.3f}{timings[2]:>12.3f}  {asked:.1f}")
+    remote.close()
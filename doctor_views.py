@@ -0,0 +1,165 @@
+# doctor_views.py
+# Materialized doctor recommendations for the doctor-confirmation turn. The model can only ever predict its
+# `classes_`, so for each of them the disease -> specialist mapping, the speciality filter and the coordinate checks
+# are run once, off the request path, and the ranked eligible doctor ids are kept as an int32 array (optionally
+# also one per region: that region's doctors first, then the rest). A "yes" to the doctor question then slices an
+# array. A background refresher rebuilds the views, and swaps them in whole, when the doctor store file or the set
+# of served diseases changes.
+#
+# Usage: python doctor_views.py [--regions]   # per-request cost of the live search vs a view lookup, and equality
+import os
+import threading
+import time
+
+import numpy as np
+
+from doctor_directory import OTHER_REGION, REGION_CENTRES, region_for
+
+
+def file_signature(*paths):
+    """(path, mtime_ns, size) of each existing path: changes when a file is rewritten or swapped in."""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+class DoctorViews:
+    """Read-only disease -> ranked doctor ids. `views` maps a normalized disease name to (speciality, ids, by_region),
+    where by_region is None or {region: ids with that region's doctors first}."""
+
+    def __init__(self, views, signature=None, build_ms=None):
+        self.views = views
+        self.signature = signature
+        self.build_ms = build_ms
+        self.built_at = time.time()
+
+    def lookup(self, disease_key, region=None):
+        """The ranked ids (int32 array) for a normalized disease name, or None if there is no view for it."""
+        view = self.views.get(disease_key)
+        if view is None:
+            return None
+        _, ids, by_region = view
+        if region is not None and by_region is not None:
+            return by_region.get(region, ids)
+        return ids
+
+    def nbytes(self):
+        return sum(ids.nbytes + sum(r.nbytes for r in (by_region or {}).values()) for _, ids, by_region in self.views.values())
+
+    def summary(self):
+        sizes = [len(ids) for _, ids, _ in self.views.values()]
+        return {'diseases': len(self.views), 'empty': sum(size == 0 for size in sizes), 'max_ids': max(sizes, default=0),
+                'kib': round(self.nbytes() / 1024, 1), 'build_ms': self.build_ms, 'built_at': self.built_at,
+                'by_region': any(by_region is not None for _, _, by_region in self.views.values())}
+
+
+def build_views(diseases, speciality_for, matching_ids, coordinates=None, signature=None):
+    """DoctorViews for normalized disease names. speciality_for(disease) is its specialist (None: no view),
+    matching_ids(speciality) the eligible ids in ranked order, and, for per-region views, coordinates(ids) their
+    (latitudes, longitudes). Specialities shared by several diseases are searched once."""
+    start = time.perf_counter()
+    by_speciality = {}
+    views = {}
+    for disease in diseases:
+        speciality = speciality_for(disease)
+        if not speciality:
+            continue
+        if speciality not in by_speciality:
+            ids = np.asarray(matching_ids(speciality), dtype=np.int32)
+            by_region = None
+            if coordinates is not None:
+                lats, lons = coordinates(ids)
+                regions = np.array([region_for(lat, lon) for lat, lon in zip(lats, lons)], dtype=object)
+                by_region = {}
+                for region in list(REGION_CENTRES) + [OTHER_REGION]:
+                    local = regions == region
+                    by_region[region] = np.concatenate([ids[local], ids[~local]]) if local.any() else ids
+            by_speciality[speciality] = (speciality, ids, by_region)
+        views[disease] = by_speciality[speciality]
+    return DoctorViews(views, signature, round((time.perf_counter() - start) * 1000, 2))
+
+
+class ViewRefresher:
+    """Polls `signature()` every `interval` seconds on a daemon thread and calls `rebuild(previous, current)` when it
+    changed. The callback swaps in the new views; a failed rebuild keeps the old ones and is retried next time."""
+
+    def __init__(self, signature, rebuild, interval_seconds=30.0, logger=None):
+        self.signature = signature
+        self.rebuild = rebuild
+        self.interval = interval_seconds
+        self.logger = logger
+        self.current = signature()
+        self.stats = {'checks': 0, 'rebuilds': 0, 'failures': 0}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='arogyabot-doctor-views', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def check(self):
+        """Rebuild now if the signature changed. Returns True when a rebuild ran and succeeded."""
+        self.stats['checks'] += 1
+        current = self.signature()
+        if current == self.current:
+            return False
+        try:
+            self.rebuild(self.current, current)
+        except Exception as e:
+            self.stats['failures'] += 1
+            if self.logger is not None:
+                self.logger.error(f"Doctor view rebuild failed: {e}")
+            return False
+        self.current = current
+        self.stats['rebuilds'] += 1
+        return True
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.check()
+
+
+if __name__ == '__main__':
+    import argparse
+    import logging
+
+    parser = argparse.ArgumentParser(description="Doctor search per prediction: live search vs a materialized view.")
+    parser.add_argument('--regions', action='store_true', help="Also build per-region views")
+    parser.add_argument('--repeat', type=int, default=200, help="Lookups timed per disease")
+    args = parser.parse_args()
+
+    import app as arogyabot
+
+    arogyabot.app.logger.setLevel(logging.WARNING)
+    arogyabot.ensure_app_data()
+    views = arogyabot.build_doctor_views(by_region=args.regions)
+    print(f"Views for {len(views.views)} diseases built in {views.build_ms:.1f} ms, {views.nbytes() / 1024:.1f} KiB "
+          f"({'per disease and region' if args.regions else 'per disease'}).")
+    limit = arogyabot.DOCTOR_RESULTS_MAX
+    live_s = view_s = 0.0
+    mismatches = []
+    for disease, (speciality, _, _) in views.views.items():
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            live = arogyabot.find_doctor_ids_for_specialty(speciality, limit=limit)
+        live_s += time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            viewed = views.lookup(disease)[:limit].tolist()
+        view_s += time.perf_counter() - start
+        if viewed != live:
+            mismatches.append(disease)
+    lookups = args.repeat * len(views.views)
+    print(f"Live search {live_s / lookups * 1e6:.1f} us, view slice {view_s / lookups * 1e6:.2f} us per request; "
+          f"identical results for {len(views.views) - len(mismatches)}/{len(views.views)} diseases"
+          + (f" (differ: {mismatches})" if mismatches else "."))
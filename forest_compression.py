@@ -0,0 +1,360 @@
+# forest_compression.py
+# Post-training compression of the RandomForest into a flat, array-based forest for serving:
+#   1. greedily drops trees while no class probability on a fidelity set (test set + partial-symptom rows) moves by
+#      more than a tolerance and no prediction the full forest makes by more than that margin changes,
+#   2. stores leaf distributions as uint8 fixed-point (or float16),
+#   3. merges identical subtrees (and splits whose two sides became identical) into one DAG shared by all trees,
+#   4. keeps every node's class distribution (same fixed-point format), so a prediction can be attributed to the
+#      splits on its decision paths while traversing them (predict_proba_explained).
+# The result is written next to the model, stamped with the model version, and app.py serves it instead of the
+# sklearn pickle when it matches (AROGYABOT_MODEL_FORMAT).
+#
+# Usage: python forest_compression.py [--tolerance 0.02] [--leaf-dtype uint8|float16|float32] [--min-trees 10]
+# model_training.py runs the same stage right after training.
+import argparse
+import os
+import pickle
+import time
+
+import numpy as np
+
+from bitvector_forest import BitvectorForest, is_binary
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+MODEL_DIR = os.path.join(BASE_DIR, 'models')
+MODEL_PATH = os.path.join(MODEL_DIR, 'disease_prediction_model.pkl')
+SYMPTOM_COLUMNS_PATH = os.path.join(MODEL_DIR, 'symptom_columns.pkl')
+COMPACT_MODEL_PATH = os.path.join(MODEL_DIR, 'disease_prediction_model_compact.pkl')
+TRAINING_CSV_PATH = os.path.join(BASE_DIR, 'datasets', 'Training.csv')
+TESTING_CSV_PATH = os.path.join(BASE_DIR, 'datasets', 'Testing.csv')
+ARTIFACT_FORMAT_VERSION = 1
+LEAF_DTYPES = ('uint8', 'float16', 'float32')
+
+
+class CompactForest:
+    """All kept trees as one node DAG in flat arrays. Exposes the subset of the sklearn classifier API app.py uses
+    (classes_, n_features_in_, predict_proba, predict)."""
+
+    def __init__(self, classes_, n_features_in_, feature, threshold, left, right, leaf_value, values, value_scale, roots, max_depth,
+                 node_value=None):
+        self.classes_ = classes_
+        self.n_features_in_ = n_features_in_
+        self.feature = feature # int16, -1 for leaves
+        self.threshold = threshold # float32
+        self.left = left # int32
+        self.right = right
+        self.leaf_value = leaf_value # int32 row of `values` for leaves, -1 for internal nodes
+        self.values = values # (distinct leaf distributions, n_classes) in the leaf dtype
+        self.value_scale = value_scale # values / value_scale == per-tree class probabilities
+        self.roots = roots # int32, one per kept tree
+        self.max_depth = max_depth
+        self.node_value = node_value # (n_nodes, n_classes) class distribution at every node, for attributions; optional
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def nbytes(self):
+        arrays = ('feature', 'threshold', 'left', 'right', 'leaf_value', 'values', 'roots', 'node_value')
+        return sum(getattr(self, name).nbytes for name in arrays if getattr(self, name) is not None)
+
+    def apply(self, X, return_edges=False):
+        """Leaf node of every tree for every row: (n_rows, n_trees) int32. With return_edges, also the traversed
+        edges as (pair, parent, child) arrays, where pair = row * n_trees + tree."""
+        X = np.asarray(X, dtype=np.float32)
+        nodes = np.tile(self.roots, len(X)) # Row-major (row, tree) pairs
+        rows = np.repeat(np.arange(len(X)), self.n_trees)
+        active = np.arange(len(nodes))
+        edges = []
+        while active.size: # One level per step, over the pairs that have not reached a leaf yet
+            current = nodes[active]
+            feature = self.feature[current]
+            internal = feature >= 0
+            active, current, feature = active[internal], current[internal], feature[internal]
+            go_left = X[rows[active], feature] <= self.threshold[current]
+            nodes[active] = np.where(go_left, self.left[current], self.right[current])
+            if return_edges:
+                edges.append((active, current, nodes[active]))
+        leaves = nodes.reshape(len(X), self.n_trees)
+        if return_edges:
+            return leaves, tuple(np.concatenate(part) if part else np.zeros(0, dtype=np.int64) for part in zip(*edges))
+        return leaves
+
+    def _proba(self, leaves):
+        leaf_values = self.values[self.leaf_value[leaves]] # (n_rows, n_trees, n_classes)
+        proba = leaf_values.sum(axis=1, dtype=np.float64)
+        return proba / np.maximum(proba.sum(axis=1, keepdims=True), 1e-12)
+
+    def predict_proba(self, X):
+        return self._proba(self.apply(X))
+
+    def predict_proba_explained(self, X):
+        """(proba, bias, contributions) from one traversal. contributions[i, f] is how much the splits on feature f
+        along row i's decision paths moved the probability of its predicted class (the change in node class
+        distribution from parent to child, averaged over trees); bias[i] is that class's share at the roots, so
+        bias + contributions.sum(axis=1) is the predicted class's probability, up to leaf rounding."""
+        if self.node_value is None:
+            raise ValueError("This compact forest was built without node values; rebuild it to get attributions.")
+        X = np.asarray(X, dtype=np.float32)
+        leaves, (pairs, parents, children) = self.apply(X, return_edges=True)
+        proba = self._proba(leaves)
+        predicted = proba.argmax(axis=1)
+        rows = pairs // self.n_trees
+        classes = predicted[rows]
+        scale = self.value_scale * self.n_trees
+        delta = (self.node_value[children, classes].astype(np.float64) - self.node_value[parents, classes]) / scale
+        contributions = np.bincount(rows * self.n_features_in_ + self.feature[parents], weights=delta,
+                                    minlength=len(X) * self.n_features_in_).reshape(len(X), self.n_features_in_)
+        bias = self.node_value[self.roots][:, predicted].sum(axis=0, dtype=np.float64) / scale
+        return proba, bias, contributions
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def tree_probabilities(model, X):
+    """Per-tree class probabilities of the sklearn forest: (n_trees, n_rows, n_classes)."""
+    X = np.asarray(X, dtype=np.float32)
+    if is_binary(X):
+        try: # Same values as each estimator's predict_proba, without a traversal per tree
+            return BitvectorForest.from_sklearn(model).tree_probabilities(X)
+        except ValueError:
+            pass
+    return np.stack([estimator.predict_proba(X) for estimator in model.estimators_])
+
+
+def select_trees(per_tree, tolerance, min_trees=1):
+    """Greedy backward elimination: visit trees from the one that agrees least with the full forest, and drop a
+    tree when no class probability moves by more than `tolerance` from the full forest's and the predicted class
+    is unchanged on every row the full forest decides by more than `tolerance` (closer calls are ties at that
+    tolerance). Returns the kept tree indices in their original order."""
+    n_trees = len(per_tree)
+    full = per_tree.mean(axis=0)
+    reference = full.argmax(axis=1)
+    top_two = np.sort(full, axis=1)[:, -2:]
+    decided = top_two[:, 1] - top_two[:, 0] > tolerance
+    agreement = (per_tree.argmax(axis=2) == reference).mean(axis=1)
+    kept, total = set(range(n_trees)), per_tree.sum(axis=0)
+    for tree in np.argsort(agreement, kind='stable'):
+        if len(kept) <= min_trees:
+            break
+        candidate = (total - per_tree[tree]) / (len(kept) - 1)
+        if (candidate.argmax(axis=1)[decided] == reference[decided]).all() and np.abs(candidate - full).max() <= tolerance:
+            total = total - per_tree[tree]
+            kept.discard(int(tree))
+    return sorted(kept)
+
+
+def quantize_leaves(distributions, leaf_dtype):
+    if leaf_dtype == 'uint8':
+        return np.round(distributions * 255).astype(np.uint8), 255.0
+    if leaf_dtype == 'float16':
+        return distributions.astype(np.float16), 1.0
+    if leaf_dtype == 'float32':
+        return distributions.astype(np.float32), 1.0
+    raise ValueError(f"Unknown leaf dtype '{leaf_dtype}', expected one of {LEAF_DTYPES}.")
+
+
+def build_compact_forest(model, tree_indices, leaf_dtype='uint8', node_values=True):
+    """Flatten the chosen trees into one DAG: identical leaves (after quantization) and identical subtrees are
+    stored once, and a split whose two children are identical is replaced by that child. With node_values, every
+    node also keeps its class distribution (then only splits with the same distribution are merged)."""
+    feature, threshold, left, right, leaf_value, depth, node_value = [], [], [], [], [], [], []
+    node_ids, value_ids, values = {}, {}, []
+
+    def intern(key, make):
+        if key not in node_ids:
+            node_ids[key] = len(feature)
+            make(node_ids[key])
+        return node_ids[key]
+
+    roots = []
+    for tree_index in tree_indices:
+        tree = model.estimators_[tree_index].tree_
+        distributions = tree.value[:, 0, :] / np.maximum(tree.value[:, 0, :].sum(axis=1, keepdims=True), 1e-12)
+        quantized, value_scale = quantize_leaves(distributions, leaf_dtype)
+        mapped = {}
+        for node in range(tree.node_count - 1, -1, -1): # Children always have larger ids than their parent
+            if tree.children_left[node] == -1:
+                value_bytes = quantized[node].tobytes()
+                if value_bytes not in value_ids:
+                    value_ids[value_bytes] = len(values)
+                    values.append(quantized[node])
+
+                def make_leaf(node_id, value_id=value_ids[value_bytes], distribution=quantized[node]):
+                    feature.append(-1); threshold.append(0.0); left.append(node_id); right.append(node_id)
+                    leaf_value.append(value_id); depth.append(0); node_value.append(distribution)
+                mapped[node] = intern(('leaf', value_bytes), make_leaf)
+                continue
+            lo, hi = mapped[tree.children_left[node]], mapped[tree.children_right[node]]
+            if lo == hi:
+                mapped[node] = lo
+                continue
+            split = (int(tree.feature[node]), float(np.float32(tree.threshold[node])), lo, hi,
+                     quantized[node].tobytes() if node_values else None)
+
+            def make_split(node_id, split=split, distribution=quantized[node]):
+                feature.append(split[0]); threshold.append(split[1]); left.append(split[2]); right.append(split[3])
+                leaf_value.append(-1); depth.append(1 + max(depth[split[2]], depth[split[3]])); node_value.append(distribution)
+            mapped[node] = intern(split, make_split)
+        roots.append(mapped[0])
+
+    return CompactForest(
+        classes_=np.asarray(model.classes_), n_features_in_=int(model.n_features_in_),
+        feature=np.asarray(feature, dtype=np.int16), threshold=np.asarray(threshold, dtype=np.float32),
+        left=np.asarray(left, dtype=np.int32), right=np.asarray(right, dtype=np.int32),
+        leaf_value=np.asarray(leaf_value, dtype=np.int32), values=np.asarray(values), value_scale=value_scale,
+        roots=np.asarray(roots, dtype=np.int32), max_depth=max(depth[root] for root in roots),
+        node_value=np.asarray(node_value) if node_values else None,
+    )
+
+
+def masked_rows(X, n_rows, seed=42, min_kept=2, max_kept=6):
+    """Training rows with all but a few present symptoms cleared: the partial vectors the chat flow predicts on."""
+    X = np.asarray(X, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    rows = []
+    for source in rng.choice(len(X), size=n_rows):
+        present = np.flatnonzero(X[source])
+        row = np.zeros(X.shape[1], dtype=np.float32)
+        if len(present):
+            keep = rng.choice(present, size=min(len(present), int(rng.integers(min_kept, max_kept + 1))), replace=False)
+            row[keep] = 1
+        rows.append(row)
+    return np.asarray(rows)
+
+
+def _per_call_ms(fn, repeat=50):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def compress_forest(model, X_train, X_test, y_test, tolerance=0.02, leaf_dtype='uint8', min_trees=10, n_masked=3000):
+    """(CompactForest, report). Fidelity is checked on the test set plus `n_masked` partial-symptom training rows."""
+    import pandas as pd
+
+    X_test = np.asarray(X_test, dtype=np.float32)
+    fidelity_set = np.vstack([X_test, masked_rows(X_train, n_masked)])
+    per_tree = tree_probabilities(model, fidelity_set)
+    kept = select_trees(per_tree, tolerance, min_trees)
+    forest = build_compact_forest(model, kept, leaf_dtype)
+
+    full_proba = per_tree.mean(axis=0)
+    compact_proba = forest.predict_proba(fidelity_set)
+    one_row = fidelity_set[:1]
+    # The forest was fitted on a DataFrame; time it on one, as app.py calls it.
+    as_frame = (lambda X: pd.DataFrame(X, columns=model.feature_names_in_)) \
+        if hasattr(model, 'feature_names_in_') else (lambda X: X)
+    one_frame, fidelity_frame = as_frame(one_row), as_frame(fidelity_set)
+    y_test = np.asarray(y_test)
+    report = {
+        'trees': {'before': len(model.estimators_), 'after': forest.n_trees},
+        'nodes': {'before': int(sum(e.tree_.node_count for e in model.estimators_)), 'after': forest.n_nodes},
+        'distinct_leaf_values': len(forest.values),
+        'leaf_dtype': leaf_dtype, 'tolerance': tolerance,
+        'bytes': {'before': len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)),
+                  'after': len(pickle.dumps(vars(forest), protocol=pickle.HIGHEST_PROTOCOL))},
+        'predict_one_ms': {'before': _per_call_ms(lambda: model.predict_proba(one_frame)),
+                           'after': _per_call_ms(lambda: forest.predict_proba(one_row))},
+        'predict_batch_ms': {'rows': len(fidelity_set),
+                             'before': _per_call_ms(lambda: model.predict_proba(fidelity_frame), repeat=3),
+                             'after': _per_call_ms(lambda: forest.predict_proba(fidelity_set), repeat=3)},
+        'test_accuracy': {'before': float((model.classes_[full_proba[:len(X_test)].argmax(axis=1)] == y_test).mean()),
+                          'after': float((forest.predict(X_test) == y_test).mean())},
+        'fidelity': {'rows': len(fidelity_set),
+                     'same_prediction': float((compact_proba.argmax(axis=1) == full_proba.argmax(axis=1)).mean()),
+                     'max_probability_shift': float(np.abs(compact_proba - full_proba).max())},
+    }
+    if forest.node_value is not None:
+        report['explain_one_ms'] = benchmark_explanations(forest, fidelity_set)
+    return forest, report
+
+
+def benchmark_explanations(forest, X, n_rows=200):
+    """Mean single-row predict_proba vs predict_proba_explained time over the first `n_rows` rows of X."""
+    rows = [X[i:i + 1] for i in range(min(n_rows, len(X)))]
+    predict = _per_call_ms(lambda: [forest.predict_proba(row) for row in rows], repeat=5) / len(rows)
+    explained = _per_call_ms(lambda: [forest.predict_proba_explained(row) for row in rows], repeat=5) / len(rows)
+    return {'rows': len(rows), 'predict': predict, 'explained': explained,
+            'overhead_pct': (explained - predict) / predict * 100 if predict else 0.0}
+
+
+def save_compact_model(forest, report, model_version, path=COMPACT_MODEL_PATH):
+    # The forest is stored as its arrays (vars()), so loading doesn't depend on the module path it was pickled under.
+    artifact = {'format_version': ARTIFACT_FORMAT_VERSION, 'model_version': model_version, 'forest': vars(forest), 'report': report}
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_compact_model(path=COMPACT_MODEL_PATH):
+    with open(path, 'rb') as f:
+        artifact = pickle.load(f)
+    if artifact.get('format_version') != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"Compact model {path} has format {artifact.get('format_version')}, expected {ARTIFACT_FORMAT_VERSION}.")
+    artifact['forest'] = CompactForest(**artifact['forest'])
+    return artifact
+
+
+def print_report(report):
+    def row(label, section, fmt):
+        before, after = report[section]['before'], report[section]['after']
+        ratio = f"{before / after:.1f}x" if after else '-'
+        print(f"{label:<24}{fmt(before):>14}{fmt(after):>14}{ratio:>8}")
+
+    print(f"{'':<24}{'before':>14}{'after':>14}{'ratio':>8}")
+    row('trees', 'trees', str)
+    row('nodes', 'nodes', str)
+    row('pickle bytes', 'bytes', lambda v: f"{v:,}")
+    row('predict 1 row ms', 'predict_one_ms', lambda v: f"{v:.3f}")
+    row(f"predict {report['predict_batch_ms']['rows']} rows ms", 'predict_batch_ms', lambda v: f"{v:.1f}")
+    accuracy = report['test_accuracy']
+    print(f"{'test accuracy':<24}{accuracy['before'] * 100:>13.2f}%{accuracy['after'] * 100:>13.2f}%"
+          f"{(accuracy['after'] - accuracy['before']) * 100:>+7.2f}")
+    fidelity = report['fidelity']
+    print(f"Fidelity on {fidelity['rows']} rows (test set + partial-symptom rows): "
+          f"{fidelity['same_prediction'] * 100:.2f}% same prediction, max probability shift {fidelity['max_probability_shift']:.4f}. "
+          f"{report['distinct_leaf_values']} distinct {report['leaf_dtype']} leaf distributions.")
+    if 'explain_one_ms' in report:
+        explain = report['explain_one_ms']
+        print(f"Attributions over {explain['rows']} single-row calls: {explain['predict']:.3f} ms predict, "
+              f"{explain['explained']:.3f} ms predict + explain ({explain['overhead_pct']:+.1f}%).")
+
+
+def compress_and_save(model, X_train, X_test, y_test, model_path=MODEL_PATH, columns_path=SYMPTOM_COLUMNS_PATH,
+                      output_path=COMPACT_MODEL_PATH, **options):
+    from symptom_map import compute_model_version
+
+    forest, report = compress_forest(model, X_train, X_test, y_test, **options)
+    save_compact_model(forest, report, compute_model_version(model_path, columns_path), output_path)
+    print_report(report)
+    print(f"Compact model -> {output_path}")
+    return forest, report
+
+
+if __name__ == '__main__':
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Compress the trained forest for serving and report the deltas.")
+    parser.add_argument('--tolerance', type=float, default=0.02, help="Max class-probability shift allowed when dropping trees")
+    parser.add_argument('--leaf-dtype', choices=LEAF_DTYPES, default='uint8')
+    parser.add_argument('--min-trees', type=int, default=10)
+    parser.add_argument('--masked-rows', type=int, default=3000, help="Partial-symptom rows added to the fidelity set")
+    args = parser.parse_args()
+
+    with open(MODEL_PATH, 'rb') as f:
+        sklearn_model = pickle.load(f)
+    train_df, test_df = pd.read_csv(TRAINING_CSV_PATH), pd.read_csv(TESTING_CSV_PATH)
+    for df in (train_df, test_df):
+        df.columns = df.columns.str.strip()
+    train_df, test_df = train_df.dropna(axis=1, how='all'), test_df.dropna(axis=1, how='all')
+    compress_and_save(sklearn_model, train_df.drop(columns='prognosis'), test_df.drop(columns='prognosis'), test_df['prognosis'],
+                      tolerance=args.tolerance, leaf_dtype=args.leaf_dtype, min_trees=args.min_trees, n_masked=args.masked_rows)
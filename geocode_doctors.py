@@ -0,0 +1,247 @@
+# geocode_doctors.py
+# Offline enrichment of doctors_bd_detailed.csv: rows whose latitude/longitude are missing or 0,0 are resolved
+# against a local gazetteer (hospital -> coordinates, area/city -> centroid) and written to doctors_bd_enriched.csv,
+# which app.py and import_doctors.py load instead of the source file when it exists. No network geocoder is used.
+#
+# Usage: python geocode_doctors.py [--csv doctors_bd_detailed.csv] [--out doctors_bd_enriched.csv]
+#            [--gazetteer datasets/gazetteer_bd.csv] [--workers N] [--allow-city]
+#        python geocode_doctors.py --build-gazetteer   # refresh the directory-derived gazetteer entries
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+DEFAULT_CSV_PATH = os.path.join(BASE_DIR, 'doctors_bd_detailed.csv')
+DEFAULT_OUT_PATH = os.path.join(BASE_DIR, 'doctors_bd_enriched.csv')
+DEFAULT_GAZETTEER_PATH = os.path.join(BASE_DIR, 'datasets', 'gazetteer_bd.csv')
+DEFAULT_CACHE_PATH = os.path.join(BASE_DIR, 'geocode_cache.json')
+
+GAZETTEER_KINDS = ('hospital', 'area', 'city') # Most to least precise
+MAX_AREA_DISTANCE_KM = 30 # An area match farther than this from the address's city is treated as a name clash
+MAX_DERIVED_SPREAD_KM = {'hospital': 2, 'area': 5} # Derived entries whose rows disagree more than this are dropped
+POOL_MIN_ROWS = 500 # Below this, a process pool costs more than it saves
+
+
+def normalize_place(text):
+    text = str(text or '').lower()
+    text = re.sub(r'[-–]\s*\d{4}\b', ' ', text) # Postcodes ("Dhaka - 1205")
+    text = re.sub(r'[^a-z0-9 ]+', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def place_tokens(text):
+    """Comma/bracket separated parts of an address, normalized, without house/road numbers."""
+    parts = re.split(r'[,()]', str(text or ''))
+    return [token for token in (normalize_place(part) for part in parts) if token and not re.search(r'\d', token)]
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
+
+
+def has_coordinates(lat, lon):
+    return pd.notna(lat) and pd.notna(lon) and lat != 0 and lon != 0
+
+
+# --- Gazetteer ---
+def load_gazetteer(path):
+    """{kind: {normalized name: (lat, lon)}} from a CSV with columns kind,name,latitude,longitude,source."""
+    df = pd.read_csv(path, dtype={'kind': str, 'name': str, 'source': str})
+    gazetteer = {kind: {} for kind in GAZETTEER_KINDS}
+    for row in df.itertuples(index=False):
+        if row.kind in gazetteer:
+            gazetteer[row.kind][normalize_place(row.name)] = (float(row.latitude), float(row.longitude))
+    return gazetteer
+
+
+def gazetteer_version(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def _median_point(points):
+    return statistics.median(p[0] for p in points), statistics.median(p[1] for p in points)
+
+
+def derive_gazetteer_entries(df, curated_names):
+    """Hospital and area entries learned from directory rows that already have coordinates. A name is kept only
+    when its rows agree (spread within MAX_DERIVED_SPREAD_KM) so one mis-geocoded row can't move a whole area."""
+    groups = {'hospital': {}, 'area': {}}
+    for row in df.itertuples(index=False):
+        if not has_coordinates(row.latitude, row.longitude):
+            continue
+        point = (float(row.latitude), float(row.longitude))
+        hospital = normalize_place(row.hospital_name)
+        if hospital:
+            groups['hospital'].setdefault(hospital, []).append(point)
+        for token in set(place_tokens(row.address)):
+            groups['area'].setdefault(token, []).append(point)
+
+    entries = []
+    for kind, by_name in groups.items():
+        min_rows = 1 if kind == 'hospital' else 2
+        for name, points in sorted(by_name.items()):
+            if name in curated_names or len(points) < min_rows:
+                continue
+            lat, lon = _median_point(points)
+            if max(haversine_km(lat, lon, p[0], p[1]) for p in points) <= MAX_DERIVED_SPREAD_KM[kind]:
+                entries.append({'kind': kind, 'name': name, 'latitude': round(lat, 6), 'longitude': round(lon, 6),
+                                'source': 'directory'})
+    return entries
+
+
+def build_gazetteer(csv_path, gazetteer_path):
+    existing = pd.read_csv(gazetteer_path, dtype=str) if os.path.exists(gazetteer_path) else pd.DataFrame(
+        columns=['kind', 'name', 'latitude', 'longitude', 'source'])
+    curated = existing[existing['source'] != 'directory']
+    curated_names = {normalize_place(name) for name in curated['name']}
+    df = read_directory(csv_path)
+    df['latitude'] = pd.to_numeric(df['latitude'], errors='coerce')
+    df['longitude'] = pd.to_numeric(df['longitude'], errors='coerce')
+    derived = pd.DataFrame(derive_gazetteer_entries(df, curated_names))
+    out = pd.concat([curated, derived], ignore_index=True)
+    tmp_path = gazetteer_path + '.tmp'
+    out.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, gazetteer_path)
+    print(f"Gazetteer {gazetteer_path}: {len(curated)} curated + {len(derived)} directory-derived entries")
+
+
+# --- Resolution ---
+def resolve_location(gazetteer, hospital_name, address, allow_city=False):
+    """(lat, lon, kind, matched name) for one doctor row, or None. Hospital names win over areas, areas over
+    cities; an area must lie near the address's city when one is recognised."""
+    hospital = normalize_place(hospital_name)
+    candidates = [hospital] + [normalize_place(part) for part in str(hospital_name or '').split(',')[:1]]
+    for name in candidates:
+        if name in gazetteer['hospital']:
+            return (*gazetteer['hospital'][name], 'hospital', name)
+
+    tokens = place_tokens(address) + place_tokens(hospital_name)[1:]
+    city = next((t for t in reversed(tokens) if t in gazetteer['city']), None)
+    city_point = gazetteer['city'].get(city)
+    for token in tokens:
+        point = gazetteer['area'].get(token)
+        if point and (city_point is None or haversine_km(*point, *city_point) <= MAX_AREA_DISTANCE_KM):
+            return (*point, 'area', token)
+    if allow_city and city_point:
+        return (*city_point, 'city', city)
+    return None
+
+
+_worker_gazetteer = None
+
+def _init_worker(gazetteer_path):
+    global _worker_gazetteer
+    _worker_gazetteer = load_gazetteer(gazetteer_path)
+
+def _resolve_batch(batch, allow_city):
+    return [(key, resolve_location(_worker_gazetteer, hospital, address, allow_city)) for key, hospital, address in batch]
+
+
+def _cache_key(hospital_name, address):
+    return f"{normalize_place(hospital_name)}|{normalize_place(address)}"
+
+
+def load_cache(cache_path, version, allow_city):
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get('gazetteer_version') == version and cache.get('allow_city') == allow_city:
+            return cache['entries']
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}
+
+
+def save_cache(cache_path, version, allow_city, entries):
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'gazetteer_version': version, 'allow_city': allow_city, 'entries': entries}, f)
+    os.replace(tmp_path, cache_path)
+
+
+def read_directory(csv_path):
+    # Everything as text so untouched rows are written back byte-for-byte.
+    return pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+
+
+def enrich(csv_path, out_path, gazetteer_path, cache_path, workers=None, allow_city=False):
+    start = time.perf_counter()
+    df = read_directory(csv_path)
+    lat_col = next(col for col in df.columns if col.strip().lower() == 'latitude')
+    lon_col = next(col for col in df.columns if col.strip().lower() == 'longitude')
+    hospital_col = next(col for col in df.columns if col.strip().lower() == 'hospital_name')
+    address_col = next(col for col in df.columns if col.strip().lower() == 'address')
+    lats = pd.to_numeric(df[lat_col], errors='coerce')
+    lons = pd.to_numeric(df[lon_col], errors='coerce')
+    missing = [i for i in range(len(df)) if not has_coordinates(lats.iat[i], lons.iat[i])]
+
+    version = gazetteer_version(gazetteer_path)
+    cache = load_cache(cache_path, version, allow_city)
+    pending, cache_hits = {}, 0
+    for i in missing:
+        key = _cache_key(df.at[i, hospital_col], df.at[i, address_col])
+        if key in cache:
+            cache_hits += 1
+        else:
+            pending[key] = (key, df.at[i, hospital_col], df.at[i, address_col])
+
+    jobs = list(pending.values())
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(jobs) >= POOL_MIN_ROWS:
+        chunk = math.ceil(len(jobs) / (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(gazetteer_path,)) as pool:
+            futures = [pool.submit(_resolve_batch, jobs[i:i + chunk], allow_city) for i in range(0, len(jobs), chunk)]
+            results = [result for future in futures for result in future.result()]
+    else:
+        _init_worker(gazetteer_path)
+        results = _resolve_batch(jobs, allow_city)
+    for key, location in results:
+        cache[key] = list(location) if location else None
+    save_cache(cache_path, version, allow_city, cache)
+
+    df['geo_source'] = ['source' if has_coordinates(lat, lon) else '' for lat, lon in zip(lats, lons)]
+    df['geo_match'] = ''
+    counts = {kind: 0 for kind in GAZETTEER_KINDS}
+    for i in missing:
+        location = cache.get(_cache_key(df.at[i, hospital_col], df.at[i, address_col]))
+        if location:
+            lat, lon, kind, name = location
+            df.at[i, lat_col], df.at[i, lon_col] = f"{lat:.6f}", f"{lon:.6f}"
+            df.at[i, 'geo_source'], df.at[i, 'geo_match'] = kind, name
+            counts[kind] += 1
+
+    tmp_path = out_path + '.tmp'
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, out_path) # Atomic swap so a worker starting up never reads a half-written file
+    resolved = sum(counts.values())
+    print(f"{len(df)} doctors, {len(missing)} without coordinates: resolved {resolved} "
+          f"({', '.join(f'{n} by {kind}' for kind, n in counts.items())}), {len(missing) - resolved} unresolved; "
+          f"{cache_hits} cache hits, {len(jobs)} looked up in {time.perf_counter() - start:.2f}s -> {out_path}")
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fill in missing doctor coordinates from a local gazetteer.")
+    parser.add_argument('--csv', default=DEFAULT_CSV_PATH, help="Source directory CSV (default: doctors_bd_detailed.csv)")
+    parser.add_argument('--out', default=DEFAULT_OUT_PATH, help="Enriched CSV (default: doctors_bd_enriched.csv)")
+    parser.add_argument('--gazetteer', default=DEFAULT_GAZETTEER_PATH, help="Gazetteer CSV (default: datasets/gazetteer_bd.csv)")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help="Persistent lookup cache (default: geocode_cache.json)")
+    parser.add_argument('--workers', type=int, help="Worker processes for bulk runs (default: CPU count)")
+    parser.add_argument('--allow-city', action='store_true', help="Fall back to the city centroid when no hospital/area matches")
+    parser.add_argument('--build-gazetteer', action='store_true', help="Regenerate the directory-derived gazetteer entries and exit")
+    args = parser.parse_args()
+    if args.build_gazetteer:
+        build_gazetteer(args.csv, args.gazetteer)
+    else:
+        enrich(args.csv, args.out, args.gazetteer, args.cache, args.workers, args.allow_city)
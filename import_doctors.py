@@ -0,0 +1,124 @@
+# import_doctors.py
+# One-time import of doctors_bd_detailed.csv into an indexed SQLite store that app.py can query
+# instead of holding the whole directory (including the long `about` text) in every worker.
+#
+# Usage: python import_doctors.py [--csv doctors_bd_detailed.csv] [--db doctors_bd.sqlite]
+import argparse
+import math
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+DEFAULT_CSV_PATH = os.path.join(BASE_DIR, 'doctors_bd_detailed.csv')
+ENRICHED_CSV_PATH = os.path.join(BASE_DIR, 'doctors_bd_enriched.csv') # From geocode_doctors.py; preferred when present
+DEFAULT_DB_PATH = os.path.join(BASE_DIR, 'doctors_bd.sqlite')
+
+GRID_CELL_DEGREES = 0.1 # ~11 km cells; used for "doctors near me" style lookups
+NO_IMAGE_URL = 'https://via.placeholder.com/100?text=No+Image'
+
+SCHEMA = """
+CREATE TABLE specialities (
+    id INTEGER PRIMARY KEY,
+    speciality TEXT NOT NULL,
+    speciality_norm TEXT NOT NULL UNIQUE
+);
+CREATE TABLE doctors (
+    id INTEGER PRIMARY KEY,          -- row position in the source CSV
+    name TEXT,
+    degree TEXT,
+    speciality_id INTEGER REFERENCES specialities(id),
+    hospital_name TEXT,
+    address TEXT,
+    number TEXT,
+    latitude REAL,
+    longitude REAL,
+    grid_cell INTEGER                -- NULL when the doctor has no usable coordinates
+);
+-- Large display-only text lives apart so request-path queries never page it in.
+CREATE TABLE doctor_details (
+    id INTEGER PRIMARY KEY REFERENCES doctors(id),
+    about TEXT,
+    image_source TEXT,
+    visiting_hours TEXT
+);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE INDEX idx_doctors_speciality ON doctors(speciality_id, grid_cell);
+CREATE INDEX idx_doctors_grid_cell ON doctors(grid_cell);
+"""
+
+
+def grid_cell_for(lat, lon):
+    """Integer id of the GRID_CELL_DEGREES cell containing (lat, lon), or None for missing/placeholder coordinates."""
+    if lat is None or lon is None or pd.isna(lat) or pd.isna(lon) or lat == 0 or lon == 0:
+        return None
+    row = int(math.floor((lat + 90) / GRID_CELL_DEGREES))
+    col = int(math.floor((lon + 180) / GRID_CELL_DEGREES))
+    return row * 10000 + col
+
+
+def _text(value):
+    return None if pd.isna(value) else str(value).strip()
+
+
+def import_doctors(csv_path, db_path):
+    start = time.perf_counter()
+    df = pd.read_csv(csv_path, dtype={'number': str})
+    df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_')
+    for col in ('latitude', 'longitude'):
+        df[col] = pd.to_numeric(df[col], errors='coerce') if col in df.columns else float('nan')
+    df['about'] = df['about'].fillna('N/A')
+    df['image_source'] = df['image_source'].fillna(NO_IMAGE_URL)
+
+    tmp_path = db_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        speciality_ids = {}
+        for spec in df['speciality'].dropna().map(str.strip).unique():
+            norm = spec.lower()
+            if norm not in speciality_ids:
+                speciality_ids[norm] = len(speciality_ids) + 1
+                conn.execute("INSERT INTO specialities (id, speciality, speciality_norm) VALUES (?, ?, ?)",
+                             (speciality_ids[norm], spec, norm))
+
+        doctor_rows, detail_rows = [], []
+        for row_id, row in enumerate(df.itertuples(index=False)):
+            spec = _text(row.speciality)
+            lat = None if pd.isna(row.latitude) else float(row.latitude)
+            lon = None if pd.isna(row.longitude) else float(row.longitude)
+            doctor_rows.append((row_id, _text(row.name), _text(row.degree), speciality_ids.get(spec.lower()) if spec else None,
+                                _text(row.hospital_name), _text(row.address), _text(row.number),
+                                lat, lon, grid_cell_for(lat, lon)))
+            detail_rows.append((row_id, _text(row.about), _text(row.image_source), _text(getattr(row, 'visiting_hours', None))))
+        conn.executemany("INSERT INTO doctors VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", doctor_rows)
+        conn.executemany("INSERT INTO doctor_details VALUES (?, ?, ?, ?)", detail_rows)
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ('source_csv', os.path.basename(csv_path)),
+            ('source_mtime', str(os.path.getmtime(csv_path))),
+            ('grid_cell_degrees', str(GRID_CELL_DEGREES)),
+            ('imported_at', str(time.time())),
+        ])
+        conn.commit()
+        conn.execute("ANALYZE")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path) # Atomic swap so running workers never see a half-written store
+
+    print(f"Imported {len(doctor_rows)} doctors ({len(speciality_ids)} specialities) into {db_path} "
+          f"in {time.perf_counter() - start:.2f}s; size {os.path.getsize(db_path) / 1024:.0f} KiB")
+    return len(doctor_rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Import the doctor directory CSV into an indexed SQLite store.")
+    parser.add_argument('--csv', default=ENRICHED_CSV_PATH if os.path.exists(ENRICHED_CSV_PATH) else DEFAULT_CSV_PATH,
+                        help="Source CSV (default: doctors_bd_enriched.csv if present, else doctors_bd_detailed.csv)")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="Output SQLite file (default: doctors_bd.sqlite)")
+    args = parser.parse_args()
+    import_doctors(args.csv, args.db)
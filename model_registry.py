@@ -0,0 +1,190 @@
+# model_registry.py
+# Several disease models served from one process, each prediction routed to one of them by the session's cohort
+# (the age collected in the conversation, the region of the user's location). Every model predicts from the one
+# symptom vocabulary the conversation already collects, so the symptom map, NLP matcher, sessions and disease
+# knowledge tables stay shared; a model only brings its own trees and the subset of symptoms it was trained on.
+# Models listed twice (e.g. one regional model for several regions) are loaded once. Each model keeps its own
+# memory footprint, prediction count and latency window.
+#
+# Registry file (JSON), models tried in order, the served model is the fallback:
+#   {"models": [{"name": "pediatric", "path": "pediatric.pkl", "symptom_columns": "pediatric_symptom_columns.pkl",
+#                "max_age": 15},
+#               {"name": "north", "path": "north.pkl", "regions": ["rangpur", "rajshahi"]}]}
+# Paths are relative to the registry file; "symptom_columns" defaults to the served model's symptom list.
+#
+# Usage: python model_registry.py [--registry models/model_registry.json]
+#        # memory and latency per model; without a registry file, the bundled model in its three serving formats
+import json
+import os
+import pickle
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from shadow_model import load_candidate_model
+
+LATENCY_WINDOW = 2000 # Recent latencies kept per model for the percentiles
+ROUTE_KEYS = ('min_age', 'max_age', 'regions')
+
+
+def model_nbytes(model):
+    """Memory held by a model: its arrays for the compact/bitvector forests, the pickled size otherwise."""
+    if hasattr(model, 'nbytes'):
+        return int(model.nbytes())
+    return len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class ServedModel:
+    """One model in the registry: the classifier, the vocabulary symptoms it reads (in its column order) and the
+    cohort it serves. A route with age bounds or regions doesn't match a session whose age or region is unknown."""
+
+    def __init__(self, name, model, symptom_keys, route=None, nbytes=None, shared=False):
+        self.name = name
+        self.model = model
+        self.symptom_keys = symptom_keys
+        self.route = {key: value for key, value in (route or {}).items() if key in ROUTE_KEYS}
+        self.nbytes = model_nbytes(model) if nbytes is None else nbytes
+        self.shared = shared # Same model object as an earlier entry; its memory is counted there
+        self.predictions = 0
+        self.latency_ms = deque(maxlen=LATENCY_WINDOW)
+
+    def matches(self, age=None, region=None):
+        if 'min_age' in self.route and (age is None or age < self.route['min_age']):
+            return False
+        if 'max_age' in self.route and (age is None or age > self.route['max_age']):
+            return False
+        if 'regions' in self.route and region not in self.route['regions']:
+            return False
+        return True
+
+
+class ModelRegistry:
+    """Routes each prediction to the first model whose cohort matches, falling back to the default model.
+
+    `vocabulary` is the served model's symptom keys: the keys sessions are built from. Another model may read any
+    subset of them, in its own order; a model that needs a symptom the conversation never asks about is rejected."""
+
+    def __init__(self, vocabulary, default_model, default_name='default'):
+        self.vocabulary = vocabulary
+        self._vocabulary_set = set(vocabulary)
+        self._lock = threading.Lock()
+        self.default = ServedModel(default_name, default_model, vocabulary)
+        self.entries = []
+
+    def add(self, name, model, symptom_keys=None, route=None, nbytes=None, shared=False):
+        symptom_keys = list(self.vocabulary if symptom_keys is None else symptom_keys)
+        unknown = [key for key in symptom_keys if key not in self._vocabulary_set]
+        if unknown:
+            raise ValueError(f"Model {name} uses {len(unknown)} symptoms outside the vocabulary, e.g. {unknown[:5]}.")
+        n_features = getattr(model, 'n_features_in_', len(symptom_keys))
+        if n_features != len(symptom_keys):
+            raise ValueError(f"Model {name} expects {n_features} symptoms but {len(symptom_keys)} columns were given.")
+        if any(entry.name == name for entry in self.entries) or name == self.default.name:
+            raise ValueError(f"Duplicate model name {name}.")
+        entry = ServedModel(name, model, symptom_keys, route, nbytes, shared)
+        self.entries.append(entry)
+        return entry
+
+    @property
+    def models(self):
+        return [self.default] + self.entries
+
+    def route(self, age=None, region=None):
+        for entry in self.entries:
+            if entry.matches(age, region):
+                return entry
+        return self.default
+
+    def record(self, entry, elapsed_ms):
+        with self._lock:
+            entry.predictions += 1
+            entry.latency_ms.append(elapsed_ms)
+
+    # --- Report ---
+    def summary(self):
+        with self._lock:
+            models = []
+            for entry in self.models:
+                latency = list(entry.latency_ms)
+                models.append({
+                    'name': entry.name, 'type': type(entry.model).__name__, 'route': entry.route,
+                    'symptoms': len(entry.symptom_keys), 'classes': len(entry.model.classes_),
+                    'kib': round(entry.nbytes / 1024, 1), 'shared': entry.shared, 'predictions': entry.predictions,
+                    'latency_ms': {'p50': round(float(np.percentile(latency, 50)), 3) if latency else None,
+                                   'p95': round(float(np.percentile(latency, 95)), 3) if latency else None},
+                })
+            return {'vocabulary': len(self.vocabulary), 'models': models,
+                    'total_kib': round(sum(entry.nbytes for entry in self.models if not entry.shared) / 1024, 1)}
+
+
+def load_registry(path, vocabulary, default_model, default_name='default', normalize_key=None):
+    """A ModelRegistry from a registry file (see the top of this module); paths are relative to the file."""
+    with open(path, 'r') as f:
+        spec = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    registry = ModelRegistry(vocabulary, default_model, default_name)
+    loaded = {} # realpath -> ServedModel that loaded it
+    for item in spec.get('models', []):
+        model_path = os.path.realpath(os.path.join(base_dir, item['path']))
+        first = loaded.get(model_path)
+        model = first.model if first is not None else load_candidate_model(model_path)
+        symptom_keys = None
+        if item.get('symptom_columns'):
+            with open(os.path.join(base_dir, item['symptom_columns']), 'rb') as f:
+                symptom_keys = list(pickle.load(f))
+            if normalize_key is not None:
+                symptom_keys = [normalize_key(key) for key in symptom_keys]
+        entry = registry.add(item['name'], model, symptom_keys, route=item,
+                             nbytes=first.nbytes if first is not None else None, shared=first is not None)
+        loaded.setdefault(model_path, entry)
+    return registry
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from bitvector_forest import BitvectorForest
+    from forest_compression import COMPACT_MODEL_PATH, MODEL_PATH, SYMPTOM_COLUMNS_PATH, load_compact_model
+    from symptom_map import normalize_model_key
+
+    parser = argparse.ArgumentParser(description="Memory and latency per model of a multi-model registry.")
+    parser.add_argument('--registry', help="Registry JSON file (default: the bundled model in three formats)")
+    parser.add_argument('--predictions', type=int, default=300, help="Predictions routed per cohort")
+    args = parser.parse_args()
+
+    with open(SYMPTOM_COLUMNS_PATH, 'rb') as f:
+        keys = [normalize_model_key(key) for key in pickle.load(f)]
+    with open(MODEL_PATH, 'rb') as f:
+        sklearn_model = pickle.load(f)
+    if args.registry:
+        registry = load_registry(args.registry, keys, sklearn_model, normalize_key=normalize_model_key)
+    else: # Stand-ins for cohort models: the same forest compressed and as bitvectors
+        registry = ModelRegistry(keys, sklearn_model)
+        if os.path.exists(COMPACT_MODEL_PATH):
+            registry.add('pediatric', load_compact_model(COMPACT_MODEL_PATH)['forest'], route={'max_age': 15})
+        registry.add('dhaka', BitvectorForest.from_sklearn(sklearn_model), route={'regions': ['dhaka']})
+
+    rng = np.random.default_rng(0)
+    cohorts = [(8, None), (40, 'dhaka'), (40, 'sylhet'), (None, None)]
+    for age, region in cohorts:
+        entry = registry.route(age, region)
+        frame_columns = getattr(entry.model, 'feature_names_in_', None)
+        for _ in range(args.predictions):
+            vector = {key: int(rng.random() < 0.04) for key in keys}
+            row = np.array([[vector[key] for key in entry.symptom_keys]], dtype=np.float32)
+            if frame_columns is not None:
+                import pandas as pd
+                row = pd.DataFrame(row, columns=frame_columns)
+            start = time.perf_counter()
+            entry.model.predict_proba(row)
+            registry.record(entry, (time.perf_counter() - start) * 1000)
+        print(f"age={age} region={region} -> {entry.name}")
+    report = registry.summary()
+    print(f"\n{'model':<12}{'type':<22}{'KiB':>10}{'preds':>8}{'p50 ms':>9}{'p95 ms':>9}  route")
+    for m in report['models']:
+        print(f"{m['name']:<12}{m['type']:<22}{m['kib']:>10.1f}{m['predictions']:>8}{m['latency_ms']['p50'] or 0:>9.3f}"
+              f"{m['latency_ms']['p95'] or 0:>9.3f}  {m['route'] or 'fallback'}{' (shared)' if m['shared'] else ''}")
+    print(f"Total model memory: {report['total_kib']:.0f} KiB for {len(report['models'])} models, "
+          f"one {report['vocabulary']}-symptom vocabulary.")
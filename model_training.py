@@ -1,5 +1,24 @@
 # model_training.py
+#
+# Usage: python model_training.py [--n-jobs N] [--profile [--profile-report models/training_profile.json]]
+#   --n-jobs   cores used to fit (and evaluate) the forest; -1 = all. The saved model is the same for any value.
+#   --profile  wall time, CPU time and peak memory per stage (CSV load, cleanup, fit, evaluation, serialization, ...),
+#              printed at the end and written as JSON.
+import argparse
+import contextlib
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource # Unix only; peak RSS is left out elsewhere
+except ImportError:
+    resource = None
+
 import pandas as pd
+import sklearn
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score
 import pickle
@@ -10,15 +29,80 @@ import numpy as np # Added for np.max in example
 MODEL_DIR = 'models'  # Directory to save models
 MODEL_FILENAME = os.path.join(MODEL_DIR, 'disease_prediction_model.pkl')
 SYMPTOM_COLUMNS_FILENAME = os.path.join(MODEL_DIR, 'symptom_columns.pkl')
+PROFILE_REPORT_FILENAME = os.path.join(MODEL_DIR, 'training_profile.json')
+
+parser = argparse.ArgumentParser(description="Train the disease prediction model.")
+parser.add_argument('--n-jobs', type=int, default=-1, help="Cores used to fit the forest (-1 = all cores)")
+parser.add_argument('--profile', action='store_true', help="Report wall/CPU time and peak memory per stage")
+parser.add_argument('--profile-report', default=PROFILE_REPORT_FILENAME, help="Where --profile writes its JSON report")
+args = parser.parse_args()
 
 # Create models directory if it doesn't exist
 os.makedirs(MODEL_DIR, exist_ok=True)
 
+
+# --- Stage Profiling ---
+# CPU time is process-wide (process_time), so it includes the worker threads of a parallel fit; CPU/wall above 1
+# means the stage used several cores. Peak memory is traced Python/NumPy allocations during the stage (tracemalloc,
+# only with --profile because tracing slows allocation-heavy stages) and the process's peak RSS so far.
+PROFILE_STAGES = []
+
+def _max_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024 # Bytes on macOS, KiB on Linux
+
+@contextlib.contextmanager
+def stage(name):
+    if args.profile:
+        tracemalloc.reset_peak()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        max_rss = _max_rss_mb()
+        PROFILE_STAGES.append({
+            'stage': name, 'wall_s': round(wall, 4), 'cpu_s': round(cpu, 4),
+            'cpu_per_wall': round(cpu / wall, 2) if wall > 0 else None,
+            'peak_traced_mb': round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2) if args.profile else None,
+            'max_rss_mb': round(max_rss, 1) if max_rss is not None else None,
+        })
+
+def write_profile_report(path, **extra):
+    report = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'n_jobs': args.n_jobs, 'cpu_count': os.cpu_count(),
+        'python': platform.python_version(), 'sklearn': sklearn.__version__, **extra,
+        'stages': PROFILE_STAGES,
+        'total': {'wall_s': round(sum(s['wall_s'] for s in PROFILE_STAGES), 4),
+                  'cpu_s': round(sum(s['cpu_s'] for s in PROFILE_STAGES), 4),
+                  'max_rss_mb': max((s['max_rss_mb'] for s in PROFILE_STAGES if s['max_rss_mb']), default=None)},
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, path)
+    return report
+
+def print_profile(report):
+    print(f"\n--- Training profile (n_jobs={report['n_jobs']}, {report['cpu_count']} CPUs) ---")
+    print(f"{'stage':<20}{'wall s':>10}{'cpu s':>10}{'cpu/wall':>10}{'peak MB':>10}{'max RSS MB':>12}")
+    for s in report['stages']:
+        print(f"{s['stage']:<20}{s['wall_s']:>10.3f}{s['cpu_s']:>10.3f}{s['cpu_per_wall'] or 0:>10.2f}"
+              f"{s['peak_traced_mb'] or 0:>10.1f}{s['max_rss_mb'] or 0:>12.1f}")
+    print(f"{'total':<20}{report['total']['wall_s']:>10.3f}{report['total']['cpu_s']:>10.3f}")
+
+if args.profile:
+    tracemalloc.start()
+
+
 # --- Data Loading and Preprocessing ---
 print("Loading training and testing data...")
 try:
-    train_df = pd.read_csv('Training.csv')
-    test_df = pd.read_csv('Testing.csv')
+    with stage('csv_load'):
+        train_df = pd.read_csv('Training.csv')
+        test_df = pd.read_csv('Testing.csv')
     print("Data loaded successfully.")
 except FileNotFoundError:
     print("********************************************************************************")
@@ -27,15 +111,16 @@ except FileNotFoundError:
     print("********************************************************************************")
     exit()
 
-# Drop 'Unnamed: 133' if it exists and is all NaN (common issue with this dataset)
-# Also, handle potential trailing spaces in column names
-train_df.columns = train_df.columns.str.strip()
-test_df.columns = test_df.columns.str.strip()
+with stage('cleanup'):
+    # Drop 'Unnamed: 133' if it exists and is all NaN (common issue with this dataset)
+    # Also, handle potential trailing spaces in column names
+    train_df.columns = train_df.columns.str.strip()
+    test_df.columns = test_df.columns.str.strip()
 
-if 'Unnamed: 133' in train_df.columns:
-    train_df = train_df.dropna(axis=1, how='all')
-if 'Unnamed: 133' in test_df.columns:
-    test_df = test_df.dropna(axis=1, how='all')
+    if 'Unnamed: 133' in train_df.columns:
+        train_df = train_df.dropna(axis=1, how='all')
+    if 'Unnamed: 133' in test_df.columns:
+        test_df = test_df.dropna(axis=1, how='all')
 
 print(f"Training data shape: {train_df.shape}")
 print(f"Testing data shape: {test_df.shape}")
@@ -46,11 +131,12 @@ if 'prognosis' not in train_df.columns or 'prognosis' not in test_df.columns:
     print("Error: 'prognosis' column not found in CSV files. Please check column names.")
     exit()
 
-X_train = train_df.drop('prognosis', axis=1)
-y_train = train_df['prognosis']
+with stage('features'):
+    X_train = train_df.drop('prognosis', axis=1)
+    y_train = train_df['prognosis']
 
-X_test = test_df.drop('prognosis', axis=1)
-y_test = test_df['prognosis']
+    X_test = test_df.drop('prognosis', axis=1)
+    y_test = test_df['prognosis']
 
 # Store column names (symptoms) from the training set
 # These names MUST match the symptom inputs the model expects
@@ -63,13 +149,16 @@ print(f"First few symptoms: {symptom_columns[:5]}")
 
 
 # --- Model Training ---
-print("\nTraining the disease prediction model (RandomForestClassifier)...")
+print(f"\nTraining the disease prediction model (RandomForestClassifier, n_jobs={args.n_jobs})...")
 # You can experiment with different models and hyperparameters
 # RandomForest is a good starting point
 # class_weight='balanced' can help with imbalanced datasets (if some diseases are rare)
-model = RandomForestClassifier(n_estimators=150, random_state=42, class_weight='balanced', min_samples_split=5)
+# Trees are fitted in parallel threads when n_jobs != 1; with a fixed random_state the result doesn't depend on it.
+model = RandomForestClassifier(n_estimators=150, random_state=42, class_weight='balanced', min_samples_split=5,
+                               n_jobs=args.n_jobs)
 try:
-    model.fit(X_train, y_train)
+    with stage('fit'):
+        model.fit(X_train, y_train)
     print("Model training complete.")
 except Exception as e:
     print(f"Error during model training: {e}")
@@ -77,36 +166,56 @@ except Exception as e:
 
 # --- Model Evaluation ---
 print("\nEvaluating model performance on the test set...")
+accuracy = None
 try:
-    y_pred_test = model.predict(X_test)
-    accuracy = accuracy_score(y_test, y_pred_test)
-    print(f"Model Accuracy on Test Set: {accuracy * 100:.2f}%")
+    with stage('evaluation'):
+        y_pred_test = model.predict(X_test)
+        accuracy = accuracy_score(y_test, y_pred_test)
+        print(f"Model Accuracy on Test Set: {accuracy * 100:.2f}%")
 
-    # Example: Show a classification report for more detailed metrics
-    from sklearn.metrics import classification_report
-    print("\nClassification Report (Test Set):")
-    # Use zero_division=0 to avoid warnings if a class has no predicted samples
-    report = classification_report(y_test, y_pred_test, zero_division=0)
-    print(report)
+        # Example: Show a classification report for more detailed metrics
+        from sklearn.metrics import classification_report
+        print("\nClassification Report (Test Set):")
+        # Use zero_division=0 to avoid warnings if a class has no predicted samples
+        report = classification_report(y_test, y_pred_test, zero_division=0)
+        print(report)
 
 except Exception as e:
     print(f"Error during model evaluation: {e}")
 
+# app.py predicts one row at a time, where spreading 150 trees over threads costs more than it saves.
+model.n_jobs = None
+
 
 # --- Saving the Model and Symptoms List using pickle ---
 print("\nSaving the trained model and symptom list...")
 try:
-    with open(MODEL_FILENAME, 'wb') as model_file:
-        pickle.dump(model, model_file)
-    print(f"Model saved to: {MODEL_FILENAME}")
+    with stage('serialization'):
+        with open(MODEL_FILENAME, 'wb') as model_file:
+            pickle.dump(model, model_file)
+        print(f"Model saved to: {MODEL_FILENAME}")
 
-    with open(SYMPTOM_COLUMNS_FILENAME, 'wb') as Scolumns_file:
-        pickle.dump(symptom_columns, Scolumns_file)
-    print(f"Symptom column list saved to: {SYMPTOM_COLUMNS_FILENAME}")
+        with open(SYMPTOM_COLUMNS_FILENAME, 'wb') as Scolumns_file:
+            pickle.dump(symptom_columns, Scolumns_file)
+        print(f"Symptom column list saved to: {SYMPTOM_COLUMNS_FILENAME}")
 except Exception as e:
     print(f"Error saving model or symptom list: {e}")
 
-print("\n--- model_training.py finished ---")
+
+# --- Forest Compression (for serving) ---
+# Drops trees that don't change predictions beyond a tolerance, merges identical subtrees and quantizes leaf
+# distributions; app.py serves the result instead of the pickle above. Every node's class distribution is kept too,
+# so the served model can attribute a prediction to the symptoms on its decision paths (AROGYABOT_EXPLANATIONS).
+# Re-run alone with `python forest_compression.py`.
+print("\nCompressing the forest for serving...")
+try:
+    from forest_compression import compress_and_save
+    with stage('compression'):
+        compress_and_save(model, X_train, X_test, y_test, model_path=MODEL_FILENAME, columns_path=SYMPTOM_COLUMNS_FILENAME,
+                          output_path=os.path.join(MODEL_DIR, 'disease_prediction_model_compact.pkl'))
+except Exception as e:
+    print(f"Error compressing the model (the uncompressed model is still saved and will be served): {e}")
+
 
 
 # --- Optional: Example Prediction (for quick check) ---
@@ -125,9 +234,10 @@ if len(symptom_columns) > 3: # Ensure we have enough symptoms for a sensible exa
     sample_df = sample_df[symptom_columns]
 
     try:
-        predicted_disease_example = model.predict(sample_df)
-        predicted_proba_example = model.predict_proba(sample_df)
-        max_proba_example = np.max(predicted_proba_example)
+        with stage('example_prediction'):
+            predicted_disease_example = model.predict(sample_df)
+            predicted_proba_example = model.predict_proba(sample_df)
+            max_proba_example = np.max(predicted_proba_example)
 
         print(f"Example symptoms chosen: {', '.join(sample_symptoms_present)}")
         print(f"Predicted Disease: {predicted_disease_example[0]}")
@@ -135,4 +245,14 @@ if len(symptom_columns) > 3: # Ensure we have enough symptoms for a sensible exa
     except Exception as e:
         print(f"Error during example prediction: {e}")
 else:
-    print("\nSkipping example prediction due to insufficient symptom columns for a test.")
\ No newline at end of file
+    print("\nSkipping example prediction due to insufficient symptom columns for a test.")
+
+
+# --- Profile Report ---
+if args.profile:
+    profile = write_profile_report(args.profile_report, rows={'train': len(X_train), 'test': len(X_test)},
+                                   features=len(symptom_columns), n_estimators=model.n_estimators, test_accuracy=accuracy)
+    print_profile(profile)
+    print(f"Profile report written to: {args.profile_report}")
+
+print("\n--- model_training.py finished ---")
@@ -0,0 +1,169 @@
+# profiler.py
+# On-demand request profiling for live workers. A sampled fraction of requests (or one carrying the admin profile
+# header) is profiled either by a background stack sampler (low overhead, produces collapsed stacks for flame
+# graphs) or by cProfile (exact call counts, produces pstats). Results are aggregated per conversation state.
+import cProfile
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+PROFILER_MODES = ('sample', 'cprofile')
+# Only one cProfile.Profile can be enabled per process at a time (Python 3.12+ raises for a second one, earlier
+# versions silently steal the profile hook from the first), so cprofile mode profiles one request at a time.
+_CPROFILE_LOCK = threading.Lock()
+
+
+def collapse_stack(frame, max_depth=128):
+    """'outer;...;inner' for a frame, in the collapsed-stack format used by flamegraph.pl / speedscope."""
+    names = []
+    while frame is not None and len(names) < max_depth:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """One shared thread that samples the stacks of the threads currently being profiled."""
+
+    def __init__(self, interval_seconds=0.005):
+        self.interval = interval_seconds
+        self._targets = {} # thread id -> Counter of collapsed stacks
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self, thread_id):
+        counter = Counter()
+        with self._lock:
+            self._targets[thread_id] = counter
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='arogyabot-profiler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return counter
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._targets.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            with self._lock:
+                targets = list(self._targets.items())
+                if not targets:
+                    self._wake.clear()
+            if not targets:
+                self._wake.wait() # Idle (no profiled request in flight) costs nothing
+                continue
+            frames = sys._current_frames()
+            for thread_id, counter in targets:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    counter[collapse_stack(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+
+class RequestProfiler:
+    def __init__(self, mode='sample', sample_rate=0.0, interval_seconds=0.005):
+        if mode not in PROFILER_MODES:
+            raise ValueError(f"Unknown profiler mode '{mode}', expected one of {PROFILER_MODES}.")
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self._sampler = StackSampler(interval_seconds) if mode == 'sample' else None
+        self._lock = threading.Lock()
+        self._reset_locked()
+
+    def _reset_locked(self):
+        self.requests = Counter() # state -> profiled requests
+        self.wall_seconds = Counter() # state -> total wall time of profiled requests
+        self.collapsed = defaultdict(Counter) # state -> collapsed stack -> samples (sample mode)
+        self.stats = {} # state -> pstats.Stats (cprofile mode)
+        self.skipped = 0 # Requests picked for profiling while another cProfile session was running
+        self.started_at = time.time()
+
+    def reset(self):
+        with self._lock:
+            self._reset_locked()
+
+    def should_profile(self, forced=False):
+        return forced or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def begin(self):
+        """Start profiling the calling thread; returns an opaque handle for end(), or None when cprofile mode is
+        already profiling another request."""
+        if self._sampler:
+            thread_id = threading.get_ident()
+            self._sampler.start(thread_id)
+            return ('sample', thread_id, time.perf_counter())
+        if not _CPROFILE_LOCK.acquire(blocking=False):
+            with self._lock:
+                self.skipped += 1
+            return None
+        try:
+            profile = cProfile.Profile()
+            profile.enable()
+        except BaseException:
+            _CPROFILE_LOCK.release()
+            raise
+        return ('cprofile', profile, time.perf_counter())
+
+    def end(self, handle, state):
+        mode, target, start = handle
+        if mode == 'cprofile':
+            try:
+                target.disable()
+            finally:
+                _CPROFILE_LOCK.release()
+        elapsed = time.perf_counter() - start
+        state = state or 'unknown'
+        with self._lock:
+            self.requests[state] += 1
+            self.wall_seconds[state] += elapsed
+            if mode == 'sample':
+                self.collapsed[state].update(self._sampler.stop(target))
+            elif state in self.stats:
+                self.stats[state].add(target)
+            else:
+                self.stats[state] = pstats.Stats(target)
+
+    # --- Reports ---
+    def summary(self):
+        with self._lock:
+            states = sorted(self.requests)
+            return {
+                'mode': self.mode, 'sample_rate': self.sample_rate, 'since': self.started_at, 'skipped': self.skipped,
+                'states': {state: {'requests': self.requests[state],
+                                   'mean_ms': round(self.wall_seconds[state] / self.requests[state] * 1000, 3),
+                                   'samples': sum(self.collapsed[state].values()) if self.mode == 'sample' else None}
+                           for state in states},
+            }
+
+    def collapsed_stacks(self, state=None):
+        """Collapsed stacks ('frame;frame;frame count' per line), each prefixed by its conversation state."""
+        with self._lock:
+            lines = []
+            for st in sorted(self.collapsed):
+                if state and st != state:
+                    continue
+                for stack, count in self.collapsed[st].most_common():
+                    lines.append(f"{st};{stack} {count}")
+        return '\n'.join(lines) + ('\n' if lines else '')
+
+    def pstats_dump(self, state=None):
+        """Marshalled pstats data (the format of Stats.dump_stats), merged over `state` or all states."""
+        with self._lock:
+            merged = None
+            for st, stats in self.stats.items():
+                if state and st != state:
+                    continue
+                if merged is None:
+                    merged = pstats.Stats()
+                merged.add(stats)
+        return marshal.dumps(merged.stats) if merged else None
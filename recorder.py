@@ -0,0 +1,121 @@
+# recorder.py
+# Opt-in recording of /chat_api turns to a rotating JSONL file, for replaying production traffic with
+# replay_conversations.py. Records are anonymized (keyed HMAC of the user_id, the user's name replaced by a
+# placeholder) and written by a background thread so the request path only pays for a queue put.
+import hashlib
+import hmac
+import json
+import os
+import queue
+import re
+import threading
+
+RECORD_FORMAT_VERSION = 1
+NAME_PLACEHOLDER = 'Alex' # Replaces the user's name in recorded messages and before hashing responses
+
+
+def anonymize_user_id(user_id, salt):
+    return hmac.new(salt, str(user_id).encode('utf-8'), hashlib.sha256).hexdigest()[:16]
+
+
+def redact_name(text, user_name):
+    if not text or not user_name:
+        return text
+    return re.sub(rf'\b{re.escape(user_name)}\b', NAME_PLACEHOLDER, text, flags=re.IGNORECASE)
+
+
+def response_digest(bot_response_parts, user_name=None):
+    """Stable hash of a turn's visible output, with the user's name redacted so replays can be compared."""
+    digest = hashlib.sha256()
+    for part in bot_response_parts or []:
+        digest.update(redact_name(part, user_name).encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()[:16]
+
+
+class ConversationRecorder:
+    def __init__(self, path, max_bytes=50 * 1024 * 1024, backup_count=5, salt=None, queue_size=10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        if isinstance(salt, str):
+            salt = salt.encode('utf-8')
+        self.salt = salt or os.urandom(16) # Without a fixed salt, ids only correlate within one process lifetime
+        self._queue = queue.Queue(maxsize=queue_size)
+        self.stats = {'recorded': 0, 'dropped': 0, 'rotations': 0}
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='arogyabot-recorder', daemon=True)
+        self._thread.start()
+
+    def record(self, entry):
+        """Queue one turn record; never blocks the request (drops the record if the writer is behind)."""
+        if self._closed:
+            return
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.stats['dropped'] += 1
+
+    def anonymize(self, user_id):
+        return anonymize_user_id(user_id, self.salt)
+
+    def close(self, timeout=5.0):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    # --- Writer thread ---
+    def _rotate(self, f):
+        f.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.stats['rotations'] += 1
+        return open(self.path, 'a', encoding='utf-8')
+
+    def _run(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        f = open(self.path, 'a', encoding='utf-8')
+        try:
+            while True:
+                batch = [self._queue.get()]
+                while len(batch) < 500: # Drain what is already queued so each flush covers many turns
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = None in batch
+                for entry in batch:
+                    if entry is None:
+                        continue
+                    entry.setdefault('v', RECORD_FORMAT_VERSION)
+                    f.write(json.dumps(entry, separators=(',', ':'), ensure_ascii=False) + '\n')
+                    self.stats['recorded'] += 1
+                    if self.max_bytes and f.tell() >= self.max_bytes:
+                        f = self._rotate(f)
+                f.flush()
+                if stop:
+                    return
+        finally:
+            f.close()
+
+
+def load_records(paths):
+    """Read one or more recording files (including rotated .N backups) and return turns ordered by time."""
+    records = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    records.append(json.loads(line))
+    records.sort(key=lambda r: r['ts'])
+    return records
+
@@ -0,0 +1,189 @@
+# replay_conversations.py
+# Re-drives conversations recorded by recorder.py (AROGYABOT_RECORD_PATH) against an app instance and compares
+# per-turn latency and output with the recording, so a performance or behaviour regression between two builds
+# shows up before deploy.
+#
+# Usage: python replay_conversations.py recordings.jsonl [recordings.jsonl.1 ...]
+#            [--target http://localhost:5002] [--speed 10] [--concurrency 16] [--save replayed.jsonl]
+# Without --target the app is imported and driven in-process. --speed 1 keeps the original pacing, 10 replays ten
+# times faster and 0 sends every turn as soon as the previous one in its conversation returns. --save writes the
+# replayed turns in the recording format, to be used as the baseline when replaying against the next build.
+# Output only compares cleanly when both the recorded server and the replayed app run with
+# AROGYABOT_SEEDED_QUESTIONS=1; otherwise follow-up questions are shuffled at random and differ between runs.
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from recorder import NAME_PLACEHOLDER, RECORD_FORMAT_VERSION, load_records, response_digest
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def group_conversations(records):
+    """Recorded turns per conversation, keeping only conversations captured from their first message and
+    skipping turns the original server shed (they never changed conversation state)."""
+    conversations = defaultdict(list)
+    for record in records:
+        conversations[record['conversation']].append(record)
+    replayable, skipped = {}, 0
+    for conv_id, turns in conversations.items():
+        if turns[0].get('state') != 'AWAITING_NAME':
+            skipped += 1
+            continue
+        replayable[conv_id] = [turn for turn in turns if turn.get('status', 200) == 200]
+    return replayable, skipped
+
+
+class InProcessTarget:
+    def __init__(self):
+        import app as arogyabot
+        arogyabot.ensure_app_data()
+        arogyabot.warmup_app()
+        while arogyabot.READINESS['warming_up']: # Import may already have started warmup in the background
+            time.sleep(0.05)
+        self._app = arogyabot.app
+        self._clients = threading.local()
+
+    def post(self, payload):
+        client = getattr(self._clients, 'client', None)
+        if client is None:
+            client = self._clients.client = self._app.test_client()
+        response = client.post('/chat_api', json=payload)
+        return response.status_code, response.get_json(silent=True) or {}
+
+
+class HttpTarget:
+    def __init__(self, base_url):
+        self.url = base_url.rstrip('/') + '/chat_api'
+
+    def post(self, payload):
+        request = urllib.request.Request(self.url, data=json.dumps(payload).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.status, json.loads(response.read() or b'{}')
+        except urllib.error.HTTPError as e:
+            return e.code, {}
+
+
+def replay_conversation(target, conv_id, turns, t0, wall_start, speed, run_tag):
+    results, token = [], None
+    user_id = f"replay-{run_tag}-{conv_id}"
+    for turn in turns:
+        if speed > 0:
+            delay = wall_start + (turn['ts'] - t0) / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        payload = {'user_id': user_id, 'message': turn.get('message', '')}
+        if token:
+            payload['session_token'] = token
+        start = time.perf_counter()
+        status, body = target.post(payload)
+        latency_ms = (time.perf_counter() - start) * 1000
+        token = body.get('session_token', token)
+        digest = response_digest(body.get('bot_response_parts'), NAME_PLACEHOLDER)
+        results.append({
+            'v': RECORD_FORMAT_VERSION, 'ts': time.time(), 'conversation': conv_id,
+            'state': turn.get('state'), 'message': turn.get('message', ''), 'status': status,
+            'latency_ms': round(latency_ms, 3), 'stages': {},
+            'response_parts': len(body.get('bot_response_parts', [])), 'response_digest': digest,
+            'recorded_latency_ms': turn.get('latency_ms'), 'recorded_digest': turn.get('response_digest'),
+        })
+    return results
+
+
+def summarize(results, skipped_conversations):
+    recorded = [r['recorded_latency_ms'] for r in results if r['recorded_latency_ms'] is not None]
+    replayed = [r['latency_ms'] for r in results]
+    mismatches = [r for r in results if r['response_digest'] != r['recorded_digest']]
+    by_state = defaultdict(lambda: ([], []))
+    for r in results:
+        if r['recorded_latency_ms'] is not None:
+            by_state[r['state']][0].append(r['recorded_latency_ms'])
+        by_state[r['state']][1].append(r['latency_ms'])
+    return {
+        'conversations': len({r['conversation'] for r in results}),
+        'skipped_conversations': skipped_conversations,
+        'turns': len(results),
+        'errors': sum(1 for r in results if r['status'] != 200),
+        'output_mismatches': len(mismatches),
+        'latency_ms': {
+            'recorded': {f'p{p}': percentile(recorded, p) for p in (50, 95, 99)},
+            'replayed': {f'p{p}': percentile(replayed, p) for p in (50, 95, 99)},
+        },
+        'p50_ms_by_state': {state: {'recorded': percentile(rec, 50), 'replayed': percentile(rep, 50), 'turns': len(rep)}
+                            for state, (rec, rep) in sorted(by_state.items(), key=lambda item: str(item[0]))},
+        'first_mismatches': [{k: r[k] for k in ('conversation', 'state', 'message', 'recorded_digest', 'response_digest')}
+                             for r in mismatches[:10]],
+    }
+
+
+def print_report(report):
+    def fmt(value):
+        return f"{value:9.2f}" if value is not None else f"{'-':>9}"
+
+    print(f"Replayed {report['turns']} turns from {report['conversations']} conversations "
+          f"({report['skipped_conversations']} skipped: recording started mid-conversation); "
+          f"{report['errors']} non-200 responses, {report['output_mismatches']} output mismatches")
+    print(f"{'latency ms':<28}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for label in ('recorded', 'replayed'):
+        row = report['latency_ms'][label]
+        print(f"{label:<28}{fmt(row['p50'])}{fmt(row['p95'])}{fmt(row['p99'])}")
+    print(f"\n{'p50 by state':<28}{'recorded':>9}{'replayed':>9}{'turns':>7}")
+    for state, row in report['p50_ms_by_state'].items():
+        print(f"{str(state):<28}{fmt(row['recorded'])}{fmt(row['replayed'])}{row['turns']:>7}")
+    for r in report['first_mismatches']:
+        print(f"MISMATCH conversation={r['conversation']} state={r['state']} message={r['message']!r}: "
+              f"{r['recorded_digest']} -> {r['response_digest']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded /chat_api conversations and compare latency and output.")
+    parser.add_argument('recordings', nargs='+', help="Recording file(s), including rotated .N backups")
+    parser.add_argument('--target', help="Base URL of a running app (default: import app.py and replay in-process)")
+    parser.add_argument('--speed', type=float, default=1.0, help="Pacing multiplier; 0 disables pacing (default 1.0)")
+    parser.add_argument('--concurrency', type=int, default=16, help="Conversations replayed in parallel (default 16)")
+    parser.add_argument('--limit', type=int, help="Replay at most this many conversations")
+    parser.add_argument('--save', help="Write replayed turns in the recording format (a baseline for the next build)")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args()
+
+    conversations, skipped = group_conversations(load_records(args.recordings))
+    items = sorted(conversations.items(), key=lambda item: item[1][0]['ts'] if item[1] else 0)
+    items = [(conv_id, turns) for conv_id, turns in items if turns][:args.limit]
+    if not items:
+        parser.error("No replayable conversations found in the recording(s).")
+    target = HttpTarget(args.target) if args.target else InProcessTarget()
+
+    t0 = items[0][1][0]['ts']
+    run_tag = f"{int(time.time())}"
+    wall_start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        futures = [pool.submit(replay_conversation, target, conv_id, turns, t0, wall_start, args.speed, run_tag)
+                   for conv_id, turns in items]
+        results = [result for future in futures for result in future.result()]
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            for result in sorted(results, key=lambda r: r['ts']):
+                f.write(json.dumps(result, separators=(',', ':'), ensure_ascii=False) + '\n')
+    report = summarize(results, skipped)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 1 if report['output_mismatches'] or report['errors'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
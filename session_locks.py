@@ -0,0 +1,143 @@
+# session_locks.py
+# Per-user serialization of chat turns for threaded workers. A turn reads the user's session at the start, mutates
+# it (and its nested lists) throughout, and may replace it wholesale on reset; two turns of the same user running
+# at once (a double-submit from the chat UI) would interleave and lose one's updates. Each user_id hashes to one of
+# a fixed set of locks, so a user's turns run one at a time while other users' turns run in parallel, with memory
+# that doesn't grow with the number of users.
+#
+# Usage: python session_locks.py [--threads 1 2 4 8] [--users 100]
+#        # stress test: lost updates and turns/second by thread count, with and without the locks
+import threading
+import time
+import zlib
+
+
+class StripedLocks:
+    """A fixed pool of locks indexed by a stable hash of the key. Two users on the same stripe also wait for each
+    other, so use many more stripes than worker threads."""
+
+    def __init__(self, stripes=256):
+        if stripes < 1:
+            raise ValueError("StripedLocks needs at least one stripe.")
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._stats_lock = threading.Lock()
+        self.stats = {'acquired': 0, 'contended': 0, 'timeouts': 0, 'wait_ms_total': 0.0, 'wait_ms_max': 0.0}
+
+    @property
+    def stripes(self):
+        return len(self._locks)
+
+    def lock_for(self, key):
+        return self._locks[zlib.crc32(str(key).encode('utf-8')) % len(self._locks)]
+
+    def acquire(self, key, timeout=-1):
+        """The key's lock, acquired (release it when done), or None if it wasn't free within `timeout` seconds."""
+        lock = self.lock_for(key)
+        if lock.acquire(blocking=False):
+            with self._stats_lock:
+                self.stats['acquired'] += 1
+            return lock
+        start = time.perf_counter()
+        acquired = lock.acquire(timeout=timeout)
+        waited_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self.stats['contended'] += 1
+            if acquired:
+                self.stats['acquired'] += 1
+                self.stats['wait_ms_total'] += waited_ms
+                self.stats['wait_ms_max'] = max(self.stats['wait_ms_max'], waited_ms)
+            else:
+                self.stats['timeouts'] += 1
+        return lock if acquired else None
+
+    def snapshot(self):
+        with self._stats_lock:
+            return dict(self.stats, stripes=len(self._locks))
+
+
+# --- Stress test: a user's answers double-submitted, with and without the locks ---
+# Every user is in targeted questioning with the same queue of questions, and answers "no" once per question with
+# all the answers in flight at once, as a double-clicking user would. Serialized turns deny each asked symptom once
+# and empty the queue; interleaved turns answer the same question twice and pop a question nobody answered (a lost
+# update to the session's nested lists). Each turn yields for `yield_ms` between reading the question it answers
+# and recording the answer, standing in for the I/O a real turn may wait on there; without it a turn rarely loses the GIL at that point
+# and the race shows up only now and then. Locked runs yield inside the lock, so they pay the same delay.
+def stress(threads_list, n_users, switch_interval, yield_ms=1.0, questions=9):
+    import copy
+    import logging
+    import sys
+    from concurrent.futures import ThreadPoolExecutor
+
+    import app as arogyabot
+
+    arogyabot.app.logger.setLevel(logging.CRITICAL) # Racing runs log an error for each answer to a question already gone
+    arogyabot.ensure_app_data()
+    asked = list(arogyabot.MODEL_KEY_TO_ASK_PHRASE)[:questions]
+    template = copy.deepcopy(arogyabot.reset_session_for_new_query('__stress_template', 'Stress'))
+    arogyabot.user_sessions.pop('__stress_template', None)
+    template.update(state='TARGETED_QUESTIONING', current_targeted_symptom_key=asked[0],
+                    symptoms_targeted_questions_q=asked[1:])
+    expected = sorted(asked)
+    users = [f'__stress_{i}' for i in range(n_users)]
+    tasks = [user for user in users for _ in asked] # Each user's turns back to back: they overlap
+    configured = arogyabot.SESSION_LOCKS
+    stripes = configured.stripes if configured is not None else 256
+    local = threading.local()
+
+    def turn(user_id):
+        if not hasattr(local, 'client'):
+            local.client = arogyabot.app.test_client()
+        local.client.post('/chat_api', json={'user_id': user_id, 'message': 'no'})
+
+    track_symptom_answer = arogyabot.track_symptom_answer
+
+    def yield_then_track(session, symptom_key, present):
+        # Called once the turn has read the question being answered and before it records the answer.
+        time.sleep(yield_ms / 1000)
+        return track_symptom_answer(session, symptom_key, present)
+
+    def run(n_threads, locked):
+        for user_id in users:
+            arogyabot.user_sessions[user_id] = copy.deepcopy(template)
+        arogyabot.SESSION_LOCKS = StripedLocks(stripes) if locked else None
+        start = time.perf_counter()
+        with ThreadPoolExecutor(n_threads) as pool:
+            list(pool.map(turn, tasks))
+        return time.perf_counter() - start
+
+    previous_interval = sys.getswitchinterval()
+    sys.setswitchinterval(switch_interval) # Switch threads often, as a loaded multi-core worker would interleave them
+    arogyabot.track_symptom_answer = yield_then_track
+    print(f"{len(users)} users x {len(asked)} concurrent answers; switch interval {switch_interval * 1e6:.0f}us, "
+          f"{yield_ms:g}ms yield between a turn's read of the question and its answer")
+    print(f"{'threads':>8}{'locks':>7}{'turns/s':>10}{'lost users':>12}{'dup answers':>13}{'lock waits':>12}")
+    try:
+        run(1, False) # Untimed: first-request costs (test clients, caches) would otherwise land on the first row
+        for n_threads in threads_list:
+            for locked in (True, False):
+                elapsed = run(n_threads, locked)
+                sessions = [arogyabot.user_sessions[user_id] for user_id in users]
+                lost = sum(sorted(set(session['symptoms_denied'])) != expected or bool(session['symptoms_targeted_questions_q'])
+                           for session in sessions)
+                # A question answered twice leaves the denied list short of the questions that were queued.
+                duplicates = sum(len(asked) - len(set(session['symptoms_denied'])) for session in sessions)
+                waits = arogyabot.SESSION_LOCKS.snapshot()['contended'] if locked else 0
+                print(f"{n_threads:>8}{'on' if locked else 'off':>7}{len(tasks) / elapsed:>10.0f}{lost:>12}{duplicates:>13}{waits:>12}")
+    finally:
+        sys.setswitchinterval(previous_interval)
+        arogyabot.track_symptom_answer = track_symptom_answer
+        arogyabot.SESSION_LOCKS = configured
+        for user_id in users:
+            arogyabot.user_sessions.pop(user_id, None)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Concurrent same-user turns with and without per-user session locks.")
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--switch-interval', type=float, default=1e-5, help="sys.setswitchinterval during the runs")
+    parser.add_argument('--yield-ms', type=float, default=1.0, help="Pause between reading the question and recording the answer")
+    args = parser.parse_args()
+    stress(args.threads, args.users, args.switch_interval, args.yield_ms)
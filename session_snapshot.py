@@ -0,0 +1,389 @@
+# session_snapshot.py
+# Periodic on-disk snapshot of the in-memory `user_sessions`, so a worker restart (deploy, crash, the dev reloader)
+# doesn't send every in-flight conversation back to AWAITING_NAME. Sessions are packed with the session token codec
+# on the request path (a few microseconds), and a background thread appends the sessions that changed to a journal
+# next to the snapshot. Once the journal has grown to half the snapshot's size, the two are compacted into a new
+# snapshot, copying unchanged records byte-for-byte from the previous file. The snapshot carries an open-addressing
+# hash index, so on startup it is only mmap-ed (and the short journal read); a session is decoded the first time its
+# user_id shows up again.
+#
+# Usage: python session_snapshot.py [--sessions 1000 10000 100000]   # write/update/open/restore cost by snapshot size
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+
+from session_token import HEADER as TOKEN_HEADER, SessionTokenError
+
+SNAPSHOT_MAGIC = b'ABSS'
+SNAPSHOT_FORMAT_VERSION = 2 # v2 holds v4 session payloads; older files are ignored
+# magic, format version, key schema crc32, slots, records, written_at
+FILE_HEADER = struct.Struct('>4sBIIII')
+SLOT = struct.Struct('>QQ') # user_id hash (0 = empty), record offset
+RECORD_HEADER = struct.Struct('>HI') # user_id bytes, packed session bytes
+# The journal is its magic, format version and key schema crc32, then RECORD_HEADER entries in write order. An entry
+# with JOURNAL_DROPPED as its payload length (and no payload) records a dropped session.
+JOURNAL_MAGIC = b'ABSJ'
+JOURNAL_HEADER = struct.Struct('>4sBI')
+JOURNAL_DROPPED = 0xFFFFFFFF
+JOURNAL_COMPACT_MIN_BYTES = 256 * 1024 # Below this the journal is never compacted into the snapshot
+
+
+def _user_hash(user_id):
+    return int.from_bytes(hashlib.blake2b(user_id, digest_size=8).digest(), 'big') or 1
+
+
+class SnapshotFile:
+    """Read-only view of a snapshot written by write_snapshot(). Opening it costs the same for 10 sessions or 1M."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, self.schema_crc, self.n_slots, self.n_records, self.written_at = FILE_HEADER.unpack_from(self._mm, 0)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_FORMAT_VERSION:
+                raise ValueError(f"{path} is not a format {SNAPSHOT_FORMAT_VERSION} session snapshot.")
+            if self.n_slots & (self.n_slots - 1) or len(self._mm) < FILE_HEADER.size + self.n_slots * SLOT.size:
+                raise ValueError(f"Session snapshot {path} is truncated or corrupt.")
+        except (struct.error, ValueError):
+            self._mm.close()
+            raise
+
+    def close(self):
+        self._mm.close()
+
+    def _record(self, offset):
+        uid_len, payload_len = RECORD_HEADER.unpack_from(self._mm, offset)
+        start = offset + RECORD_HEADER.size
+        return self._mm[start:start + uid_len], self._mm[start + uid_len:start + uid_len + payload_len]
+
+    def get(self, user_id):
+        """Packed session bytes for user_id, or None. Probes the hash index; reads only the matching record."""
+        key = user_id.encode('utf-8')
+        target, mask = _user_hash(key), self.n_slots - 1
+        slot = target & mask
+        for _ in range(self.n_slots):
+            slot_hash, offset = SLOT.unpack_from(self._mm, FILE_HEADER.size + slot * SLOT.size)
+            if slot_hash == 0:
+                return None
+            if slot_hash == target:
+                uid, payload = self._record(offset)
+                if uid == key:
+                    return payload
+            slot = (slot + 1) & mask
+        return None
+
+    def items(self):
+        """(user_id bytes, packed session bytes) for every record; a full scan, for the background writer."""
+        for slot in range(self.n_slots):
+            slot_hash, offset = SLOT.unpack_from(self._mm, FILE_HEADER.size + slot * SLOT.size)
+            if slot_hash:
+                yield self._record(offset)
+
+
+def write_snapshot(path, records, schema_crc):
+    """Atomically write {user_id bytes: packed session bytes} with its hash index (load factor <= 0.5)."""
+    n_slots = 8
+    while n_slots < 2 * len(records):
+        n_slots *= 2
+    slots = [(0, 0)] * n_slots
+    body, offset = [], FILE_HEADER.size + n_slots * SLOT.size
+    for uid, payload in records.items():
+        user_hash = _user_hash(uid)
+        slot = user_hash & (n_slots - 1)
+        while slots[slot][0]:
+            slot = (slot + 1) & (n_slots - 1)
+        slots[slot] = (user_hash, offset)
+        body.append(RECORD_HEADER.pack(len(uid), len(payload)) + uid + payload)
+        offset += len(body[-1])
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(FILE_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, schema_crc, n_slots, len(records), int(time.time())))
+        f.write(b''.join(SLOT.pack(*entry) for entry in slots))
+        f.write(b''.join(body))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return offset
+
+
+def read_journal(path, schema_crc):
+    """({user_id bytes: packed session or None}, valid bytes) from a journal, the last entry per user winning.
+    A torn entry at the end (a crash mid-append) is ignored; a journal for another schema reads as empty."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return {}, 0
+    try:
+        magic, version, crc = JOURNAL_HEADER.unpack_from(data, 0)
+    except struct.error:
+        return {}, 0
+    if magic != JOURNAL_MAGIC or version != SNAPSHOT_FORMAT_VERSION or crc != schema_crc:
+        return {}, 0
+    entries, offset = {}, JOURNAL_HEADER.size
+    while offset + RECORD_HEADER.size <= len(data):
+        uid_len, payload_len = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        end = start + uid_len + (0 if payload_len == JOURNAL_DROPPED else payload_len)
+        if end > len(data):
+            break
+        entries[data[start:start + uid_len]] = None if payload_len == JOURNAL_DROPPED else data[start + uid_len:end]
+        offset = end
+    return entries, offset
+
+
+def reset_journal(path, schema_crc):
+    """Atomically replace the journal with an empty one. Returns its size."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(JOURNAL_HEADER.pack(JOURNAL_MAGIC, SNAPSHOT_FORMAT_VERSION, schema_crc))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return JOURNAL_HEADER.size
+
+
+class SessionSnapshotStore:
+    """Lazily restores sessions from the last snapshot and its journal, and keeps both up to date from a background
+    writer thread.
+
+    record()/forget() are called on the request path and only pack the session and queue it. Every `interval`
+    seconds, if anything was queued, the writer appends the queue to the journal. When the journal reaches half the
+    snapshot's size (and at least JOURNAL_COMPACT_MIN_BYTES), the snapshot's records, the journal's and the queue
+    are merged (expired ones are dropped) into a new snapshot, which is swapped in before the journal is emptied. A
+    crash between the two only replays entries the new snapshot already holds."""
+
+    def __init__(self, path, codec, interval_seconds=5.0, logger=None):
+        self.path = path
+        self.journal_path = path + '.journal'
+        self.codec = codec
+        self.interval = interval_seconds
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._pending = {} # user_id bytes -> packed session, or None when the session was dropped
+        self._journal = {} # Same, for what was appended to the journal since the snapshot was written
+        self._journal_bytes = 0 # Valid bytes in the journal file; 0 when it has to be (re)created
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.stats = {'restored': 0, 'restore_misses': 0, 'writes': 0, 'appends': 0, 'compactions': 0, 'failures': 0,
+                      'last_write_ms': None, 'sessions': 0, 'bytes': 0, 'journal_bytes': 0}
+        self._snapshot = None
+        if os.path.exists(path):
+            try:
+                self._snapshot = SnapshotFile(path)
+            except (OSError, ValueError, struct.error):
+                self._snapshot = None # Unreadable: start fresh; the next write replaces it
+            if self._snapshot is not None and self._snapshot.schema_crc != codec.schema_crc:
+                self._snapshot.close() # Saved against a different symptom vocabulary
+                self._snapshot = None
+        self._journal, self._journal_bytes = read_journal(self.journal_path, codec.schema_crc)
+        self.stats.update(sessions=self.available, journal_bytes=self._journal_bytes,
+                          bytes=os.path.getsize(path) if self._snapshot is not None else 0)
+
+    @property
+    def available(self):
+        """Sessions in the snapshot and journal on disk (restored or not)."""
+        count = self._snapshot.n_records if self._snapshot is not None else 0
+        for uid, payload in self._journal.items():
+            count += (payload is not None) - self._in_snapshot(uid)
+        return count
+
+    def _in_snapshot(self, uid):
+        return self._snapshot is not None and self._snapshot.get(uid.decode('utf-8', errors='replace')) is not None
+
+    def restore(self, user_id):
+        """The session saved for user_id, or None if there is none (or it expired / doesn't decode)."""
+        key = str(user_id).encode('utf-8')
+        with self._lock:
+            if key in self._pending:
+                return None # Queued changes are newer than the files, and a queued None means it was dropped
+            if key in self._journal:
+                payload = self._journal[key]
+            elif self._snapshot is not None:
+                payload = self._snapshot.get(str(user_id))
+            else:
+                payload = None
+        if payload is None:
+            return None
+        try:
+            session = self.codec.unpack(payload)
+        except SessionTokenError:
+            self.stats['restore_misses'] += 1
+            return None
+        self.stats['restored'] += 1
+        return session
+
+    def record(self, user_id, session):
+        key = self._key(user_id)
+        payload = self.codec.pack(session)
+        with self._lock:
+            self._pending[key] = payload
+
+    def forget(self, user_id):
+        key = self._key(user_id)
+        with self._lock:
+            self._pending[key] = None
+
+    @staticmethod
+    def _key(user_id):
+        # A record stores the user_id length in 16 bits; a longer id would make every later write fail.
+        key = str(user_id).encode('utf-8')
+        if len(key) > 0xFFFF:
+            raise ValueError(f"user_id is {len(key)} bytes; session snapshots store at most 65535.")
+        return key
+
+    # --- Background writer ---
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='arogyabot-session-snapshot', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the writer and write whatever is still queued (e.g. from an atexit hook)."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        self.flush()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if not self._stopped.is_set():
+                self.flush()
+
+    def flush(self):
+        """Append whatever was queued since the last flush to the journal, then compact the journal into a new
+        snapshot once it has grown large enough. Returns True when a file was written. A failed write (e.g. a full
+        disk) is logged and the queue kept, so the next flush retries it."""
+        try:
+            return self._flush()
+        except Exception as e:
+            self.stats['failures'] += 1
+            if self.logger is not None:
+                self.logger.error(f"Session snapshot write to {self.path} failed: {e}")
+            return False
+
+    def _flush(self):
+        start = time.perf_counter()
+        with self._lock:
+            if not self._pending:
+                return False
+            pending = dict(self._pending)
+        self._append(pending)
+        snapshot_bytes = os.path.getsize(self.path) if self._snapshot is not None else 0
+        compact = self._journal_bytes >= max(JOURNAL_COMPACT_MIN_BYTES, snapshot_bytes // 2)
+        if compact:
+            snapshot_bytes = self._compact()
+        self.stats.update(writes=self.stats['writes'] + 1, bytes=snapshot_bytes, journal_bytes=self._journal_bytes,
+                          last_write_ms=round((time.perf_counter() - start) * 1000, 3))
+        self.stats['compactions' if compact else 'appends'] += 1
+        return True
+
+    def _append(self, pending):
+        if not self._journal_bytes: # Missing, unreadable or for another schema: start a new one
+            self._journal_bytes = reset_journal(self.journal_path, self.codec.schema_crc)
+        appended = b''.join(RECORD_HEADER.pack(len(uid), JOURNAL_DROPPED if payload is None else len(payload))
+                            + uid + (payload or b'') for uid, payload in pending.items())
+        with open(self.journal_path, 'r+b') as f:
+            f.truncate(self._journal_bytes) # Drops a torn entry left by a crash mid-append
+            f.seek(self._journal_bytes)
+            f.write(appended)
+            f.flush()
+            os.fsync(f.fileno())
+        with self._lock:
+            for uid, payload in pending.items():
+                if self._pending.get(uid, payload) is payload: # Not re-queued while the file was being written
+                    self._pending.pop(uid, None)
+                saved = self._journal[uid] is not None if uid in self._journal else self._in_snapshot(uid)
+                self.stats['sessions'] += (payload is not None) - saved
+                self._journal[uid] = payload
+            self._journal_bytes += len(appended)
+
+    def _compact(self):
+        # Everything the new snapshot holds is already in the journal, so replaying the journal over it (after a
+        # crash before the journal is emptied) changes nothing.
+        with self._lock:
+            previous, journal = self._snapshot, dict(self._journal)
+        cutoff = time.time() - self.codec.ttl_seconds if self.codec.ttl_seconds else 0
+        records = {}
+        if previous is not None:
+            records.update((uid, payload) for uid, payload in previous.items() if uid not in journal)
+        records.update((uid, payload) for uid, payload in journal.items() if payload is not None)
+        records = {uid: payload for uid, payload in records.items() if TOKEN_HEADER.unpack_from(payload, 0)[5] >= cutoff}
+        size = write_snapshot(self.path, records, self.codec.schema_crc)
+        snapshot = SnapshotFile(self.path)
+        journal_bytes = reset_journal(self.journal_path, self.codec.schema_crc)
+        with self._lock:
+            self._snapshot, self._journal, self._journal_bytes = snapshot, {}, journal_bytes
+            if previous is not None:
+                previous.close()
+        self.stats['sessions'] = len(records)
+        return size
+
+
+# --- Benchmark: snapshot write, one-session update, open and single-session restore cost by number of sessions ---
+def benchmark(symptom_keys, sizes=(1000, 10000, 100000), directory=None):
+    import random
+    import tempfile
+
+    from session_token import SessionTokenCodec
+
+    codec = SessionTokenCodec(os.urandom(32), symptom_keys)
+    rng = random.Random(42)
+    directory = directory or tempfile.mkdtemp(prefix='arogyabot-snapshot-')
+    print(f"{'sessions':>10}{'file KiB':>12}{'write ms':>12}{'update ms':>11}{'open ms':>10}{'restore us':>12}")
+    for n in sizes:
+        path = os.path.join(directory, f'sessions-{n}.snapshot')
+        store = SessionSnapshotStore(path, codec)
+        sessions = []
+        for i in range(n):
+            confirmed = rng.sample(symptom_keys, 4)
+            sessions.append({
+                'state': 'TARGETED_QUESTIONING', 'user_name': f'User {i}',
+                'symptoms_vector': {key: int(key in confirmed) for key in symptom_keys}, 'symptoms_confirmed_count': 4,
+                'symptoms_targeted_questions_q': rng.sample(symptom_keys, 2), 'age': 30, 'sex': 'Female',
+            })
+            store.record(f'user-{i}', sessions[-1])
+        start = time.perf_counter()
+        store.flush()
+        write_ms = (time.perf_counter() - start) * 1000
+        updates = 20 # One turn of one user per flush: appended to the journal
+        start = time.perf_counter()
+        for _ in range(updates):
+            i = rng.randrange(n)
+            store.record(f'user-{i}', dict(sessions[i], age=rng.randrange(1, 100)))
+            store.flush()
+        update_ms = (time.perf_counter() - start) * 1000 / updates
+        start = time.perf_counter()
+        reopened = SessionSnapshotStore(path, codec)
+        open_ms = (time.perf_counter() - start) * 1000
+        probes = [f'user-{rng.randrange(n)}' for _ in range(2000)]
+        start = time.perf_counter()
+        assert all(reopened.restore(user_id) is not None for user_id in probes)
+        restore_us = (time.perf_counter() - start) / len(probes) * 1e6
+        file_bytes = sum(os.path.getsize(file_path) for file_path in (path, store.journal_path) if os.path.exists(file_path))
+        print(f"{n:>10}{file_bytes / 1024:>12.0f}{write_ms:>12.1f}{update_ms:>11.2f}{open_ms:>10.3f}{restore_us:>12.1f}")
+        for file_path in (path, store.journal_path):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+
+if __name__ == '__main__':
+    import argparse
+    import pickle
+
+    parser = argparse.ArgumentParser(description="Session snapshot write/open/restore cost by snapshot size.")
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1000, 10000, 100000])
+    args = parser.parse_args()
+    base_dir = os.path.abspath(os.path.dirname(__file__))
+    with open(os.path.join(base_dir, 'models', 'symptom_columns.pkl'), 'rb') as f:
+        keys = [key.strip().lower().replace(' ', '_') for key in pickle.load(f)]
+    benchmark(keys, args.sessions)
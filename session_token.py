@@ -0,0 +1,240 @@
+# session_token.py
+# Compact, signed, versioned encoding of a chat session so /chat_api can run without server-side session storage.
+import base64
+import hashlib
+import hmac
+import os
+import struct
+import time
+import zlib
+
+# v2 added the denied-symptoms bitset, v3 the paged doctor search results, v4 signs the user_id with the payload.
+# Tokens before v4 were signed without it and no longer verify, so only v4 decodes.
+TOKEN_VERSION = 4
+SUPPORTED_TOKEN_VERSIONS = (4,)
+
+# Order is part of the wire format: only ever APPEND new states, never reorder or remove.
+CONVERSATION_STATES = (
+    'AWAITING_NAME', 'AWAITING_INITIAL_SYMPTOMS', 'CLARIFYING_SYMPTOMS', 'TARGETED_QUESTIONING',
+    'AWAITING_AGE', 'AWAITING_SEX', 'READY_TO_PREDICT', 'AWAITING_DOCTOR_CONFIRMATION',
+)
+SEX_VALUES = (None, 'Male', 'Female', 'Other', 'Prefer not to say')
+
+NO_KEY = 0xFFFF # Marker for "no current clarifying/targeted symptom"
+SIGNATURE_BYTES = 16 # Truncated HMAC-SHA256
+# version, state, age, sex, confirmed_count, issued_at, key schema crc32
+HEADER = struct.Struct('>BBBBBII')
+
+
+class SessionTokenError(ValueError):
+    pass
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+class SessionTokenCodec:
+    def __init__(self, secret, symptom_keys, ttl_seconds=24 * 3600):
+        if isinstance(secret, str):
+            secret = secret.encode('utf-8')
+        if not secret:
+            raise ValueError("SessionTokenCodec needs a non-empty secret.")
+        self.secret = secret
+        self.symptom_keys = list(symptom_keys)
+        self.key_index = {key: i for i, key in enumerate(self.symptom_keys)}
+        self.ttl_seconds = ttl_seconds
+        # A token minted against a different symptom vocabulary (e.g. after a model swap) must not be decoded.
+        self.schema_crc = zlib.crc32('\n'.join(self.symptom_keys).encode('utf-8'))
+        self.state_index = {state: i for i, state in enumerate(CONVERSATION_STATES)}
+        self.sex_index = {sex: i for i, sex in enumerate(SEX_VALUES)}
+
+    # --- Packing helpers ---
+    def _pack_bitset(self, symptoms_vector):
+        bits = bytearray((len(self.symptom_keys) + 7) // 8)
+        for key, value in symptoms_vector.items():
+            if value == 1 and key in self.key_index:
+                i = self.key_index[key]
+                bits[i >> 3] |= 1 << (i & 7)
+        return bytes(bits)
+
+    def _unpack_bitset(self, bits):
+        return {key: (bits[i >> 3] >> (i & 7)) & 1 for i, key in enumerate(self.symptom_keys)}
+
+    def _pack_keys(self, keys):
+        idx = [self.key_index[k] for k in keys if k in self.key_index][:255]
+        return struct.pack(f'>B{len(idx)}H', len(idx), *idx)
+
+    def _unpack_keys(self, raw, offset):
+        (count,) = struct.unpack_from('>B', raw, offset)
+        idx = struct.unpack_from(f'>{count}H', raw, offset + 1)
+        return [self.symptom_keys[i] for i in idx], offset + 1 + 2 * count
+
+    def _pack_text(self, text):
+        data = (text or '').encode('utf-8')[:255]
+        return struct.pack('>B', len(data)) + data
+
+    def _unpack_text(self, raw, offset):
+        (length,) = struct.unpack_from('>B', raw, offset)
+        text = raw[offset + 1:offset + 1 + length].decode('utf-8', errors='ignore')
+        return (text or None), offset + 1 + length
+
+    def _pack_doctor_results(self, results):
+        if not results:
+            return struct.pack('>B', 0)
+        ids = results['ids'][:255]
+        return (struct.pack(f'>BBI{len(ids)}I', len(ids), min(results['cursor'], len(ids)), int(results['expires_at']), *ids)
+                + self._pack_text(results.get('speciality')))
+
+    def _unpack_doctor_results(self, raw, offset):
+        (count,) = struct.unpack_from('>B', raw, offset)
+        if not count:
+            return None, offset + 1
+        cursor, expires_at, *ids = struct.unpack_from(f'>BI{count}I', raw, offset + 1)
+        speciality, offset = self._unpack_text(raw, offset + 6 + 4 * count)
+        return {'ids': ids, 'cursor': cursor, 'speciality': speciality, 'expires_at': expires_at}, offset
+
+    def pack(self, session, issued_at=None):
+        """Serialize a session dict to unsigned bytes."""
+        age = session.get('age')
+        header = HEADER.pack(
+            TOKEN_VERSION,
+            self.state_index.get(session.get('state'), 0),
+            age if isinstance(age, int) and 0 < age < 256 else 0,
+            self.sex_index.get(session.get('sex'), 0),
+            min(session.get('symptoms_confirmed_count', 0), 255),
+            int(issued_at if issued_at is not None else time.time()),
+            self.schema_crc,
+        )
+        current = [self.key_index.get(session.get(k), NO_KEY) for k in ('current_clarifying_symptom_key', 'current_targeted_symptom_key')]
+        return b''.join([
+            header,
+            self._pack_bitset(session.get('symptoms_vector', {})),
+            self._pack_bitset(dict.fromkeys(session.get('symptoms_denied', []), 1)),
+            self._pack_keys(session.get('symptoms_pending_clarification', [])),
+            self._pack_keys(session.get('symptoms_targeted_questions_q', [])),
+            struct.pack('>HH', *current),
+            self._pack_text(session.get('user_name')),
+            self._pack_text(session.get('predicted_disease_context')),
+            self._pack_doctor_results(session.get('doctor_results')),
+        ])
+
+    def unpack(self, raw, check_expiry=True):
+        """Inverse of pack(). Raises SessionTokenError on a malformed or stale payload."""
+        try:
+            version, state_i, age, sex_i, confirmed, issued_at, schema_crc = HEADER.unpack_from(raw, 0)
+            if version not in SUPPORTED_TOKEN_VERSIONS:
+                raise SessionTokenError(f"Unsupported session token version {version}.")
+            if schema_crc != self.schema_crc:
+                raise SessionTokenError("Session token was issued for a different symptom vocabulary.")
+            if check_expiry and self.ttl_seconds and time.time() - issued_at > self.ttl_seconds:
+                raise SessionTokenError("Session token has expired.")
+            offset = HEADER.size
+            n_bits = (len(self.symptom_keys) + 7) // 8
+            symptoms_vector = self._unpack_bitset(raw[offset:offset + n_bits])
+            offset += n_bits
+            symptoms_denied = [key for key, bit in self._unpack_bitset(raw[offset:offset + n_bits]).items() if bit]
+            offset += n_bits
+            pending, offset = self._unpack_keys(raw, offset)
+            targeted, offset = self._unpack_keys(raw, offset)
+            current_clarifying, current_targeted = struct.unpack_from('>HH', raw, offset)
+            offset += 4
+            user_name, offset = self._unpack_text(raw, offset)
+            predicted, offset = self._unpack_text(raw, offset)
+            doctor_results, offset = self._unpack_doctor_results(raw, offset)
+            state = CONVERSATION_STATES[state_i]
+            sex = SEX_VALUES[sex_i]
+        except SessionTokenError:
+            raise
+        except (struct.error, IndexError, ValueError) as e:
+            raise SessionTokenError(f"Malformed session token: {e}") from e
+
+        return {
+            'state': state, 'user_name': user_name,
+            'symptoms_vector': symptoms_vector,
+            'symptoms_confirmed_count': confirmed,
+            'symptoms_pending_clarification': pending,
+            'current_clarifying_symptom_key': self.symptom_keys[current_clarifying] if current_clarifying != NO_KEY else None,
+            'symptoms_targeted_questions_q': targeted,
+            'current_targeted_symptom_key': self.symptom_keys[current_targeted] if current_targeted != NO_KEY else None,
+            'age': age or None, 'sex': sex, 'predicted_disease_context': predicted,
+            'symptoms_denied': symptoms_denied, 'posterior_log': None, 'early_stopped': False,
+            'doctor_results': doctor_results,
+        }
+
+    # --- Signed token ---
+    def _sign(self, raw, user_id):
+        # The user id is signed with the payload, so a token only decodes for the user it was issued to.
+        uid = str(user_id).encode('utf-8')
+        return hmac.new(self.secret, struct.pack('>I', len(uid)) + uid + raw, hashlib.sha256).digest()[:SIGNATURE_BYTES]
+
+    def encode(self, session, user_id):
+        raw = self.pack(session)
+        return _b64encode(raw + self._sign(raw, user_id))
+
+    def decode(self, token, user_id):
+        try:
+            blob = _b64decode(token)
+        except (ValueError, TypeError) as e:
+            raise SessionTokenError(f"Session token is not valid base64: {e}") from e
+        if len(blob) <= HEADER.size + SIGNATURE_BYTES:
+            raise SessionTokenError("Session token is too short.")
+        raw, signature = blob[:-SIGNATURE_BYTES], blob[-SIGNATURE_BYTES:]
+        if not hmac.compare_digest(signature, self._sign(raw, user_id)):
+            raise SessionTokenError("Session token signature mismatch (or it was issued to another user).")
+        return self.unpack(raw)
+
+
+# --- Benchmark: token encode/decode cost and size vs. the in-memory dict state ---
+def benchmark(symptom_keys, iterations=20000):
+    import json
+    import pickle
+    import random
+
+    codec = SessionTokenCodec(os.urandom(32), symptom_keys)
+    rng = random.Random(42)
+    confirmed = rng.sample(symptom_keys, 4)
+    session = {
+        'state': 'TARGETED_QUESTIONING', 'user_name': 'Rahim',
+        'symptoms_vector': {key: int(key in confirmed) for key in symptom_keys},
+        'symptoms_confirmed_count': len(confirmed),
+        'symptoms_pending_clarification': rng.sample(symptom_keys, 2), 'current_clarifying_symptom_key': None,
+        'symptoms_targeted_questions_q': rng.sample(symptom_keys, 2), 'current_targeted_symptom_key': symptom_keys[0],
+        'age': 34, 'sex': 'Female', 'predicted_disease_context': None,
+        'symptoms_denied': [key for key in symptom_keys[1:3] if key not in confirmed], 'posterior_log': None, 'early_stopped': False,
+        'doctor_results': {'ids': rng.sample(range(1000), 30), 'cursor': 3, 'speciality': 'Dermatologist',
+                           'expires_at': int(time.time()) + 1800},
+    }
+
+    def timed(fn):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        return (time.perf_counter() - start) / iterations * 1e6
+
+    token = codec.encode(session, 'benchmark-user')
+    assert codec.decode(token, 'benchmark-user') == session, "Token round-trip changed the session."
+    as_json = json.dumps(session)
+    as_pickle = pickle.dumps(session, protocol=pickle.HIGHEST_PROTOCOL)
+    rows = [
+        ("signed token", len(token), timed(lambda: codec.encode(session, 'benchmark-user')),
+         timed(lambda: codec.decode(token, 'benchmark-user'))),
+        ("dict -> json", len(as_json), timed(lambda: json.dumps(session)), timed(lambda: json.loads(as_json))),
+        ("dict -> pickle", len(as_pickle), timed(lambda: pickle.dumps(session, protocol=pickle.HIGHEST_PROTOCOL)), timed(lambda: pickle.loads(as_pickle))),
+    ]
+    print(f"{len(symptom_keys)} symptom keys, {iterations} iterations each")
+    print(f"{'format':<16}{'bytes':>8}{'encode us':>12}{'decode us':>12}")
+    for name, size, enc_us, dec_us in rows:
+        print(f"{name:<16}{size:>8}{enc_us:>12.2f}{dec_us:>12.2f}")
+    return rows
+
+
+if __name__ == '__main__':
+    import pickle
+    base_dir = os.path.abspath(os.path.dirname(__file__))
+    with open(os.path.join(base_dir, 'models', 'symptom_columns.pkl'), 'rb') as f:
+        keys = [key.strip().lower().replace(' ', '_') for key in pickle.load(f)]
+    benchmark(keys)
@@ -0,0 +1,172 @@
+# shadow_model.py
+# Shadow evaluation of a candidate model on live traffic. Each prediction's symptom vector is handed to a
+# background worker (bounded queue, never blocks the request), which scores it with the candidate and compares the
+# result with what the primary model returned: agreement rate, probability divergence and inference latency.
+# Shadow work is dropped, not queued, when the queue is full, the host is busy or an item has waited too long.
+# The candidate's latency is also checked against a per-prediction budget, so a slower model shows up before a swap.
+import os
+import pickle
+import queue
+import threading
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+LATENCY_WINDOW = 2000 # Recent latencies kept per model for the percentiles
+
+
+def load_candidate_model(path):
+    """A candidate from either an sklearn pickle or a compact-forest artifact (see forest_compression.py)."""
+    with open(path, 'rb') as f:
+        candidate = pickle.load(f)
+    if isinstance(candidate, dict) and 'forest' in candidate:
+        from forest_compression import load_compact_model
+        candidate = load_compact_model(path)['forest']
+    if not hasattr(candidate, 'predict_proba') or not hasattr(candidate, 'classes_'):
+        raise ValueError(f"{path} does not hold a classifier with predict_proba/classes_.")
+    return candidate
+
+
+def _percentile(values, q):
+    return round(float(np.percentile(values, q)), 3) if values else None
+
+
+class ShadowEvaluator:
+    """Scores (row, primary probabilities) pairs with `candidate` on one daemon thread and aggregates the comparison.
+
+    submit() costs a queue put and returns False (counting the reason) instead of waiting. The host counts as busy
+    when the 1-minute load average per CPU is above `max_load_per_cpu`, or when `is_busy()` says so (e.g. requests
+    are queueing in admission control)."""
+
+    def __init__(self, candidate, max_queue=64, max_wait_seconds=1.0, max_load_per_cpu=0.8, latency_budget_ms=None,
+                 is_busy=None, name='candidate'):
+        self.candidate = candidate
+        self.name = name
+        # An sklearn forest fitted on a DataFrame is scored on one, with its own column names.
+        self.feature_names = list(getattr(candidate, 'feature_names_in_', [])) or None
+        self.max_wait = max_wait_seconds
+        self.max_load_per_cpu = max_load_per_cpu
+        self.latency_budget_ms = latency_budget_ms
+        self.is_busy = is_busy
+        self._cpus = os.cpu_count() or 1
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._reset_locked()
+
+    def _reset_locked(self):
+        self.submitted = 0
+        self.dropped = Counter() # reason -> count
+        self.compared = 0
+        self.agreed = 0
+        self.errors = 0
+        self.over_budget = 0 # Candidate predictions slower than latency_budget_ms
+        self.divergence_sum = 0.0 # Total variation distance between the two distributions, summed
+        self.divergence_max = 0.0
+        self.disagreements = Counter() # (primary class, candidate class) -> count
+        self.latency_ms = {'primary': deque(maxlen=LATENCY_WINDOW), 'candidate': deque(maxlen=LATENCY_WINDOW)}
+        self.started_at = time.time()
+
+    def reset(self):
+        with self._lock:
+            self._reset_locked()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='arogyabot-shadow', daemon=True)
+            self._thread.start()
+        return self
+
+    def host_busy(self):
+        if self.is_busy is not None and self.is_busy():
+            return True
+        try:
+            return os.getloadavg()[0] / self._cpus > self.max_load_per_cpu
+        except (AttributeError, OSError): # No load average on this platform
+            return False
+
+    def submit(self, row, primary_classes, primary_proba, primary_ms):
+        """Queue one comparison; row is the model input as a 1-D float array. Returns whether it was queued."""
+        with self._lock:
+            self.submitted += 1
+        reason = None
+        if self.host_busy():
+            reason = 'busy'
+        else:
+            try:
+                self._queue.put_nowait((time.perf_counter(), row, primary_classes, primary_proba, primary_ms))
+            except queue.Full:
+                reason = 'queue_full'
+        if reason:
+            with self._lock:
+                self.dropped[reason] += 1
+            return False
+        return True
+
+    def _run(self):
+        while True:
+            queued_at, row, primary_classes, primary_proba, primary_ms = self._queue.get()
+            try:
+                if time.perf_counter() - queued_at > self.max_wait:
+                    with self._lock:
+                        self.dropped['stale'] += 1
+                else:
+                    self._compare(row, primary_classes, primary_proba, primary_ms)
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+            finally:
+                self._queue.task_done()
+
+    def _score(self, row):
+        X = np.asarray(row, dtype=np.float32).reshape(1, -1)
+        if self.feature_names is not None:
+            import pandas as pd
+            X = pd.DataFrame(X, columns=self.feature_names)
+        start = time.perf_counter()
+        proba = self.candidate.predict_proba(X)[0]
+        return proba, (time.perf_counter() - start) * 1000
+
+    def _compare(self, row, primary_classes, primary_proba, primary_ms):
+        candidate_proba, candidate_ms = self._score(row)
+        # Compare by class name: a candidate may know a different set (or order) of diseases.
+        primary = dict(zip(primary_classes, np.asarray(primary_proba, dtype=np.float64)))
+        candidate = dict(zip(self.candidate.classes_, np.asarray(candidate_proba, dtype=np.float64)))
+        divergence = 0.5 * sum(abs(primary.get(c, 0.0) - candidate.get(c, 0.0)) for c in primary.keys() | candidate.keys())
+        primary_top, candidate_top = max(primary, key=primary.get), max(candidate, key=candidate.get)
+        with self._lock:
+            self.compared += 1
+            self.agreed += primary_top == candidate_top
+            if primary_top != candidate_top:
+                self.disagreements[(primary_top, candidate_top)] += 1
+            self.divergence_sum += divergence
+            self.divergence_max = max(self.divergence_max, divergence)
+            self.latency_ms['primary'].append(primary_ms)
+            self.latency_ms['candidate'].append(candidate_ms)
+            if self.latency_budget_ms and candidate_ms > self.latency_budget_ms:
+                self.over_budget += 1
+
+    def drain(self, timeout=10.0):
+        """Wait until the queue is empty (for scripts and tests)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    # --- Report ---
+    def summary(self, top_disagreements=10):
+        with self._lock:
+            latency = {model: {'p50': _percentile(list(values), 50), 'p95': _percentile(list(values), 95),
+                               'mean': round(float(np.mean(values)), 3) if values else None}
+                       for model, values in self.latency_ms.items()}
+            return {
+                'candidate': self.name, 'since': self.started_at,
+                'submitted': self.submitted, 'compared': self.compared, 'errors': self.errors,
+                'dropped': dict(self.dropped), 'queue_depth': self._queue.qsize(),
+                'agreement_rate': round(self.agreed / self.compared, 4) if self.compared else None,
+                'divergence': {'mean_tv': round(self.divergence_sum / self.compared, 4) if self.compared else None,
+                               'max_tv': round(self.divergence_max, 4)},
+                'latency_ms': latency, 'latency_budget_ms': self.latency_budget_ms, 'over_budget': self.over_budget,
+                'top_disagreements': [{'primary': p, 'candidate': c, 'count': n}
+                                      for (p, c), n in self.disagreements.most_common(top_disagreements)],
+            }
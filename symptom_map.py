@@ -0,0 +1,260 @@
+# symptom_map.py
+# Natural-language symptom phrases -> model feature keys, plus the build step that validates the map against the
+# trained model once and writes a compiled artifact that app.py workers load directly.
+#
+# Build: python symptom_map.py   (exits non-zero if any map entry does not match the model's feature list)
+import hashlib
+import os
+import pickle
+import sys
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+MODEL_DIR = os.path.join(BASE_DIR, 'models')
+MODEL_PATH = os.path.join(MODEL_DIR, 'disease_prediction_model.pkl')
+SYMPTOM_COLUMNS_PATH = os.path.join(MODEL_DIR, 'symptom_columns.pkl')
+COMPILED_SYMPTOM_MAP_PATH = os.path.join(MODEL_DIR, 'symptom_map_compiled.pkl')
+ARTIFACT_FORMAT_VERSION = 1
+
+# --- SYMPTOM MAP (CRITICAL: Populate this thoroughly!) ---
+SYMPTOM_MAP = {
+    # ... (your existing SYMPTOM_MAP - keep it as is, I'll omit for brevity) ...
+    # ... (your existing SYMPTOM_MAP - keep it as is) ...
+"itching": {"model_key": "itching", "ask_phrase": "Are you experiencing any itching?"},
+"skin rash": {"model_key": "skin_rash", "ask_phrase": "Do you have a skin rash or any rashes on your skin?"},
+"nodal skin eruptions": {"model_key": "nodal_skin_eruptions", "ask_phrase": "Have you noticed any nodal skin eruptions, like bumps under the skin?"},
+"continuous sneezing": {"model_key": "continuous_sneezing", "ask_phrase": "Are you sneezing continuously or very frequently?"},
+"shivering": {"model_key": "shivering", "ask_phrase": "Are you shivering, perhaps feeling cold even when it's not?"},
+"chills": {"model_key": "chills", "ask_phrase": "Do you have chills, possibly with a fever?"},
+"joint pain": {"model_key": "joint_pain", "ask_phrase": "Are you experiencing pain in your joints?"},
+"stomach pain": {"model_key": "stomach_pain", "ask_phrase": "Do you have stomach pain or an ache in your abdomen?"},
+"acidity": {"model_key": "acidity", "ask_phrase": "Are you suffering from acidity or heartburn?"},
+"ulcers on tongue": {"model_key": "ulcers_on_tongue", "ask_phrase": "Do you have any ulcers or sores on your tongue?"},
+"muscle wasting": {"model_key": "muscle_wasting", "ask_phrase": "Have you noticed any muscle wasting or a decrease in muscle mass?"},
+"vomiting": {"model_key": "vomiting", "ask_phrase": "Have you been vomiting or throwing up?"},
+"burning micturition": {"model_key": "burning_micturition", "ask_phrase": "Do you feel a burning sensation when you urinate?"},
+# "spotting urination": {"model_key": "spotting_ urination", "ask_phrase": "Have you noticed any spotting or unusual discharge during urination?"}, # Assuming space converted to underscore for model_key
+"fatigue": {"model_key": "fatigue", "ask_phrase": "Are you feeling fatigued, very tired, or lacking energy?"},
+"weight gain": {"model_key": "weight_gain", "ask_phrase": "Have you experienced unexplained weight gain recently?"},
+"anxiety": {"model_key": "anxiety", "ask_phrase": "Are you feeling anxious, worried, or uneasy?"},
+"cold hands and feet": {"model_key": "cold_hands_and_feets", "ask_phrase": "Do your hands and feet often feel cold?"}, # Original key 'feets'
+"mood swings": {"model_key": "mood_swings", "ask_phrase": "Are you experiencing frequent mood swings or changes in your emotional state?"},
+"weight loss": {"model_key": "weight_loss", "ask_phrase": "Have you had unexplained weight loss recently?"},
+"restlessness": {"model_key": "restlessness", "ask_phrase": "Are you feeling restless or unable to relax?"},
+"lethargy": {"model_key": "lethargy", "ask_phrase": "Are you experiencing lethargy or a lack of energy and enthusiasm?"},
+"patches in throat": {"model_key": "patches_in_throat", "ask_phrase": "Have you noticed any patches or unusual spots in your throat?"},
+"irregular sugar level": {"model_key": "irregular_sugar_level", "ask_phrase": "Have you had irregular blood sugar levels?"},
+"cough": {"model_key": "cough", "ask_phrase": "Do you have a cough?"},
+"high fever": {"model_key": "high_fever", "ask_phrase": "Do you have a high fever?"},
+"sunken eyes": {"model_key": "sunken_eyes", "ask_phrase": "Do your eyes appear sunken or hollow?"},
+"breathlessness": {"model_key": "breathlessness", "ask_phrase": "Are you experiencing breathlessness or shortness of breath?"},
+"sweating": {"model_key": "sweating", "ask_phrase": "Are you sweating more than usual, or having night sweats?"},
+"dehydration": {"model_key": "dehydration", "ask_phrase": "Do you feel dehydrated, thirsty, or have a dry mouth?"},
+"indigestion": {"model_key": "indigestion", "ask_phrase": "Are you suffering from indigestion or an upset stomach after eating?"},
+"headache": {"model_key": "headache", "ask_phrase": "Do you have a headache?"},
+"yellowish skin": {"model_key": "yellowish_skin", "ask_phrase": "Has your skin taken on a yellowish tint?"},
+"dark urine": {"model_key": "dark_urine", "ask_phrase": "Is your urine darker than usual?"},
+"nausea": {"model_key": "nausea", "ask_phrase": "Are you feeling nauseous or like you might vomit?"},
+"loss of appetite": {"model_key": "loss_of_appetite", "ask_phrase": "Have you experienced a loss of appetite?"},
+"pain behind the eyes": {"model_key": "pain_behind_the_eyes", "ask_phrase": "Do you have pain behind your eyes?"},
+"back pain": {"model_key": "back_pain", "ask_phrase": "Are you experiencing back pain?"},
+"constipation": {"model_key": "constipation", "ask_phrase": "Are you suffering from constipation?"},
+"abdominal pain": {"model_key": "abdominal_pain", "ask_phrase": "Do you have pain in your abdomen (belly area)?"},
+"diarrhoea": {"model_key": "diarrhoea", "ask_phrase": "Are you experiencing diarrhoea or loose stools?"},
+"mild fever": {"model_key": "mild_fever", "ask_phrase": "Do you have a mild fever?"},
+"yellow urine": {"model_key": "yellow_urine", "ask_phrase": "Is your urine distinctly yellow?"}, # Note: dark_urine already exists, this might be redundant or different context
+"yellowing of eyes": {"model_key": "yellowing_of_eyes", "ask_phrase": "Have the whites of your eyes turned yellow?"},
+"acute liver failure": {"model_key": "acute_liver_failure", "ask_phrase": "Are there signs or a diagnosis of acute liver failure?"}, # This is serious, bot should emphasize doctor visit
+"fluid overload": {"model_key": "fluid_overload", "ask_phrase": "Are you experiencing symptoms of fluid overload, like swelling?"}, # If another "fluid_overload" exists, ensure distinct model_keys
+"swelling of stomach": {"model_key": "swelling_of_stomach", "ask_phrase": "Is your stomach swollen or distended?"},
+"swelled lymph nodes": {"model_key": "swelled_lymph_nodes", "ask_phrase": "Do you have any swelled lymph nodes, for example, in your neck, armpits, or groin?"},
+"malaise": {"model_key": "malaise", "ask_phrase": "Are you feeling a general sense of malaise, discomfort, or illness?"},
+"blurred and distorted vision": {"model_key": "blurred_and_distorted_vision", "ask_phrase": "Is your vision blurred or distorted?"},
+"phlegm": {"model_key": "phlegm", "ask_phrase": "Are you coughing up phlegm or mucus?"},
+"throat irritation": {"model_key": "throat_irritation", "ask_phrase": "Do you have throat irritation or a scratchy throat?"},
+"redness of eyes": {"model_key": "redness_of_eyes", "ask_phrase": "Are your eyes red or bloodshot?"},
+"sinus pressure": {"model_key": "sinus_pressure", "ask_phrase": "Do you feel pressure in your sinuses?"},
+"runny nose": {"model_key": "runny_nose", "ask_phrase": "Do you have a runny nose?"},
+"congestion": {"model_key": "congestion", "ask_phrase": "Are you experiencing nasal congestion or a stuffy nose?"},
+"chest pain": {"model_key": "chest_pain", "ask_phrase": "Are you experiencing any chest pain?"}, # Critical, emphasize doctor
+"weakness in limbs": {"model_key": "weakness_in_limbs", "ask_phrase": "Do you have weakness in your arms or legs?"},
+"fast heart rate": {"model_key": "fast_heart_rate", "ask_phrase": "Is your heart beating faster than usual, or do you have palpitations?"},
+"pain during bowel movements": {"model_key": "pain_during_bowel_movements", "ask_phrase": "Do you experience pain during bowel movements?"},
+"pain in anal region": {"model_key": "pain_in_anal_region", "ask_phrase": "Do you have pain in your anal region?"},
+"bloody stool": {"model_key": "bloody_stool", "ask_phrase": "Have you noticed any blood in your stool?"},
+"irritation in anus": {"model_key": "irritation_in_anus", "ask_phrase": "Do you have irritation in your anus?"},
+"neck pain": {"model_key": "neck_pain", "ask_phrase": "Are you experiencing neck pain?"},
+"dizziness": {"model_key": "dizziness", "ask_phrase": "Are you feeling dizzy or lightheaded?"},
+"cramps": {"model_key": "cramps", "ask_phrase": "Are you experiencing cramps (e.g., muscle or abdominal)?"},
+"bruising": {"model_key": "bruising", "ask_phrase": "Are you bruising more easily than usual?"},
+"obesity": {"model_key": "obesity", "ask_phrase": "Are you concerned about obesity or significant overweight?"}, # This is a condition, not a typical acute symptom
+"swollen legs": {"model_key": "swollen_legs", "ask_phrase": "Are your legs swollen?"},
+"swollen blood vessels": {"model_key": "swollen_blood_vessels", "ask_phrase": "Have you noticed any swollen blood vessels?"},
+"puffy face and eyes": {"model_key": "puffy_face_and_eyes", "ask_phrase": "Is your face or around your eyes puffy?"},
+"enlarged thyroid": {"model_key": "enlarged_thyroid", "ask_phrase": "Do you have an enlarged thyroid or a noticeable swelling in the front of your neck?"},
+"brittle nails": {"model_key": "brittle_nails", "ask_phrase": "Are your nails brittle or breaking easily?"},
+"swollen extremeties": {"model_key": "swollen_extremeties", "ask_phrase": "Are your extremeties (hands, feet, arms, legs) swollen?"}, # Note: extremities
+"excessive hunger": {"model_key": "excessive_hunger", "ask_phrase": "Are you experiencing excessive hunger?"},
+"extra marital contacts": {"model_key": "extra_marital_contacts", "ask_phrase": "Have you had extra-marital contacts? (This information is confidential and helps assess certain risks.)"}, # Sensitive, handle with care
+"drying and tingling lips": {"model_key": "drying_and_tingling_lips", "ask_phrase": "Are your lips dry or do they have a tingling sensation?"},
+"slurred speech": {"model_key": "slurred_speech", "ask_phrase": "Is your speech slurred or difficult to understand?"}, # Critical
+"knee pain": {"model_key": "knee_pain", "ask_phrase": "Are you experiencing knee pain?"},
+"hip joint pain": {"model_key": "hip_joint_pain", "ask_phrase": "Do you have pain in your hip joint?"},
+"muscle weakness": {"model_key": "muscle_weakness", "ask_phrase": "Are you experiencing muscle weakness?"},
+"stiff neck": {"model_key": "stiff_neck", "ask_phrase": "Do you have a stiff neck?"},
+"swelling joints": {"model_key": "swelling_joints", "ask_phrase": "Are any of your joints swollen?"},
+"movement stiffness": {"model_key": "movement_stiffness", "ask_phrase": "Do you feel stiffness when trying to move?"},
+"spinning movements": {"model_key": "spinning_movements", "ask_phrase": "Are you experiencing spinning sensations or vertigo?"},
+"loss of balance": {"model_key": "loss_of_balance", "ask_phrase": "Have you had any loss of balance or unsteadiness?"},
+"unsteadiness": {"model_key": "unsteadiness", "ask_phrase": "Do you feel unsteady on your feet?"},
+"weakness of one body side": {"model_key": "weakness_of_one_body_side", "ask_phrase": "Do you have weakness on one side of your body?"}, # Critical
+"loss of smell": {"model_key": "loss_of_smell", "ask_phrase": "Have you experienced a loss of smell?"},
+"bladder discomfort": {"model_key": "bladder_discomfort", "ask_phrase": "Are you feeling any discomfort in your bladder area?"},
+# "foul smell of urine": {"model_key": "foul_smell_of urine", "ask_phrase": "Does your urine have a foul or unusual smell?"}, # Assuming space to underscore
+"continuous feel of urine": {"model_key": "continuous_feel_of_urine", "ask_phrase": "Do you have a continuous feeling of needing to urinate?"},
+"passage of gases": {"model_key": "passage_of_gases", "ask_phrase": "Are you passing more gas than usual?"},
+"internal itching": {"model_key": "internal_itching", "ask_phrase": "Are you experiencing internal itching (e.g., vaginal or anal)?"},
+"toxic look (typhos)": {"model_key": "toxic_look_(typhos)", "ask_phrase": "Do you appear very ill, perhaps with a 'toxic look' or typhos-like state?"}, # TYPHOS is a severe state
+"depression": {"model_key": "depression", "ask_phrase": "Are you feeling depressed, sad, or hopeless?"},
+"irritability": {"model_key": "irritability", "ask_phrase": "Are you feeling more irritable than usual?"},
+"muscle pain": {"model_key": "muscle_pain", "ask_phrase": "Are you experiencing muscle pain or aches?"},
+"altered sensorium": {"model_key": "altered_sensorium", "ask_phrase": "Have you experienced any altered sensorium, confusion, or changes in consciousness?"}, # Critical
+"red spots over body": {"model_key": "red_spots_over_body", "ask_phrase": "Have you noticed red spots appearing over your body?"},
+"belly pain": {"model_key": "belly_pain", "ask_phrase": "Do you have pain in your belly area?"}, # Note: 'stomach_pain' and 'abdominal_pain' exist. Ensure model keys are distinct if these are truly different symptoms in model.
+"abnormal menstruation": {"model_key": "abnormal_menstruation", "ask_phrase": "Are you experiencing abnormal menstruation (e.g., irregular, heavy, or missed periods)?"},
+# "dischromic patches": {"model_key": "dischromic _patches", "ask_phrase": "Do you have dischromic patches (discolored skin patches)?"}, # Assuming dischromic__patches -> dischromic_patches
+"watering from eyes": {"model_key": "watering_from_eyes", "ask_phrase": "Are your eyes watering excessively?"},
+"increased appetite": {"model_key": "increased_appetite", "ask_phrase": "Has your appetite increased significantly?"},
+"polyuria": {"model_key": "polyuria", "ask_phrase": "Are you experiencing polyuria (urinating large volumes frequently)?"},
+"family history": {"model_key": "family_history", "ask_phrase": "Is there a family history of similar conditions or specific diseases?"}, # This is a risk factor, not a direct symptom usually
+"mucoid sputum": {"model_key": "mucoid_sputum", "ask_phrase": "Are you coughing up mucoid (clear or white) sputum?"},
+"rusty sputum": {"model_key": "rusty_sputum", "ask_phrase": "Are you coughing up rusty-colored sputum?"},
+"lack of concentration": {"model_key": "lack_of_concentration", "ask_phrase": "Are you having difficulty concentrating?"},
+"visual disturbances": {"model_key": "visual_disturbances", "ask_phrase": "Are you experiencing any visual disturbances other than blurred vision?"},
+"receiving blood transfusion": {"model_key": "receiving_blood_transfusion", "ask_phrase": "Have you recently received a blood transfusion?"}, # Risk factor
+"receiving unsterile injections": {"model_key": "receiving_unsterile_injections", "ask_phrase": "Have you recently received any unsterile injections?"}, # Risk factor
+"coma": {"model_key": "coma", "ask_phrase": "Has there been any instance of coma or unresponsiveness?"}, # Critical
+"stomach bleeding": {"model_key": "stomach_bleeding", "ask_phrase": "Are there any signs of stomach bleeding (e.g., vomiting blood, black tarry stools)?"}, # Critical
+"distention of abdomen": {"model_key": "distention_of_abdomen", "ask_phrase": "Is your abdomen distended or significantly bloated?"},
+"history of alcohol consumption": {"model_key": "history_of_alcohol_consumption", "ask_phrase": "Do you have a history of significant alcohol consumption?"}, # Risk factor
+# "fluid_overload" is listed twice in your input. Assuming it maps to the same model_key. If they are different symptoms in the model, they need different keys.
+# Assuming the second one is the same or a typo.
+"blood in sputum": {"model_key": "blood_in_sputum", "ask_phrase": "Are you coughing up blood in your sputum?"},
+"prominent veins on calf": {"model_key": "prominent_veins_on_calf", "ask_phrase": "Are the veins on your calf prominent or bulging?"},
+"palpitations": {"model_key": "palpitations", "ask_phrase": "Are you experiencing palpitations or a fluttering sensation in your chest?"}, # Similar to fast_heart_rate, check model diff.
+"painful walking": {"model_key": "painful_walking", "ask_phrase": "Is it painful for you to walk?"},
+"pus filled pimples": {"model_key": "pus_filled_pimples", "ask_phrase": "Do you have pus-filled pimples?"},
+"blackheads": {"model_key": "blackheads", "ask_phrase": "Are you experiencing blackheads?"},
+"scurring": {"model_key": "scurring", "ask_phrase": "Do you have scurring (scarring or scabbing) on your skin?"}, # Spelling "scurring" as in dataset
+"skin peeling": {"model_key": "skin_peeling", "ask_phrase": "Is your skin peeling?"},
+"silver like dusting": {"model_key": "silver_like_dusting", "ask_phrase": "Do you have a silver-like dusting or scales on your skin?"},
+"small dents in nails": {"model_key": "small_dents_in_nails", "ask_phrase": "Are there small dents or pits in your nails?"},
+"inflammatory nails": {"model_key": "inflammatory_nails", "ask_phrase": "Are your nails inflamed, red, or swollen around the edges?"},
+"blister": {"model_key": "blister", "ask_phrase": "Have you developed any blisters on your skin?"},
+"red sore around nose": {"model_key": "red_sore_around_nose", "ask_phrase": "Do you have a red sore or irritation around your nose?"},
+"yellow crust ooze": {"model_key": "yellow_crust_ooze", "ask_phrase": "Is there any yellow crust or ooze from skin lesions?"},
+# --- Synonyms (Add more as you think of them) ---
+"sore throat": {"model_key": "throat_irritation", "ask_phrase": "Do you have a sore throat?"}, # Or 'patches_in_throat' depending on context
+"tiredness": {"model_key": "fatigue", "ask_phrase": "Are you feeling extremely tired?"},
+"throwing up": {"model_key": "vomiting", "ask_phrase": "Have you been throwing up?"},
+"painful urination": {"model_key": "burning_micturition", "ask_phrase": "Is it painful when you urinate?"},
+"loose stools": {"model_key": "diarrhoea", "ask_phrase": "Are you having loose stools or diarrhoea?"},
+"shortness of breath": {"model_key": "breathlessness", "ask_phrase": "Are you experiencing shortness of breath?"},
+"upset stomach": {"model_key": "indigestion", "ask_phrase": "Do you have an upset stomach?"}, # Or nausea/vomiting depending on detail
+"feeling sick": {"model_key": "nausea", "ask_phrase": "Are you feeling sick to your stomach?"},
+"stuffy nose": {"model_key": "congestion", "ask_phrase": "Do you have a stuffy nose?"},
+"vertigo": {"model_key": "spinning_movements", "ask_phrase": "Are you experiencing vertigo or a spinning sensation?"},
+"passing gas": {"model_key": "passage_of_gases", "ask_phrase": "Are you passing more gas than usual?"},
+"feeling down": {"model_key": "depression", "ask_phrase": "Are you feeling down or depressed?"},
+"peeing a lot": {"model_key": "polyuria", "ask_phrase": "Are you urinating much more frequently or in larger amounts?"},
+}
+
+
+def normalize_model_key(key):
+    return key.strip().lower().replace(' ', '_')
+
+
+def compute_model_version(*paths):
+    """Short content hash of the model files; stamps compiled artifacts so a stale one is never paired with a new model."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def compile_symptom_map(raw_symptom_map, model_symptom_keys, model_version=None):
+    """Validate `raw_symptom_map` against the model's feature list and build every lookup table the chat flow needs.
+    Returns (artifact, issues); issues is a list of (level, message) with level 'info', 'warning' or 'error'.
+    Entries whose model_key can't be matched (even after fixing " _" typos) are dropped and reported as errors."""
+    model_symptom_keys = [normalize_model_key(key) for key in model_symptom_keys]
+    known_keys = set(model_symptom_keys)
+    issues = []
+    validated_map = {}
+
+    for natural_phrase, details in raw_symptom_map.items():
+        model_key_in_map = details.get("model_key")
+        if not isinstance(model_key_in_map, str):
+            issues.append(('error', f"SymptomMap Integrity Issue: Entry for '{natural_phrase}' has no 'model_key' or it's not a string. Skipping."))
+            continue
+        normalized_model_key_in_map = normalize_model_key(model_key_in_map)
+        if normalized_model_key_in_map not in known_keys:
+            # Try to find a match for keys that might have typos like 'spotting_ urination' vs 'spotting_urination'
+            corrected_key = normalized_model_key_in_map.replace(" _", "_")
+            if corrected_key in known_keys:
+                issues.append(('info', f"Corrected model_key '{normalized_model_key_in_map}' to '{corrected_key}' for phrase '{natural_phrase}'."))
+                normalized_model_key_in_map = corrected_key
+            else:
+                issues.append(('error', f"SymptomMap Error: model_key '{normalized_model_key_in_map}' (from phrase '{natural_phrase}') not found in loaded MODEL_SYMPTOM_KEYS. Skipping this entry."))
+                continue
+        validated_map[natural_phrase] = dict(details, model_key=normalized_model_key_in_map)
+
+    from fuzzywuzzy import utils as fuzz_utils # Only needed when compiling; keeps worker imports light
+
+    natural_phrases = list(validated_map.keys())
+    artifact = {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'model_version': model_version,
+        'model_symptom_keys': model_symptom_keys,
+        'key_to_index': {key: i for i, key in enumerate(model_symptom_keys)},
+        'symptom_map': validated_map,
+        'natural_phrases': natural_phrases,
+        'phrase_to_key': {phrase: details['model_key'] for phrase, details in validated_map.items()},
+        'ask_phrases': {details['model_key']: details['ask_phrase'] for details in validated_map.values()},
+        # Fuzzy index: the phrases pre-run through fuzzywuzzy's default processing, aligned with natural_phrases,
+        # so a lookup scores against them directly instead of re-processing every choice on every call.
+        'fuzzy_choices': [fuzz_utils.full_process(phrase, force_ascii=True) for phrase in natural_phrases],
+    }
+    return artifact, issues
+
+
+def load_compiled_symptom_map(path=COMPILED_SYMPTOM_MAP_PATH):
+    with open(path, 'rb') as f:
+        artifact = pickle.load(f)
+    if artifact.get('format_version') != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"Compiled symptom map {path} has format {artifact.get('format_version')}, expected {ARTIFACT_FORMAT_VERSION}.")
+    return artifact
+
+
+def build(output_path=COMPILED_SYMPTOM_MAP_PATH):
+    with open(SYMPTOM_COLUMNS_PATH, 'rb') as f:
+        model_symptom_keys = pickle.load(f)
+    model_version = compute_model_version(MODEL_PATH, SYMPTOM_COLUMNS_PATH)
+    artifact, issues = compile_symptom_map(SYMPTOM_MAP, model_symptom_keys, model_version)
+    for level, message in issues:
+        print(f"[{level.upper()}] {message}")
+    errors = [message for level, message in issues if level == 'error']
+    if errors:
+        print(f"Build FAILED: {len(errors)} SYMPTOM_MAP entries do not match model {model_version}. Fix the map or retrain.")
+        return 1
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, output_path)
+    print(f"Compiled {len(artifact['natural_phrases'])} phrases / {len(artifact['ask_phrases'])} model keys "
+          f"for model {model_version} -> {output_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(build())
@@ -0,0 +1,76 @@
+# symptom_posterior.py
+# Cheap incremental disease posterior used to decide when further symptom questions are no longer worth asking.
+# Per-class symptom likelihoods are precomputed once from the training CSV (naive Bayes with Laplace smoothing);
+# each confirmed/denied symptom is then a single vector add in log space.
+import numpy as np
+import pandas as pd
+
+
+def _normalize_key(key):
+    return key.strip().lower().replace(' ', '_')
+
+
+class SymptomPosterior:
+    def __init__(self, classes, symptom_keys, log_prior, log_present, log_absent):
+        self.classes = list(classes)
+        self.symptom_keys = list(symptom_keys)
+        self.key_index = {key: j for j, key in enumerate(self.symptom_keys)}
+        self.log_prior = log_prior          # (n_classes,)
+        self.log_present = log_present      # (n_classes, n_symptoms): log P(symptom=1 | class)
+        self.log_absent = log_absent        # (n_classes, n_symptoms): log P(symptom=0 | class)
+
+    @classmethod
+    def from_training_csv(cls, path, symptom_keys, alpha=1.0):
+        df = pd.read_csv(path)
+        df.columns = [_normalize_key(col) for col in df.columns]
+        df = df.loc[:, [col for col in df.columns if not col.startswith('unnamed')]]
+        classes = sorted(df['prognosis'].str.strip().unique())
+        features = df.reindex(columns=list(symptom_keys), fill_value=0).to_numpy(dtype=np.float64)
+        labels = df['prognosis'].str.strip().to_numpy()
+
+        counts = np.zeros((len(classes), len(symptom_keys)))
+        totals = np.zeros(len(classes))
+        for i, disease in enumerate(classes):
+            rows = labels == disease
+            counts[i] = features[rows].sum(axis=0)
+            totals[i] = rows.sum()
+        p_present = (counts + alpha) / (totals[:, None] + 2 * alpha)
+        return cls(classes, symptom_keys, np.log(totals / totals.sum()), np.log(p_present), np.log1p(-p_present))
+
+    def initial(self):
+        return self.log_prior.copy()
+
+    def update(self, log_post, key, present):
+        j = self.key_index.get(key)
+        if j is None:
+            return log_post
+        return log_post + (self.log_present[:, j] if present else self.log_absent[:, j])
+
+    def from_answers(self, confirmed_keys, denied_keys):
+        log_post = self.initial()
+        for key in confirmed_keys:
+            log_post = self.update(log_post, key, True)
+        for key in denied_keys:
+            log_post = self.update(log_post, key, False)
+        return log_post
+
+    @staticmethod
+    def probabilities(log_post):
+        shifted = np.exp(log_post - log_post.max())
+        return shifted / shifted.sum()
+
+    def top_margin(self, log_post):
+        """(top class, its probability, probability margin over the runner-up)."""
+        probs = self.probabilities(log_post)
+        second, first = np.argsort(probs)[-2:]
+        return self.classes[first], float(probs[first]), float(probs[first] - probs[second])
+
+    def answer_can_change_top(self, log_post, candidate_keys):
+        """Whether a single further yes/no answer on any of `candidate_keys` could change the leading class."""
+        idx = [self.key_index[key] for key in candidate_keys if key in self.key_index]
+        if not idx:
+            return False
+        top = int(np.argmax(log_post))
+        if_present = log_post[:, None] + self.log_present[:, idx]
+        if_absent = log_post[:, None] + self.log_absent[:, idx]
+        return bool((if_present.argmax(axis=0) != top).any() or (if_absent.argmax(axis=0) != top).any())
@@ -0,0 +1,90 @@
+# symptom_suggest.py
+# Prefix index over the symptom vocabulary (every SYMPTOM_MAP phrase, each of its words, and the spaced-out model key)
+# behind /symptoms/suggest, so the chat UI can offer canonical symptom phrases while the user types. A picked phrase
+# is an exact SYMPTOM_MAP key and skips the fuzzy matcher in extract_initial_symptoms_nlp.
+#
+# Usage: python symptom_suggest.py [prefix ...]   # suggestions and per-lookup cost against the compiled map
+import bisect
+import heapq
+import re
+
+_NON_WORD_RE = re.compile(r'[^a-z0-9]+')
+_MAX_CHAR = '\U0010ffff'
+
+
+def normalize_query(text):
+    return _NON_WORD_RE.sub(' ', str(text or '').lower()).strip()
+
+
+class SymptomSuggester:
+    """Sorted (term, entry) array searched with bisect. A phrase is found by any prefix of itself, of any of its
+    words onwards ("rash" -> "skin rash") or of its model key ("nodal_skin" -> "nodal skin eruptions")."""
+
+    def __init__(self, symptom_map, model_keys=None):
+        known_keys = set(model_keys) if model_keys is not None else None
+        self.entries = [] # (phrase, model key)
+        terms = []
+        for phrase, config in sorted(symptom_map.items()):
+            key = config.get('model_key')
+            if known_keys is not None and key not in known_keys:
+                continue
+            entry = len(self.entries)
+            self.entries.append((phrase, key))
+            words = normalize_query(phrase).split()
+            for start in range(len(words)):
+                terms.append((' '.join(words[start:]), start > 0, entry)) # Whole-phrase matches rank first
+            spaced_key = normalize_query(key)
+            if spaced_key and spaced_key != ' '.join(words):
+                terms.append((spaced_key, True, entry))
+        terms.sort()
+        self._terms = [term for term, _, _ in terms]
+        self._postings = [(mid_word, entry) for _, mid_word, entry in terms]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def suggest(self, query, limit=8):
+        """Up to `limit` {'phrase', 'key'} dicts for `query`: whole-phrase prefix matches first, then shorter phrases,
+        at most one phrase per model key."""
+        query = normalize_query(query)
+        if not query or limit <= 0:
+            return []
+        lo = bisect.bisect_left(self._terms, query)
+        hi = bisect.bisect_left(self._terms, query + _MAX_CHAR, lo)
+        best = {} # entry -> rank
+        for mid_word, entry in self._postings[lo:hi]:
+            phrase = self.entries[entry][0]
+            rank = (mid_word, len(phrase), phrase)
+            if entry not in best or rank < best[entry]:
+                best[entry] = rank
+        suggestions, seen_keys = [], set()
+        for rank, entry in heapq.nsmallest(len(best), ((rank, entry) for entry, rank in best.items())):
+            phrase, key = self.entries[entry]
+            if key in seen_keys:
+                continue
+            seen_keys.add(key)
+            suggestions.append({'phrase': phrase, 'key': key})
+            if len(suggestions) == limit:
+                break
+        return suggestions
+
+
+if __name__ == '__main__':
+    import os
+    import pickle
+    import sys
+    import timeit
+
+    from symptom_map import COMPILED_SYMPTOM_MAP_PATH, SYMPTOM_MAP
+
+    if os.path.exists(COMPILED_SYMPTOM_MAP_PATH):
+        with open(COMPILED_SYMPTOM_MAP_PATH, 'rb') as f:
+            symptom_map = pickle.load(f)['symptom_map']
+    else:
+        symptom_map = SYMPTOM_MAP
+    suggester = SymptomSuggester(symptom_map)
+    print(f"{len(suggester)} phrases, {len(suggester._terms)} indexed terms")
+    for prefix in sys.argv[1:] or ['s', 'sk', 'rash', 'head', 'stomach p', 'nodal_sk']:
+        runs = 2000
+        micros = timeit.timeit(lambda: suggester.suggest(prefix), number=runs) / runs * 1e6
+        print(f"{prefix!r:<14}{micros:8.1f} us  {[s['phrase'] for s in suggester.suggest(prefix)]}")
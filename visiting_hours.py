@@ -0,0 +1,223 @@
+# visiting_hours.py
+# Parses the free-text `visiting_hours` column ("3pm to 5pm (Sat, Mon & Wed)", "9am to 5pm (Closed: Friday)") once
+# into weekly intervals, and indexes them by time bucket so "open now" / "available today" lookups never touch the
+# raw strings on the request path.
+#
+# Usage: python visiting_hours.py [--csv doctors_bd_detailed.csv]   # parse report for the directory
+import argparse
+import os
+import re
+from collections import Counter
+
+DAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun') # Index == datetime.weekday()
+DAY_ALIASES = {'thr': 'thu'} # "Thrusday" appears in the source data
+MINUTES_PER_DAY = 24 * 60
+BUCKET_MINUTES = 30
+BUCKETS_PER_DAY = MINUTES_PER_DAY // BUCKET_MINUTES
+
+# Parse outcome per row: 'ok', 'partial' (some segments parsed), 'unknown' ("please call"), 'empty', 'failed'
+PARSE_STATUSES = ('ok', 'partial', 'unknown', 'empty', 'failed')
+
+_TIME_RE = re.compile(r'^(\d{1,2})(?:[.:](\d{2}))?\s*(am|pm)?$')
+_SEGMENT_RE = re.compile(r'^(?P<times>[^()]*?)\s*(?:\((?P<days>[^)]*)\))?$')
+
+
+class VisitingHoursParseError(ValueError):
+    pass
+
+
+def _split_top_level(text, separators=','):
+    """Split on separators outside parentheses."""
+    parts, depth, current = [], 0, []
+    for ch in text:
+        depth += (ch == '(') - (ch == ')')
+        if ch in separators and depth == 0:
+            parts.append(''.join(current))
+            current = []
+        else:
+            current.append(ch)
+    parts.append(''.join(current))
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _parse_time(text, default_meridiem=None):
+    match = _TIME_RE.match(text.strip())
+    if not match:
+        raise VisitingHoursParseError(f"unrecognised time '{text.strip()}'")
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3) or default_meridiem
+    if meridiem is None or hour > 12 or minute > 59:
+        raise VisitingHoursParseError(f"ambiguous time '{text.strip()}'")
+    return (hour % 12 + (12 if meridiem == 'pm' else 0)) * 60 + minute, meridiem
+
+
+def _parse_range(text):
+    bounds = re.split(r'\s+to\s+|\s*-\s*', text.strip())
+    if len(bounds) != 2:
+        raise VisitingHoursParseError(f"unrecognised time range '{text.strip()}'")
+    end, end_meridiem = _parse_time(bounds[1])
+    start, _ = _parse_time(bounds[0], default_meridiem=end_meridiem) # "10 to 12pm"
+    if start >= end and end_meridiem == 'pm' and not re.search(r'[ap]m', bounds[0]):
+        start, _ = _parse_time(bounds[0], default_meridiem='am')
+    if end == 0:
+        end = MINUTES_PER_DAY # "... to 12am" means midnight at the end of the day
+    return start, end
+
+
+def _parse_day(token):
+    key = token.strip()[:3]
+    key = DAY_ALIASES.get(key, key)
+    if key not in DAYS:
+        raise VisitingHoursParseError(f"unrecognised day '{token.strip()}'")
+    return DAYS.index(key)
+
+
+def _parse_days(text):
+    text = (text or '').strip()
+    if text in ('', 'everyday', 'every day', 'daily', 'all days'):
+        return set(range(7))
+    if text.startswith('closed'):
+        return set(range(7)) - _parse_days(text.split(':', 1)[-1] if ':' in text else text[len('closed'):])
+    if ' to ' in text:
+        first, last = (_parse_day(part) for part in text.split(' to ', 1))
+        return {(first + i) % 7 for i in range((last - first) % 7 + 1)}
+    return {_parse_day(token) for token in re.split(r',|&|\band\b', text) if token.strip()}
+
+
+def parse_visiting_hours(text):
+    """(status, intervals) where intervals is a sorted tuple of (weekday, start_minute, end_minute)."""
+    if text is None or not str(text).strip() or str(text).strip().lower() in ('nan', 'n/a'):
+        return 'empty', ()
+    text = str(text).strip().lower().replace('–', '-')
+    if 'unknown' in text or 'call' in text:
+        return 'unknown', ()
+    text = re.sub(r'\)\s*&', '),', text) # "... (Sat to Thu) & 9am to 12pm (Fri)" is two segments
+    text = re.sub(r'\b(open|only)\s+', '', text) # "(Open Everyday)", "(Only Friday)"
+
+    intervals, failures, segments = set(), 0, _split_top_level(text)
+    for segment in segments:
+        try:
+            match = _SEGMENT_RE.match(segment)
+            if not match:
+                raise VisitingHoursParseError(f"unrecognised segment '{segment}'")
+            times, days = match.group('times'), (match.group('days') or '').strip()
+            if ':' in days and not days.startswith('closed'):
+                # "7pm to 10pm (Friday: 10am to 12pm)": the named days have their own hours.
+                day_part, day_times = days.split(':', 1)
+                override_days = _parse_days(day_part)
+                plans = [(day_times, override_days), (times, set(range(7)) - override_days)]
+            else:
+                plans = [(times, _parse_days(days))]
+            for plan_times, plan_days in plans:
+                for time_range in _split_top_level(plan_times, separators='&'):
+                    start, end = _parse_range(time_range)
+                    for day in plan_days:
+                        if end > start:
+                            intervals.add((day, start, end))
+                        else: # Runs past midnight into the next day
+                            intervals.add((day, start, MINUTES_PER_DAY))
+                            intervals.add(((day + 1) % 7, 0, end))
+        except VisitingHoursParseError:
+            failures += 1
+    if not intervals:
+        return 'failed', ()
+    return ('partial' if failures else 'ok'), tuple(sorted(intervals))
+
+
+class VisitingHoursIndex:
+    """Weekly availability of every doctor, as one bitset (bit i = doctor id i) per BUCKET_MINUTES bucket of the
+    week. A bucket's bit is set when any interval overlaps the bucket, so the bitset answers "who could be open
+    now" in O(1) per doctor; exact boundaries are then checked against the parsed intervals of those candidates."""
+
+    def __init__(self):
+        self.schedules = {} # doctor id -> ((weekday, start, end), ...)
+        self.statuses = {} # doctor id -> parse status
+        self.failures = Counter() # raw text -> rows that failed (fully or partially) to parse
+        self.buckets = [] # 7 * BUCKETS_PER_DAY bytes objects
+
+    @classmethod
+    def build(cls, rows):
+        """rows: iterable of (doctor id, visiting_hours text)."""
+        index, parsed = cls(), {}
+        bucket_ids = [[] for _ in range(7 * BUCKETS_PER_DAY)]
+        for doc_id, text in rows:
+            key = str(text).strip() if text is not None else ''
+            if key not in parsed: # The directory repeats a few hundred distinct strings
+                parsed[key] = parse_visiting_hours(text)
+            status, intervals = parsed[key]
+            index.statuses[doc_id] = status
+            if status in ('partial', 'failed'):
+                index.failures[key] += 1
+            if intervals:
+                index.schedules[doc_id] = intervals
+                for day, start, end in intervals:
+                    for bucket in range(start // BUCKET_MINUTES, (end - 1) // BUCKET_MINUTES + 1):
+                        bucket_ids[day * BUCKETS_PER_DAY + bucket].append(doc_id)
+        size = (max(index.statuses, default=-1) + 8) // 8
+        for ids in bucket_ids:
+            bits = bytearray(size)
+            for doc_id in ids:
+                bits[doc_id >> 3] |= 1 << (doc_id & 7)
+            index.buckets.append(bytes(bits))
+        return index
+
+    @staticmethod
+    def _position(when):
+        return when.weekday(), when.hour * 60 + when.minute
+
+    def _bucket(self, when):
+        day, minute = self._position(when)
+        return self.buckets[day * BUCKETS_PER_DAY + minute // BUCKET_MINUTES]
+
+    def open_at(self, doc_id, when):
+        bits = self._bucket(when)
+        if doc_id >> 3 >= len(bits) or not (bits[doc_id >> 3] >> (doc_id & 7)) & 1:
+            return False
+        day, minute = self._position(when)
+        return any(d == day and start <= minute < end for d, start, end in self.schedules.get(doc_id, ()))
+
+    def later_today(self, doc_id, when):
+        day, minute = self._position(when)
+        return any(d == day and start > minute for d, start, end in self.schedules.get(doc_id, ()))
+
+    def open_now(self, doc_ids, when):
+        """The subset of doc_ids open at `when`, in their given order."""
+        return [doc_id for doc_id in doc_ids if self.open_at(doc_id, when)]
+
+    def availability(self, doc_id, when):
+        """'open_now', 'later_today', 'other_days' or 'unknown'."""
+        if doc_id not in self.schedules:
+            return 'unknown'
+        if self.open_at(doc_id, when):
+            return 'open_now'
+        if self.later_today(doc_id, when):
+            return 'later_today'
+        return 'other_days'
+
+    def rank(self, doc_ids, when):
+        """doc_ids reordered: open now, then open later today, then other days, then unknown hours (stable)."""
+        order = {'open_now': 0, 'later_today': 1, 'other_days': 2, 'unknown': 3}
+        return sorted(doc_ids, key=lambda doc_id: order[self.availability(doc_id, when)])
+
+    def report(self, top=10):
+        counts = Counter(self.statuses.values())
+        return {
+            'rows': len(self.statuses),
+            'statuses': {status: counts.get(status, 0) for status in PARSE_STATUSES},
+            'distinct_failures': len(self.failures),
+            'top_failures': self.failures.most_common(top),
+        }
+
+
+if __name__ == '__main__':
+    import pandas as pd
+
+    base_dir = os.path.abspath(os.path.dirname(__file__))
+    parser = argparse.ArgumentParser(description="Parse report for the doctor directory's visiting_hours column.")
+    parser.add_argument('--csv', default=os.path.join(base_dir, 'doctors_bd_detailed.csv'))
+    args = parser.parse_args()
+    df = pd.read_csv(args.csv, dtype=str, usecols=lambda col: col.strip().lower() == 'visiting_hours')
+    report = VisitingHoursIndex.build(enumerate(df.iloc[:, 0])).report(top=25)
+    print(f"{report['rows']} rows: " + ', '.join(f"{n} {status}" for status, n in report['statuses'].items()))
+    print(f"{report['distinct_failures']} distinct strings failed or partially failed to parse:")
+    for text, n in report['top_failures']:
+        print(f"{n:>5}  {text}")
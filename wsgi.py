@@ -0,0 +1,7 @@
+# wsgi.py
+# WSGI entry point for production servers, e.g. `gunicorn --threads 8 wsgi:application`. Unlike a plain
+# `import app` (tests, replay_conversations.py), it starts the synthetic warmup right away, so /readyz turns 200
+# without waiting for the first probe. AROGYABOT_WARMUP=0 leaves warmup to /readyz.
+from app import app as application, start_warmup_when_served
+
+start_warmup_when_served()